@@ -0,0 +1 @@
+../../../LA/Baseline-CQCC-GMM/python/feature_store.py
\ No newline at end of file
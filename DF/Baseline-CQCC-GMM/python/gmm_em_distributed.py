@@ -0,0 +1 @@
+../../../LA/Baseline-CQCC-GMM/python/gmm_em_distributed.py
\ No newline at end of file
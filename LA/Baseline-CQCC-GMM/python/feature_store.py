@@ -0,0 +1,196 @@
+"""
+Sharded on-disk store of extracted features (e.g., CQCC or LFCC).
+
+A store is a directory of shards. Each shard has
+  shard-NNN.bin    features of the utterances, one after another
+  shard-NNN.idx    one line per utterance:
+                   utt_id  offset  nbytes  dtype  shape  codec
+  shard-NNN.lock   held by the process writing to the shard
+
+A process opens the store once, e.g., by get_feature_store in gmm.py, and
+keeps the index of all the shards in RAM (utterance ID -> shard, offset,
+shape). Features are read by os.pread, so that any number of processes
+can read the store at the same time, including forked workers that share
+the file handles.
+
+Each writing process takes a shard that is not locked by another process,
+and only appends to it. Parallel extraction workers therefore do not wait
+for each other. Features are appended to shard-NNN.bin before the index
+line is appended to shard-NNN.idx, so that a crash leaves at most unused
+bytes in a shard, and readers skip incomplete index lines.
+
+Features are saved uncompressed (codec 'none'), or compressed with LZ4
+(codec 'lz4', requires the lz4 package).
+"""
+from os.path import join, exists, basename, splitext
+from numpy import frombuffer, ascontiguousarray, dtype as np_dtype
+import logging
+import fcntl
+import os
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+
+# codecs of the features in a shard
+codecs = ['none', 'lz4']
+
+
+def get_utt_id(file):
+    # LA/ASVspoof2019_LA_train/flac/LA_T_1000137.flac -> LA_T_1000137
+    return splitext(basename(file))[0]
+
+
+class FeatureStore(object):
+    def __init__(self, store_dir, codec='none'):
+        if codec not in codecs:
+            raise ValueError('unknown codec %s, should be one of %s' % (codec, ', '.join(codecs)))
+        if codec == 'lz4' and lz4 is None:
+            raise ImportError('codec lz4 requires the lz4 package: pip install lz4')
+        if not exists(store_dir):
+            os.makedirs(store_dir, exist_ok=True)
+        self.store_dir = store_dir
+        self.codec = codec
+
+        # utt_id -> (shard, offset, nbytes, dtype, shape, codec)
+        self.index = dict()
+        # shard -> read position in the index file
+        self._idx_pos = dict()
+        # shard -> file descriptor of the feature file
+        self._fds = dict()
+
+        # shard written by this process, opened on the first put
+        self._writer = None
+        self._writer_pid = None
+
+        self.refresh()
+
+    def _path(self, shard, ext):
+        return join(self.store_dir, 'shard-%03d.%s' % (shard, ext))
+
+    def _shards(self):
+        shards = list()
+        for name in os.listdir(self.store_dir):
+            stem, ext = splitext(name)
+            if ext == '.idx' and stem.startswith('shard-'):
+                shards.append(int(stem[len('shard-'):]))
+        return sorted(shards)
+
+    def refresh(self):
+        # load new lines in the index files, e.g., written by other processes
+        for shard in self._shards():
+            with open(self._path(shard, 'idx'), 'rb') as f:
+                f.seek(self._idx_pos.get(shard, 0))
+                lines = f.read()
+            # skip the last line if it is being written
+            end = lines.rfind(b'\n') + 1
+            self._idx_pos[shard] = self._idx_pos.get(shard, 0) + end
+            for line in lines[:end].decode('utf-8').splitlines():
+                utt_id, offset, nbytes, dtype, shape, codec = line.split('\t')
+                shape = tuple(int(x) for x in shape.split(',') if x)
+                self.index[utt_id] = (shard, int(offset), int(nbytes), dtype, shape, codec)
+
+    def __contains__(self, utt_id):
+        return utt_id in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def keys(self):
+        return self.index.keys()
+
+    def _fd(self, shard):
+        if shard not in self._fds:
+            self._fds[shard] = os.open(self._path(shard, 'bin'), os.O_RDONLY)
+        return self._fds[shard]
+
+    def get(self, utt_id):
+        # features of the utterance (read-only array), None if not in the store
+        if utt_id not in self.index:
+            self.refresh()
+            if utt_id not in self.index:
+                return None
+        shard, offset, nbytes, dtype, shape, codec = self.index[utt_id]
+        data = os.pread(self._fd(shard), nbytes, offset)
+        if len(data) != nbytes:
+            raise IOError('truncated features of %s in %s' % (utt_id, self._path(shard, 'bin')))
+        if codec == 'lz4':
+            if lz4 is None:
+                raise ImportError('features of %s are compressed by lz4: pip install lz4' % utt_id)
+            data = lz4.frame.decompress(data)
+        return frombuffer(data, dtype=np_dtype(dtype)).reshape(shape)
+
+    def _open_writer(self):
+        # take the first shard that is not locked by another process
+        # (forked processes do not inherit the shard of the parent)
+        self.close_writer()
+        shard = 0
+        while True:
+            lock = open(self._path(shard, 'lock'), 'a')
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except (BlockingIOError, PermissionError):
+                lock.close()
+                shard += 1
+        self._writer = (shard, lock, open(self._path(shard, 'bin'), 'ab'), open(self._path(shard, 'idx'), 'ab'))
+        self._writer_pid = os.getpid()
+
+    def put(self, utt_id, data):
+        if '\t' in utt_id or '\n' in utt_id:
+            raise ValueError('invalid utterance ID %r' % utt_id)
+        # only numeric arrays can be read back from the raw bytes
+        if data is None:
+            raise ValueError('no features of %s' % utt_id)
+        data = ascontiguousarray(data)
+        if data.dtype.kind not in 'fiu':
+            raise ValueError('features of %s should be numeric, not %s' % (utt_id, data.dtype))
+        if self._writer is None or self._writer_pid != os.getpid():
+            self._open_writer()
+        shard, _, f_bin, f_idx = self._writer
+
+        raw = data.tobytes()
+        if self.codec == 'lz4':
+            raw = lz4.frame.compress(raw)
+
+        # features first, then the index line
+        offset = f_bin.seek(0, os.SEEK_END)
+        f_bin.write(raw)
+        f_bin.flush()
+        shape = ','.join(str(x) for x in data.shape)
+        f_idx.write(('%s\t%d\t%d\t%s\t%s\t%s\n' % (utt_id, offset, len(raw), data.dtype.str, shape, self.codec)).encode('utf-8'))
+        f_idx.flush()
+        self.index[utt_id] = (shard, offset, len(raw), data.dtype.str, data.shape, self.codec)
+
+    def close_writer(self):
+        if self._writer is not None and self._writer_pid == os.getpid():
+            _, lock, f_bin, f_idx = self._writer
+            f_idx.close()
+            f_bin.close()
+            # releases the shard
+            lock.close()
+        self._writer = None
+        self._writer_pid = None
+
+    def close(self):
+        self.close_writer()
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds = dict()
+
+
+def import_h5(store, h5_file):
+    # copy the features cached in an h5py file (e.g., cqcc.h5 by earlier versions of gmm.py) to the store
+    import h5py
+    n = 0
+    with h5py.File(h5_file, 'r') as h5:
+        def visit(name, obj):
+            nonlocal n
+            if isinstance(obj, h5py.Dataset) and get_utt_id(name) not in store:
+                store.put(get_utt_id(name), obj[()])
+                n += 1
+        h5.visititems(visit)
+    logging.info('%d utterances imported from %s' % (n, h5_file))
+    return n
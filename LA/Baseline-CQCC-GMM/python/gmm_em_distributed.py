@@ -0,0 +1,45 @@
+"""
+File-based scatter/gather of the EM iterations of train_gmm, e.g., to spread
+one iteration over several CPU nodes that share the working directory.
+
+For each EM iteration i (0, 1, ..., 9), run the e step of each shard
+(e.g., one job per node), then merge the statistics and run the m step:
+
+  python gmm_em_distributed.py --features cqcc --dict-file gmm_LA_cqcc.pkl --label bonafide \
+      --train-keys LA/ASVspoof2019_LA_cm_protocols/ASVspoof2019.LA.cm.train.trn.txt \
+      --train-folders LA/ASVspoof2019_LA_train/flac/ --iter $i --shard $k --num-shards $N
+  python gmm_em_distributed.py --dict-file gmm_LA_cqcc.pkl --label bonafide \
+      --iter $i --reduce --num-shards $N
+
+The initial GMM (e.g., gmm_LA_cqcc.pkl_bonafide_init_partial.pkl by
+asvspoof2021_baseline.py) should exist before iteration 0. The GMM after
+iteration i is saved in the same file as train_gmm, so that train_gmm can
+continue from it.
+"""
+from gmm import em_scatter, em_gather
+import argparse
+
+
+parser = argparse.ArgumentParser(description='Scatter/gather EM iterations of the GMM baseline')
+parser.add_argument('--features', type=str, default=None, help='cqcc, for the e step')
+parser.add_argument('--label', type=str, required=True, help='bonafide or spoof')
+parser.add_argument('--dict-file', type=str, required=True, help='dict_file of asvspoof2021_baseline.py, e.g., gmm_LA_cqcc.pkl')
+parser.add_argument('--train-keys', type=str, nargs='+', default=[], help='train_keys of asvspoof2021_baseline.py, for the e step')
+parser.add_argument('--train-folders', type=str, nargs='+', default=[], help='train_folders of asvspoof2021_baseline.py, for the e step')
+parser.add_argument('--audio-ext', type=str, default='.flac')
+parser.add_argument('--iter', type=int, required=True, help='EM iteration, from 0')
+parser.add_argument('--num-shards', type=int, required=True, help='number of shards of the training files')
+parser.add_argument('--shard', type=int, default=None, help='e step of this shard, from 0 to num-shards - 1')
+parser.add_argument('--reduce', action='store_true', help='merge the statistics of all the shards and run the m step')
+args = parser.parse_args()
+
+if args.reduce:
+    em_gather(data_label=args.label, dict_file=args.dict_file, i=args.iter, n_shards=args.num_shards)
+elif args.shard is not None and 0 <= args.shard < args.num_shards:
+    if args.features is None or len(args.train_keys) == 0 or len(args.train_keys) != len(args.train_folders):
+        parser.error('the e step needs --features, and --train-keys and --train-folders of the same length')
+    em_scatter(data_label=args.label, features=args.features,
+               train_keys=args.train_keys, train_folders=args.train_folders, audio_ext=args.audio_ext,
+               dict_file=args.dict_file, i=args.iter, shard=args.shard, n_shards=args.num_shards)
+else:
+    parser.error('use --shard (0 <= shard < num-shards) or --reduce')
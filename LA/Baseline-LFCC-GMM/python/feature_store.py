@@ -0,0 +1 @@
+../../Baseline-CQCC-GMM/python/feature_store.py
\ No newline at end of file
@@ -1,22 +1,33 @@
 from numpy import log, exp, infty, zeros_like, vstack, zeros, errstate, finfo, sqrt, floor, tile, concatenate, arange, meshgrid, ceil, linspace
+from numpy import empty, matmul, subtract, square, pi, float32, float64, hstack, cumsum
 from sklearn.mixture import GaussianMixture
-from scipy.special import logsumexp
 from scipy.signal import lfilter
 from LFCC_pipeline import lfcc
 from scipy.fft import dct
+from feature_store import FeatureStore, get_utt_id, import_h5
+from multiprocessing import Pool
 from os.path import exists
+from os import replace
 from random import sample
 import soundfile as sf
 import logging
 import pandas
 import pickle
 import math
-import h5py
+import time
 
 
 # configs - init
 logging.basicConfig(format='%(asctime)s.%(msecs)03d %(levelname)-8s %(message)s', level=logging.INFO, datefmt='%Y-%m-%d %H:%M:%S')
 
+# configs - e step: number of frames per block, and dtype of the log-likelihoods (the statistics are summed in float64)
+em_block_frames = 16384
+em_dtype = float32
+
+# configs - feature cache: codec of the stored features, 'none' (fastest to read) or 'lz4' (smaller, needs lz4)
+feature_store_codec = 'none'
+feature_stores = dict()
+
 
 # feature extraction functions
 def Deltas(x, width=3):
@@ -46,33 +57,96 @@ def extract_lfcc(file, num_ceps=20, order_deltas=2, low_freq=0, high_freq=4000):
     return lfccs
 
 
+def get_feature_store(features):
+    # opened once per process, e.g., cqcc_store/
+    if features not in feature_stores:
+        store = FeatureStore(features + '_store', codec=feature_store_codec)
+        if len(store) == 0 and exists(features + '.h5'):
+            # features cached by earlier versions in cqcc.h5 / lfcc.h5
+            import_h5(store, features + '.h5')
+        feature_stores[features] = store
+    return feature_stores[features]
+
+
 def extract_features(file, features, cached=False):
     def get_feats():
         if features == 'lfcc':
             return extract_lfcc(file)
         else:
-            return None
+            raise ValueError("unknown features %s, should be lfcc" % features)
 
     if cached:
-        # cqcc is very slow, writing entire dataset to hdf5 file beforehand (offline cache)
-        cache_file = features + '.h5'
-        h5 = h5py.File(cache_file, 'a')
-        group = h5.get(file)
-        if group is None:
+        # cqcc is very slow, writing entire dataset to a feature store beforehand (offline cache)
+        store = get_feature_store(features)
+        utt_id = get_utt_id(file)
+        data = store.get(utt_id)
+        if data is None:
             data = get_feats()
-            h5.create_dataset(file, data=data, compression='gzip')
-        else:
-            data = group[()]
-        h5.close()
+            store.put(utt_id, data)
         return data
     else:
         return get_feats()
 
 
-def train_gmm(data_label, features, train_keys, train_folders, audio_ext, dict_file, ncomp, init_only=False):
+def get_protocol_files(keys, folders, audio_ext, data_label=None):
+    # audio files of all the trials in the protocols, e.g., train_keys or [eval_ndx]
+    # if data_label is given, only files of bonafide or spoof trials in train_keys
+    files = list()
+    for k, key in enumerate(keys):
+        pd = pandas.read_csv(key, sep=' ', header=None)
+        if data_label is not None:
+            pd = pd[pd[4] == data_label]
+        files += [folders[k] + file + audio_ext for file in pd[1].values]
+    return files
+
+
+def extract_features_job(args):
+    # errors of one file do not stop the other files
+    file, features = args
+    try:
+        extract_features(file, features=features, cached=True)
+        return file, None
+    except Exception as e:
+        return file, repr(e)
+
+
+def extract_features_parallel(files, features, n_jobs=4, failed_file=None):
+    logging.info('Extracting %s features into the feature store' % features)
+
+    # files already in the store are skipped, so that an interrupted run can be restarted
+    store = get_feature_store(features)
+    store.refresh()
+    files = list(dict.fromkeys(files))
+    n_files = len(files)
+    files = [file for file in files if get_utt_id(file) not in store]
+    logging.info('\t%d files to extract, %d files already cached' % (len(files), n_files - len(files)))
+
+    failed = list()
+    start = time.time()
+    with Pool(n_jobs) as pool:
+        jobs = pool.imap_unordered(extract_features_job, [(file, features) for file in files], chunksize=4)
+        for i, (file, error) in enumerate(jobs):
+            if error is not None:
+                logging.warning('%s: %s' % (file, error))
+                failed.append(file)
+            if (i+1) % 1000 == 0 or i+1 == len(files):
+                elapsed = max(time.time() - start, 1e-3)
+                logging.info("\t...%d/%d... %.1f files/s, %d failed, ETA %ds" % (
+                    i+1, len(files), (i+1) / elapsed, len(failed), elapsed / (i+1) * (len(files) - i - 1)))
+
+    if failed_file is not None and len(failed):
+        with open(failed_file, 'w') as f:
+            f.write('\n'.join(failed) + '\n')
+        logging.warning('%d files failed, see %s' % (len(failed), failed_file))
+
+    logging.info('\t... extraction completed.\n')
+    return failed
+
+
+def train_gmm(data_label, features, train_keys, train_folders, audio_ext, dict_file, ncomp, init_only=False, n_jobs=1):
     logging.info('Start GMM training.')
 
-    partial_gmm_dict_file = '_'.join((dict_file, data_label, 'init', 'partial.pkl'))
+    partial_gmm_dict_file = get_partial_file(dict_file, data_label, 'init')
     if exists(partial_gmm_dict_file):
         gmm = GaussianMixture(covariance_type='diag')
         with open(partial_gmm_dict_file, "rb") as tf:
@@ -105,55 +179,30 @@ def train_gmm(data_label, features, train_keys, train_folders, audio_ext, dict_f
         return gmm
 
     # EM training
+    files = get_protocol_files(train_keys, train_folders, audio_ext, data_label=data_label)
+    pool = Pool(n_jobs) if n_jobs > 1 else None
     prev_lower_bound = -infty
     for i in range(10):
-        partial_gmm_dict_file = '_'.join((dict_file, data_label, str(i), 'partial.pkl'))
+        partial_gmm_dict_file = get_partial_file(dict_file, data_label, i)
         if exists(partial_gmm_dict_file):
             with open(partial_gmm_dict_file, "rb") as tf:
                 gmm._set_parameters(pickle.load(tf))
                 continue
 
-        nk_acc = zeros_like(gmm.weights_)
-        mu_acc = zeros_like(gmm.means_)
-        sigma_acc = zeros_like(gmm.covariances_)
-        log_prob_norm_acc = 0
-        n_samples = 0
-        for k, train_key in enumerate(train_keys):
-            pd = pandas.read_csv(train_key, sep=' ', header=None)
-            files = pd[pd[4] == data_label][1]
-
-            for file in files.values:
-                Tx = extract_features(train_folders[k] + file + audio_ext, features=features, cached=True)
-                n_samples += Tx.shape[1]
-
-                # e step
-                weighted_log_prob = gmm._estimate_weighted_log_prob(Tx.T)
-                log_prob_norm = logsumexp(weighted_log_prob, axis=1)
-                with errstate(under='ignore'):
-                    # ignore underflow
-                    log_resp = weighted_log_prob - log_prob_norm[:, None]
-                log_prob_norm_acc += log_prob_norm.sum()
-
-                # m step preparation
-                resp = exp(log_resp)
-                nk_acc += resp.sum(axis=0) + 10 * finfo(log(1).dtype).eps
-                mu_acc += resp.T @ Tx.T
-                sigma_acc += resp.T @ (Tx.T ** 2)
+        # e step, over shards of the files in n_jobs processes
+        if pool is None:
+            stats = em_stats(gmm, files, features)
+        else:
+            n_shards = n_jobs * 4
+            stats = reduce_em_stats(pool.map(em_stats_job, [(gmm, files[k::n_shards], features) for k in range(n_shards)]))
 
         # m step
-        gmm.means_ = mu_acc / nk_acc[:, None]
-        gmm.covariances_ = sigma_acc / nk_acc[:, None] - gmm.means_ ** 2 + gmm.reg_covar
-        gmm.weights_ = nk_acc / n_samples
-        gmm.weights_ /= gmm.weights_.sum()
-        if (gmm.covariances_ <= 0.0).any():
-            raise ValueError("ill-defined empirical covariance")
-        gmm.precisions_cholesky_ = 1. / sqrt(gmm.covariances_)
+        lower_bound = em_mstep(gmm, stats)
 
         with open(partial_gmm_dict_file, "wb") as f:
             pickle.dump(gmm._get_parameters(), f)
 
         # infos
-        lower_bound = log_prob_norm_acc / n_samples
         change = lower_bound - prev_lower_bound
         logging.info("  Iteration %d\t llh %.5f\t ll change %.5f" % (i, lower_bound, change))
         prev_lower_bound = lower_bound
@@ -163,9 +212,192 @@ def train_gmm(data_label, features, train_keys, train_folders, audio_ext, dict_f
             gmm.converged_ = True
             break
 
+    if pool is not None:
+        pool.close()
+        pool.join()
+    return gmm
+
+
+def get_partial_file(dict_file, data_label, i):
+    # GMM parameters after the i-th EM iteration ('init' for the initial GMM)
+    return '_'.join((dict_file, data_label, str(i), 'partial.pkl'))
+
+
+def get_stats_file(dict_file, data_label, i, shard, n_shards):
+    # sufficient statistics of a shard of the files in the i-th EM iteration
+    return '_'.join((dict_file, data_label, str(i), 'stats', '%d-of-%d.pkl' % (shard, n_shards)))
+
+
+def log_prob_params(gmm, shift):
+    # weighted log-likelihood of all the components of a diagonal GMM, [x - shift, (x - shift)^2] @ params + const
+    n_dim = gmm.means_.shape[1]
+    means = gmm.means_ - shift
+    precisions = gmm.precisions_cholesky_ ** 2
+    params = vstack([(means * precisions).T, -0.5 * precisions.T])
+    const = (log(gmm.weights_) + log(gmm.precisions_cholesky_).sum(axis=1)
+             - 0.5 * (n_dim * log(2 * pi) + (means ** 2 * precisions).sum(axis=1)))
+    return params, const
+
+
+def em_stats(gmm, files, features):
+    # sufficient statistics of the files: nk, sum of x, sum of x^2, log-likelihood, number of frames
+    # frames of many files are stacked into blocks of em_block_frames frames
+    n_comp, n_dim = gmm.means_.shape
+
+    # features are shifted by the mean of the GMM, so that x^2 keeps its precision
+    shift = gmm.weights_ @ gmm.means_
+    params, const = log_prob_params(gmm, shift)
+    params = params.astype(em_dtype)
+    const = const.astype(em_dtype)
+
+    # buffers reused by all the blocks: [x, x^2] and responsibilities, with float64 copies
+    # for the statistics, since float32 sums of x^2 are not precise enough for small variances
+    X = empty((em_block_frames, 2 * n_dim))
+    resp = empty((em_block_frames, n_comp), dtype=em_dtype)
+    X_low = X if em_dtype == float64 else empty(X.shape, dtype=em_dtype)
+    resp_acc = resp if em_dtype == float64 else empty(resp.shape)
+
+    nk_acc = zeros_like(gmm.weights_)
+    x_acc = zeros((n_comp, 2 * n_dim))
+    log_prob_norm_acc = 0
+    n_samples = 0
+
+    def e_step(n):
+        # responsibilities of the n frames in the block, in place
+        block_resp = resp[:n]
+        if X_low is not X:
+            X_low[:n] = X[:n]
+        matmul(X_low[:n], params, out=block_resp)
+        block_resp += const
+        log_prob_max = block_resp.max(axis=1, keepdims=True)
+        block_resp -= log_prob_max
+        with errstate(under='ignore'):
+            # ignore underflow
+            exp(block_resp, out=block_resp)
+        prob_sum = block_resp.sum(axis=1, keepdims=True)
+        block_resp /= prob_sum
+
+        # m step preparation
+        if resp_acc is not resp:
+            resp_acc[:n] = block_resp
+        nk_acc[:] += resp_acc[:n].sum(axis=0)
+        x_acc[:] += resp_acc[:n].T @ X[:n]
+        return log(prob_sum).sum(dtype=float64) + log_prob_max.sum(dtype=float64)
+
+    n = 0
+    for file in files:
+        Tx = extract_features(file, features=features, cached=True)
+        n_samples += Tx.shape[1]
+
+        # frames of a file may be split over several blocks
+        start = 0
+        while start < Tx.shape[1]:
+            m = min(Tx.shape[1] - start, em_block_frames - n)
+            subtract(Tx[:, start:start + m].T, shift, out=X[n:n + m, :n_dim])
+            square(X[n:n + m, :n_dim], out=X[n:n + m, n_dim:])
+            n += m
+            start += m
+            if n == em_block_frames:
+                log_prob_norm_acc += e_step(n)
+                n = 0
+    if n > 0:
+        log_prob_norm_acc += e_step(n)
+
+    # sums of x and x^2 without the shift
+    mu_acc = x_acc[:, :n_dim] + nk_acc[:, None] * shift
+    sigma_acc = x_acc[:, n_dim:] + 2 * shift * x_acc[:, :n_dim] + nk_acc[:, None] * shift ** 2
+    nk_acc += len(files) * 10 * finfo(log(1).dtype).eps
+    return nk_acc, mu_acc, sigma_acc, log_prob_norm_acc, n_samples
+
+
+def em_stats_job(args):
+    gmm, files, features = args
+    return em_stats(gmm, files, features)
+
+
+def reduce_em_stats(stats_list):
+    # the statistics are additive
+    return tuple(sum(x) for x in zip(*stats_list))
+
+
+def em_mstep(gmm, stats):
+    # m step, returns the average log-likelihood of the e step
+    nk_acc, mu_acc, sigma_acc, log_prob_norm_acc, n_samples = stats
+    gmm.means_ = mu_acc / nk_acc[:, None]
+    gmm.covariances_ = sigma_acc / nk_acc[:, None] - gmm.means_ ** 2 + gmm.reg_covar
+    gmm.weights_ = nk_acc / n_samples
+    gmm.weights_ /= gmm.weights_.sum()
+    if (gmm.covariances_ <= 0.0).any():
+        raise ValueError("ill-defined empirical covariance")
+    gmm.precisions_cholesky_ = 1. / sqrt(gmm.covariances_)
+    return log_prob_norm_acc / n_samples
+
+
+def load_partial_gmm(dict_file, data_label, i):
+    gmm = GaussianMixture(covariance_type='diag')
+    with open(get_partial_file(dict_file, data_label, i), "rb") as tf:
+        gmm._set_parameters(pickle.load(tf))
+    return gmm
+
+
+def em_scatter(data_label, features, train_keys, train_folders, audio_ext, dict_file, i, shard, n_shards):
+    # file-based e step of one shard in the i-th EM iteration, e.g., as a job on one node
+    gmm = load_partial_gmm(dict_file, data_label, 'init' if i == 0 else i - 1)
+    files = get_protocol_files(train_keys, train_folders, audio_ext, data_label=data_label)
+    stats = em_stats(gmm, files[shard::n_shards], features)
+
+    stats_file = get_stats_file(dict_file, data_label, i, shard, n_shards)
+    with open(stats_file + '.tmp', "wb") as f:
+        pickle.dump(stats, f)
+    replace(stats_file + '.tmp', stats_file)
+    logging.info('Iteration %d, shard %d/%d: %d files, statistics saved to %s' % (i, shard, n_shards, len(files[shard::n_shards]), stats_file))
+
+
+def em_gather(data_label, dict_file, i, n_shards):
+    # merge the statistics of all the shards of the i-th EM iteration, and run the m step
+    gmm = load_partial_gmm(dict_file, data_label, 'init' if i == 0 else i - 1)
+    stats_list = list()
+    for shard in range(n_shards):
+        stats_file = get_stats_file(dict_file, data_label, i, shard, n_shards)
+        if not exists(stats_file):
+            raise IOError('statistics of shard %d are not ready: %s' % (shard, stats_file))
+        with open(stats_file, "rb") as f:
+            stats_list.append(pickle.load(f))
+
+    lower_bound = em_mstep(gmm, reduce_em_stats(stats_list))
+    with open(get_partial_file(dict_file, data_label, i), "wb") as f:
+        pickle.dump(gmm._get_parameters(), f)
+    logging.info("  Iteration %d\t llh %.5f" % (i, lower_bound))
     return gmm
 
 
+def llr_params(gmm_pairs):
+    # parameters of the (bona, spoof) GMM pairs stacked into one matrix, computed once for llr_scores
+    gmms = [gmm for pair in gmm_pairs for gmm in pair]
+    shift = gmms[0].weights_ @ gmms[0].means_
+    params, const = zip(*[log_prob_params(gmm, shift) for gmm in gmms])
+    bounds = cumsum([0] + [gmm.means_.shape[0] for gmm in gmms])
+    return hstack(params), concatenate(const), shift, bounds
+
+
+def llr_scores(params, Tx):
+    # average log-likelihood ratio of the frames for each (bona, spoof) GMM pair, as gmm.score of sklearn
+    params, const, shift, bounds = params
+    x = Tx.T - shift
+    weighted_log_prob = hstack([x, x ** 2]) @ params
+    weighted_log_prob += const
+    scores = empty(len(bounds) - 1)
+    for k, (a, b) in enumerate(zip(bounds[:-1], bounds[1:])):
+        # logsumexp over the components of the k-th GMM, in place
+        log_prob = weighted_log_prob[:, a:b]
+        log_prob_max = log_prob.max(axis=1, keepdims=True)
+        log_prob -= log_prob_max
+        with errstate(under='ignore'):
+            exp(log_prob, out=log_prob)
+        scores[k] = (log(log_prob.sum(axis=1)) + log_prob_max[:, 0]).mean()
+    return scores[0::2] - scores[1::2]
+
+
 def scoring(scores_file, dict_file, features, eval_ndx, eval_folder, audio_ext, features_cached=True, flag_debug=False):
     logging.info('Scoring eval data')
 
@@ -175,6 +407,7 @@ def scoring(scores_file, dict_file, features, eval_ndx, eval_folder, audio_ext,
         gmm_dict = pickle.load(tf)
         gmm_bona._set_parameters(gmm_dict['bona'])
         gmm_spoof._set_parameters(gmm_dict['spoof'])
+    params = llr_params([(gmm_bona, gmm_spoof)])
 
     pd = pandas.read_csv(eval_ndx, sep=' ', header=None)
     if flag_debug:
@@ -188,7 +421,7 @@ def scoring(scores_file, dict_file, features, eval_ndx, eval_folder, audio_ext,
 
         try:
             Tx = extract_features(eval_folder + file + audio_ext, features=features, cached=features_cached)
-            scr[i] = gmm_bona.score(Tx.T) - gmm_spoof.score(Tx.T)
+            scr[i] = llr_scores(params, Tx)[0]
         except Exception as e:
             logging.warning(e)
             scr[i] = log(1)
@@ -216,6 +449,8 @@ def scoring_partials(scores_file, dict_dict_files, features, eval_ndx, eval_fold
             gmm_dict = pickle.load(tf)
             gmms[i]['spoof']._set_parameters(gmm_dict)
 
+    params = llr_params([(gmms[j]['bona'], gmms[j]['spoof']) for j in gmms.keys()])
+
     pd = pandas.read_csv(eval_ndx, sep=' ', header=None)
     if flag_debug:
         pd = pd[:1000]
@@ -228,8 +463,7 @@ def scoring_partials(scores_file, dict_dict_files, features, eval_ndx, eval_fold
 
         try:
             Tx = extract_features(eval_folder + file + audio_ext, features=features, cached=features_cached)
-            for j, jkey in enumerate(gmms.keys()):
-                scr[i, j] = gmms[j]['bona'].score(Tx.T) - gmms[j]['spoof'].score(Tx.T)
+            scr[i, :] = llr_scores(params, Tx)
         except Exception as e:
             logging.warning(e)
             for j, _ in enumerate(gmms.keys()):
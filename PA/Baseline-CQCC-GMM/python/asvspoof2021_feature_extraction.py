@@ -0,0 +1,24 @@
+from gmm import get_protocol_files, extract_features_parallel
+
+
+# configs - feature extraction e.g., LFCC or CQCC
+features = 'cqcc'
+
+# configs - number of processes
+n_jobs = 8
+
+# configs - train & eval data, as in asvspoof2021_baseline.py and gmm_scoring_asvspoof21.py
+db_folder = '/path/to/ASVspoof_root/'  # put your database root path here
+train_folders = [db_folder + 'LA/ASVspoof2019_PA_train/flac/']
+train_keys = [db_folder + 'LA/ASVspoof2019_PA_cm_protocols/ASVspoof2019.PA.cm.train.trn.txt']
+eval_folder = db_folder + 'PA/ASVspoof2021_PA_eval/flac/'
+eval_ndx = db_folder + 'PA/ASVspoof2021_PA_cm_protocols/ASVspoof2021.PA.cm.eval.trl.txt'
+
+audio_ext = '.flac'
+
+# extract features of the train & eval data into the feature store before training and scoring
+# files already in the store are skipped; failed files are listed in cqcc_failed.txt
+if __name__ == '__main__':
+    files = get_protocol_files(train_keys, train_folders, audio_ext) + \
+        get_protocol_files([eval_ndx], [eval_folder], audio_ext)
+    extract_features_parallel(files, features, n_jobs=n_jobs, failed_file=features + '_failed.txt')
@@ -46,9 +46,19 @@ def eval_to_score_file(score_file, cm_key_file):
     cm_scores = submission_scores.merge(cm_data[cm_data[7] == phase], left_on=0, right_on=1, how='inner')  # check here for progress vs eval set
     bona_cm = cm_scores[cm_scores[5] == 'bonafide']['1_x'].values
     spoof_cm = cm_scores[cm_scores[5] == 'spoof']['1_x'].values
-    eer_cm = em.compute_eer(bona_cm, spoof_cm)[0]
+    eer_cm, eer_cm2, _, _ = em.compute_polarity_check(bona_cm, spoof_cm)
     out_data = "eer: %.2f\n" % (100*eer_cm)
     print(out_data)
+
+    # just in case that the submitted file reverses the sign of positive and negative scores
+    if eer_cm2 < eer_cm:
+        print(
+            'CHECK: we negated your scores and achieved a lower EER. Before: %.2f - Negated: %.2f - your class labels are swapped during training... this will result in poor challenge ranking' % (
+            100*eer_cm, 100*eer_cm2))
+
+    if eer_cm == eer_cm2:
+        print(
+            'WARNING: your classifier might not work correctly, we checked if negating your scores gives different EER - it does not. Are all values the same?')
     return eer_cm
 
 if __name__ == "__main__":
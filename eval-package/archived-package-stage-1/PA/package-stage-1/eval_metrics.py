@@ -48,6 +48,77 @@ def compute_eer(target_scores, nontarget_scores):
     return eer, thresholds[min_index]
 
 
+def invert_sorted_scores(sorted_scores, sorted_labels):
+    """ Sorted scores and labels of the negated scores, without sorting again.
+    Groups of tied scores are reversed as a whole, so that target trials stay
+    before nontarget trials among ties, as in compute_det_curve. """
+    n_scores = sorted_scores.size
+    if n_scores == 0:
+        return -sorted_scores, sorted_labels
+    group_start = np.flatnonzero(
+        np.concatenate(([True], sorted_scores[1:] != sorted_scores[:-1])))
+    group_len = np.diff(np.append(group_start, n_scores))
+    group_start = group_start[::-1]
+    group_len = group_len[::-1]
+    new_start = np.concatenate(([0], np.cumsum(group_len)[:-1]))
+    order = np.arange(n_scores) + np.repeat(group_start - new_start, group_len)
+    return -sorted_scores[order], sorted_labels[order]
+
+
+def compute_det_curve_polarity(target_scores, nontarget_scores):
+    """ DET curves of the scores and of the negated scores, with one sort.
+    Identical to compute_det_curve(target_scores, nontarget_scores) and
+    compute_det_curve(-target_scores, -nontarget_scores). """
+    n_scores = target_scores.size + nontarget_scores.size
+    all_scores = np.concatenate((target_scores, nontarget_scores))
+    labels = np.concatenate((np.ones(target_scores.size), np.zeros(nontarget_scores.size)))
+    indices = np.argsort(all_scores, kind='mergesort')
+
+    dets = []
+    sorted_scores, sorted_labels = all_scores[indices], labels[indices]
+    for scores, det_labels in [(sorted_scores, sorted_labels),
+                           invert_sorted_scores(sorted_scores, sorted_labels)]:
+        tar_trial_sums = np.cumsum(det_labels)
+        nontarget_trial_sums = nontarget_scores.size - (np.arange(1, n_scores + 1) - tar_trial_sums)
+        frr = np.concatenate((np.atleast_1d(0), tar_trial_sums / target_scores.size))
+        far = np.concatenate((np.atleast_1d(1), nontarget_trial_sums / nontarget_scores.size))
+        thresholds = np.concatenate((np.atleast_1d(scores[0] - 0.001), scores))
+        dets.append((frr, far, thresholds))
+    return dets[0], dets[1]
+
+
+def compute_polarity_check(bonafide_score_cm, spoof_score_cm, Pfa_asv=None, Pmiss_asv=None, Pfa_spoof_asv=None, cost_model=None):
+    """ Returns EER and min t-DCF of the scores and of the negated scores,
+    (eer, eer_inv, min_tDCF, min_tDCF_inv), computed from one sort of the
+    scores. min t-DCF values are None if cost_model is None. """
+    det, det_inv = compute_det_curve_polarity(bonafide_score_cm, spoof_score_cm)
+    eers = []
+    for frr, far, _ in (det, det_inv):
+        min_index = np.argmin(np.abs(frr - far))
+        eers.append(np.mean((frr[min_index], far[min_index])))
+    if cost_model is None:
+        return eers[0], eers[1], None, None
+
+    # Sanity check of scores, same as compute_tDCF
+    if not np.isfinite(det[2]).all():
+        sys.exit('ERROR: Your scores contain nan or inf.')
+    n_uniq = np.count_nonzero(np.diff(det[2][1:])) + 1
+    if n_uniq < 3:
+        sys.exit('ERROR: You should provide soft CM scores - not binary decisions')
+
+    # Constants - see ASVspoof 2019 evaluation plan, same as compute_tDCF
+    C0 = cost_model['Ptar'] * cost_model['Cmiss'] * Pmiss_asv + cost_model['Pnon']*cost_model['Cfa']*Pfa_asv
+    C1 = cost_model['Ptar'] * cost_model['Cmiss'] - (cost_model['Ptar'] * cost_model['Cmiss'] * Pmiss_asv + cost_model['Pnon'] * cost_model['Cfa'] * Pfa_asv)
+    C2 = cost_model['Pspoof'] * cost_model['Cfa_spoof'] * Pfa_spoof_asv;
+    if C0 < 0 or C1 < 0 or C2 < 0:
+        sys.exit('You should never see this error but I cannot evalute tDCF with negative weights - please check whether your ASV error rates are correctly computed?')
+    tDCF_default = C0 + np.minimum(C1, C2)
+
+    min_tDCFs = [np.min((C0 + C1 * Pmiss_cm + C2 * Pfa_cm) / tDCF_default)
+                 for Pmiss_cm, Pfa_cm, _ in (det, det_inv)]
+    return eers[0], eers[1], min_tDCFs[0], min_tDCFs[1]
+
+
 def compute_tDCF(bonafide_score_cm, spoof_score_cm, Pfa_asv, Pmiss_asv, Pfa_spoof_asv, cost_model, print_cost):
     """
     Compute Tandem Detection Cost Function (t-DCF) [1] for a fixed ASV system.
@@ -14,7 +14,6 @@ Example:
 $: python evaluate.py score.txt ./keys eval
 """
 import sys, os.path
-import numpy as np
 import pandas
 import eval_metrics as em
 from glob import glob
@@ -62,24 +61,19 @@ def load_asv_metrics():
     return Pfa_asv, Pmiss_asv, Pmiss_spoof_asv, Pfa_spoof_asv
 
 
-def performance(cm_scores, Pfa_asv, Pmiss_asv, Pfa_spoof_asv, invert=False):
+def performance(cm_scores, Pfa_asv, Pmiss_asv, Pfa_spoof_asv):
+    """ min_tDCF, eer_cm, min_tDCF_neg, eer_cm_neg = performance(...)
+
+    min t-DCF and EER of the scores, and of the negated scores.
+    Both are computed from one sort of the scores.
+    """
     bona_cm = cm_scores[cm_scores[4]=='bonafide']['1_x'].values
     spoof_cm = cm_scores[cm_scores[4]=='spoof']['1_x'].values
 
-    if invert==False:
-        eer_cm = em.compute_eer(bona_cm, spoof_cm)[0]
-    else:
-        eer_cm = em.compute_eer(-bona_cm, -spoof_cm)[0]
-
-    if invert==False:
-        tDCF_curve, _ = em.compute_tDCF(bona_cm, spoof_cm, Pfa_asv, Pmiss_asv, Pfa_spoof_asv, cost_model, False)
-    else:
-        tDCF_curve, _ = em.compute_tDCF(-bona_cm, -spoof_cm, Pfa_asv, Pmiss_asv, Pfa_spoof_asv, cost_model, False)
-
-    min_tDCF_index = np.argmin(tDCF_curve)
-    min_tDCF = tDCF_curve[min_tDCF_index]
+    eer_cm, eer_cm_neg, min_tDCF, min_tDCF_neg = em.compute_polarity_check(
+        bona_cm, spoof_cm, Pfa_asv, Pmiss_asv, Pfa_spoof_asv, cost_model)
 
-    return min_tDCF, eer_cm
+    return min_tDCF, eer_cm, min_tDCF_neg, eer_cm_neg
 
 
 def eval_to_score_file(score_file, cm_key_file):
@@ -93,12 +87,23 @@ def eval_to_score_file(score_file, cm_key_file):
 
     # check here for progress vs eval set
     cm_scores = submission_scores.merge(cm_data[cm_data[6] == phase], left_on=0, right_on=1, how='inner')  
-    min_tDCF, eer_cm = performance(cm_scores, Pfa_asv, Pmiss_asv, Pfa_spoof_asv)
+    min_tDCF, eer_cm, min_tDCF2, eer_cm2 = performance(cm_scores, Pfa_asv, Pmiss_asv, Pfa_spoof_asv)
 
     out_data = "min_tDCF: %.4f\n" % min_tDCF
     out_data += "eer: %.2f\n" % (100*eer_cm)
     print(out_data, end="")
 
+    # just in case that the submitted file reverses the sign of positive and negative scores
+    if min_tDCF2 < min_tDCF:
+        print(
+            'CHECK: we negated your scores and achieved a lower min t-DCF. Before: %.3f - Negated: %.3f - your class labels are swapped during training... this will result in poor challenge ranking' % (
+            min_tDCF, min_tDCF2))
+
+    if min_tDCF == min_tDCF2:
+        print(
+            'WARNING: your classifier might not work correctly, we checked if negating your scores gives different min t-DCF - it does not. Are all values the same?')
+
+
     return min_tDCF
 
 
@@ -0,0 +1,501 @@
+#!/usr/bin/env python
+"""
+Benchmark of the evaluation on synthetic protocols and score files
+
+Synthetic key, meta-label, ASV, and CM score files are generated with the
+columns and factor values of each track in config.py. Then the stages of
+evaluation_API (see --profile of main.py) and of the C012 computation are
+timed. Each (track, size) case runs in its own process, so that its peak
+memory is measured separately.
+
+Usage:
+ # run and save the results as a baseline
+ python benchmark.py --tracks LA PA DF --sizes 10000 100000 1000000
+                     --output baseline.json
+
+ # run again after changing the code, and compare with the baseline
+ python benchmark.py --tracks LA PA DF --sizes 10000 100000 1000000
+                     --baseline baseline.json --output new.json
+
+The exit status is 1 if the total time of a case is slower than the
+baseline by more than --threshold percent.
+
+Times are the median over --repeat runs. The first run of each case (which
+imports the modules and builds the binary cache of the protocol) is not
+timed. The benchmark runs offline on CPU; the synthetic data are saved in
+--data-dir, or in a temporary directory that is deleted at the end.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import io
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import contextlib
+import numpy as np
+
+import config
+import main
+import eval_wrapper
+import parallel_tools
+import profile_tools
+
+__author__ = "ASVspoof consortium"
+__copyright__ = "Copyright 2022, ASVspoof consortium"
+
+
+# version of the JSON format of the results
+g_bench_version = 1
+
+# ratio of bona fide trials in the CM protocol
+g_bonafide_ratio = 0.1
+# ratio of target and nontarget trials in the ASV protocol
+g_target_ratio = 0.1
+g_nontarget_ratio = 0.1
+
+# subset evaluated in the benchmark
+g_bench_subset = 'eval'
+
+
+# ==========
+# synthetic data
+# ==========
+
+def get_factor_values(config_buf):
+    """ values = get_factor_values(config_buf)
+
+    Values of the factor columns of a track, following config.py
+
+    output
+    ------
+      values   dict, {column: (values of bona fide trials,
+                               values of spoofed trials)}
+    """
+    values = dict()
+    for names, value_lists, factor_types in [
+            (config_buf.factor_name_1, config_buf.factor_1_list,
+             config_buf.factor_1_type),
+            (config_buf.factor_name_2, config_buf.factor_2_list,
+             config_buf.factor_2_type)]:
+        if not isinstance(names, list):
+            names, value_lists, factor_types = \
+                [names], [value_lists], [factor_types]
+        for name, value_list, factor_type in \
+            zip(names, value_lists, factor_types):
+            bona_values, spoof_values = values.setdefault(name, ([], []))
+            for value in value_list:
+                if value == config_buf.pooled_tag:
+                    continue
+                if factor_type != config.g_factor_type_spoof and \
+                   value not in bona_values:
+                    bona_values.append(value)
+                if factor_type != config.g_factor_type_bonafide and \
+                   value not in spoof_values:
+                    spoof_values.append(value)
+    return values
+
+
+def _get_protocol_subsets(config_buf):
+    # PA hidden1_PA and hidden2_PA are the trim conditions of 'hidden'
+    hidden = getattr(config_buf, 'hidden', dict())
+    return sorted(set('hidden' if x in hidden else x
+                      for x in config_buf.subsets))
+
+
+def generate_protocol(config_buf, names, labels, trial_ids, rng):
+    """ protocol_pd = generate_protocol(config_buf, names, labels,
+                                        trial_ids, rng)
+
+    Synthetic protocol with the columns names. Factor values are randomly
+    drawn from config_buf. Columns not used by the evaluation are '-'.
+
+    input
+    -----
+      config_buf   configuration of the track
+      names        list of str, names of the columns
+      labels       np.array of str, label of each trial
+      trial_ids    np.array of str, ID of each trial
+      rng          np.random.Generator
+
+    output
+    ------
+      protocol_pd  pandas dataFrame
+    """
+    import pandas
+
+    num_trial = len(labels)
+    factor_values = get_factor_values(config_buf)
+    flag_spoof = labels == config.g_spoofed_tag
+
+    columns = dict()
+    for name in names:
+        if name == config_buf.index_col:
+            column = trial_ids
+        elif name == 'label':
+            column = labels
+        elif name == config_buf.subset_col:
+            column = rng.choice(_get_protocol_subsets(config_buf), num_trial)
+        elif name == 'trim':
+            column = rng.choice(['notrim', 'trim'], num_trial)
+        elif name in factor_values:
+            column = np.full(num_trial, '-', dtype=object)
+            for flag, values in zip([~flag_spoof, flag_spoof],
+                                    factor_values[name]):
+                if len(values):
+                    column[flag] = rng.choice(values, np.count_nonzero(flag))
+        else:
+            column = np.full(num_trial, '-', dtype=object)
+        columns[name] = column
+    return pandas.DataFrame(columns, columns = names)
+
+
+def generate_track_data(track, num_trial, label_dir, seed = 0):
+    """ generate_track_data(track, num_trial, label_dir, seed = 0)
+
+    Write synthetic CM (and ASV) protocol and score files of a track to
+    label_dir, in the same layout as the downloaded keys. The CM score
+    file is label_dir/TRACK/CM/score.txt, with the trials in random order.
+    """
+    rng = np.random.default_rng(seed)
+    config_buf = main.load_track_config(track)
+
+    def _write(data_pd, filepath):
+        if not os.path.isdir(os.path.dirname(filepath)):
+            os.makedirs(os.path.dirname(filepath))
+        data_pd.to_csv(filepath, sep=' ', header=False, index=False,
+                       float_format='%.6f')
+        return
+
+    # CM protocol and scores
+    labels = np.where(rng.random(num_trial) < g_bonafide_ratio,
+                      config.g_bonafide_tag, config.g_spoofed_tag)
+    trial_ids = np.array(['{:s}_B_{:08d}'.format(track, x)
+                          for x in range(num_trial)], dtype=object)
+    protocol_pd = generate_protocol(config_buf, config_buf.p_names,
+                                    labels, trial_ids, rng)
+    _write(protocol_pd, os.path.join(label_dir, config_buf.protocol_cm_file))
+
+    scores = rng.normal(size = num_trial) + \
+        2.0 * (labels == config.g_bonafide_tag)
+    order = rng.permutation(num_trial)
+    score_pd = protocol_pd.iloc[order][[config_buf.index_col]].assign(
+        **{config_buf.score_col: scores[order]})
+    _write(score_pd[config_buf.s_names],
+           os.path.join(label_dir, track, 'CM', 'score.txt'))
+
+    # ASV protocol and scores
+    if config_buf.flag_tDCF:
+        random_value = rng.random(num_trial)
+        labels = np.full(num_trial, config.g_spoofed_tag, dtype=object)
+        labels[random_value < g_target_ratio + g_nontarget_ratio] = \
+            config.g_nontarget_tag
+        labels[random_value < g_target_ratio] = config.g_target_tag
+        trial_ids = np.array(['{:s}_A_{:08d}'.format(track, x)
+                              for x in range(num_trial)], dtype=object)
+        protocol_pd = generate_protocol(config_buf, config_buf.p_names_asv,
+                                        labels, trial_ids, rng)
+        _write(protocol_pd,
+               os.path.join(label_dir, config_buf.protocol_asv_file))
+
+        scores = rng.normal(size = num_trial) + \
+            3.0 * (labels == config.g_target_tag) + \
+            1.5 * (labels == config.g_spoofed_tag)
+        score_pd = protocol_pd[[config_buf.index_col]].assign(
+            **{config_buf.score_col: scores})
+        score_pd.insert(0, config_buf.s_names_asv[0], '-')
+        _write(score_pd,
+               os.path.join(label_dir, config_buf.pre_score_asv_file))
+    return
+
+
+# ==========
+# benchmark
+# ==========
+
+def _get_stage_times(profiler):
+    stage_times = dict()
+    for item in profiler.to_dict()['stages']:
+        stage_times[item['name']] = \
+            stage_times.get(item['name'], 0) + item['wall_time']
+    return stage_times
+
+
+def _get_peak_rss(profiler):
+    return max(x['peak_rss_mb'] or 0 for x in profiler.to_dict()['stages'])
+
+
+def _median_times(times_list):
+    names = []
+    for stage_times in times_list:
+        names += [x for x in stage_times if x not in names]
+    return {x: float(np.median([y.get(x, 0) for y in times_list]))
+            for x in names}
+
+
+def run_case(track, num_trial, data_dir, repeat = 3, n_jobs = 1, seed = 0):
+    """ result = run_case(track, num_trial, data_dir, repeat = 3,
+                          n_jobs = 1, seed = 0)
+
+    Generate the data of a track (if not in data_dir) and time the C012
+    computation and evaluation_API on the 'eval' subset.
+
+    output
+    ------
+      result   dict, {'track', 'num_trial', 'num_eval_trial',
+                      'c012_stages', 'c012_total', 'stages', 'total',
+                      'throughput', 'peak_rss_mb'}
+               stage times are in seconds, throughput is the number of
+               trials in the protocol per second of evaluation_API
+    """
+    label_dir = os.path.join(data_dir, '{:s}-{:d}'.format(track, num_trial))
+    config_buf = main.load_track_config(track)
+    score_file = os.path.join(label_dir, track, 'CM', 'score.txt')
+    if not os.path.isfile(score_file):
+        generate_track_data(track, num_trial, label_dir, seed)
+    subset_query = main.get_subset_query(config_buf, track, g_bench_subset)
+    result = {'track': track, 'num_trial': num_trial}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # C012, from loading the ASV data to saving C012
+        # the first run imports pandas and builds the protocol cache
+        c012_times = []
+        for _ in range(repeat + 1 if config_buf.flag_tDCF else 0):
+            profiler = profile_tools.StageProfiler()
+            with profiler.stage('load ASV protocol & score'):
+                asv_score_pd, asv_score_file = main.load_asv_score(
+                    config_buf, label_dir)
+                asv_score_pd = asv_score_pd.query(subset_query)
+            with profiler.stage('compute_tDCF_C012'):
+                C012_buf = main.compute_tDCF_C012(
+                    asv_score_pd,
+                    config_buf.factor_name_1, config_buf.factor_1_list,
+                    config_buf.factor_1_type,
+                    config_buf.factor_name_2, config_buf.factor_2_list,
+                    config_buf.factor_2_type,
+                    n_jobs = n_jobs)
+            with profiler.stage('save C012'):
+                eval_wrapper.dump_C012_dict(
+                    C012_buf,
+                    main.get_C012_path(config_buf, g_bench_subset, label_dir,
+                                       flag_recompute = True),
+                    main.get_C012_info(config_buf, g_bench_subset,
+                                       asv_score_file))
+            c012_times.append(_get_stage_times(profiler))
+        if c012_times:
+            result['c012_stages'] = _median_times(c012_times[1:])
+            result['c012_total'] = sum(result['c012_stages'].values())
+
+        # the first run builds the protocol cache and imports the modules
+        main.evaluation_API(score_file, track, g_bench_subset, label_dir,
+                            n_jobs = n_jobs)
+        eval_times = []
+        peak_rss = 0
+        for _ in range(repeat):
+            profiler = profile_tools.StageProfiler()
+            main.evaluation_API(score_file, track, g_bench_subset,
+                                label_dir, n_jobs = n_jobs,
+                                profiler = profiler)
+            eval_times.append(_get_stage_times(profiler))
+            peak_rss = max(peak_rss, _get_peak_rss(profiler))
+
+    protocol_pd, _ = main.load_cm_protocol(config_buf, label_dir)
+    result['num_eval_trial'] = int(np.count_nonzero(
+        main.get_subset_mask(protocol_pd, subset_query)))
+    result['stages'] = _median_times(eval_times)
+    result['total'] = sum(result['stages'].values())
+    result['throughput'] = num_trial / result['total']
+    result['peak_rss_mb'] = peak_rss
+    return result
+
+
+def _process_main(queue, args):
+    try:
+        queue.put(run_case(*args))
+    except (SystemExit, Exception) as err:
+        queue.put({'error': '{:s}: {:s}'.format(type(err).__name__,
+                                                 str(err))})
+    return
+
+def run_case_in_process(*args):
+    """ result = run_case_in_process(*args)
+
+    run_case in a new process, so that the peak memory of each case is
+    measured separately. See run_case for the arguments.
+    """
+    mp_ctx = parallel_tools.get_mp_context()
+    queue = mp_ctx.Queue()
+    process = mp_ctx.Process(target = _process_main, args = (queue, args))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def get_case_name(result):
+    return '{:s}-{:d}'.format(result['track'], result['num_trial'])
+
+
+def compare_results(results, baseline, threshold = 20.0):
+    """ lines, flag_regression = compare_results(results, baseline,
+                                                 threshold = 20.0)
+
+    Compare the total times of the cases with those in the baseline.
+
+    input
+    -----
+      results      list of dict, from run_case
+      baseline     dict, content of a JSON file saved by this script
+      threshold    float, a case is a regression if its total time is
+                   slower than the baseline by more than threshold %
+
+    output
+    ------
+      lines        list of str, comparison table
+      flag_regression  bool, whether any case is a regression
+    """
+    base_cases = {get_case_name(x): x for x in baseline['cases']
+                  if 'error' not in x}
+    lines = ['{:<16s} {:<28s} {:>10s} {:>10s} {:>9s}'.format(
+        'case', 'stage', 'base(s)', 'new(s)', 'delta')]
+    flag_regression = False
+    for result in results:
+        if 'error' in result or get_case_name(result) not in base_cases:
+            continue
+        base = base_cases[get_case_name(result)]
+        items = [(x, base['stages'].get(x), result['stages'][x])
+                 for x in result['stages']]
+        items.append(('total', base['total'], result['total']))
+        if 'c012_total' in result and 'c012_total' in base:
+            items.append(('C012 total', base['c012_total'],
+                          result['c012_total']))
+        for name, base_time, new_time in items:
+            if not base_time:
+                continue
+            delta = (new_time - base_time) / base_time * 100
+            mark = ''
+            if name.endswith('total') and delta > threshold:
+                mark = ' <- slower'
+                flag_regression = True
+            lines.append('{:<16s} {:<28s} {:>10.3f} {:>10.3f} {:>+8.1f}%{:s}'.format(
+                get_case_name(result), name, base_time, new_time, delta, mark))
+    return lines, flag_regression
+
+
+def print_results(results):
+    """ print_results(results)
+
+    Print the stage times, throughput, and peak memory of the cases
+    """
+    for result in results:
+        print("\n=============== {:s} ===============".format(
+            get_case_name(result)))
+        if 'error' in result:
+            print("ERROR: " + result['error'])
+            continue
+        print("{:d} trials in the protocol, {:d} in the {:s} subset".format(
+            result['num_trial'], result['num_eval_trial'], g_bench_subset))
+        stages = list(result.get('c012_stages', dict()).items())
+        if stages:
+            stages.append(('C012 total', result['c012_total']))
+        stages += list(result['stages'].items())
+        stages.append(('evaluation_API total', result['total']))
+        for name, stage_time in stages:
+            print('{:<28s} {:>10.3f} s'.format(name, stage_time))
+        print('{:<28s} {:>10.0f} trials/s'.format(
+            'throughput', result['throughput']))
+        print('{:<28s} {:>10.1f} MB'.format('peak RSS', result['peak_rss_mb']))
+    return
+
+
+def parse_argument():
+    parser = argparse.ArgumentParser(
+        epilog=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    mes = 'Tracks to benchmark. Default LA PA DF'
+    parser.add_argument('--tracks', type=str, nargs='+',
+                        default=config.g_possible_tracks, help=mes)
+
+    mes = 'Number of trials in the synthetic protocols. Default 10000 100000'
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10000, 100000], help=mes)
+
+    mes = 'Number of timed runs of each case. Default 3'
+    parser.add_argument('--repeat', type=int, default=3, help=mes)
+
+    mes = 'Number of processes used by the evaluation (--jobs of main.py).'
+    mes += ' Default 1'
+    parser.add_argument('--jobs', type=int, default=1, help=mes)
+
+    mes = 'Directory of the synthetic data. Data in it are reused. '
+    mes += 'Default: a temporary directory deleted at the end'
+    parser.add_argument('--data-dir', type=str, default="", help=mes)
+
+    mes = 'Random seed of the synthetic data. Default 0'
+    parser.add_argument('--seed', type=int, default=0, help=mes)
+
+    mes = 'Save the results to this JSON file, e.g., as a new baseline'
+    parser.add_argument('--output', type=str, default="", help=mes)
+
+    mes = 'JSON file of a previous run to compare with'
+    parser.add_argument('--baseline', type=str, default="", help=mes)
+
+    mes = 'A case is a regression if its total time is slower than the '
+    mes += 'baseline by more than this percent. Default 20'
+    parser.add_argument('--threshold', type=float, default=20.0, help=mes)
+
+    args = parser.parse_args()
+    for track in args.tracks:
+        if track not in config.g_possible_tracks:
+            print("ERROR: track must be from", str(config.g_possible_tracks))
+            sys.exit(1)
+    if args.baseline and not os.path.isfile(args.baseline):
+        print("ERROR: cannot find {:s}".format(args.baseline))
+        sys.exit(1)
+    return args
+
+
+if __name__ == "__main__":
+
+    args = parse_argument()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix = 'asvspoof-bench-')
+    results = []
+    try:
+        for track in args.tracks:
+            for num_trial in args.sizes:
+                print("Benchmark {:s} with {:d} trials".format(
+                    track, num_trial), flush=True)
+                results.append(run_case_in_process(
+                    track, num_trial, data_dir, args.repeat, args.jobs,
+                    args.seed))
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors = True)
+
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as file_ptr:
+            json.dump({'version': g_bench_version, 'argv': sys.argv,
+                       'repeat': args.repeat, 'jobs': args.jobs,
+                       'cases': results}, file_ptr, indent=1)
+        print("\nResults are saved to {:s}".format(args.output))
+
+    if args.baseline:
+        with open(args.baseline, 'r') as file_ptr:
+            baseline = json.load(file_ptr)
+        lines, flag_regression = compare_results(
+            results, baseline, args.threshold)
+        print("\n===============\nComparison with {:s}\n===============".format(
+            args.baseline))
+        print('\n'.join(lines))
+        if flag_regression:
+            print("\nERROR: total time is slower than the baseline by more "
+                  "than {:.0f}%".format(args.threshold))
+            sys.exit(1)
@@ -33,6 +33,8 @@ g_PA_track = 'PA'
 
 g_possible_subsets = ['eval', 'progress', 'hidden', 'hidden1_PA', 'hidden2_PA']
 g_possible_tracks = ['LA', 'DF', 'PA']
+# --track all or --subset all: evaluate all the tracks or subsets
+g_all_tag = 'all'
 
 # ==========
 # t-DCF configs 
@@ -61,8 +63,11 @@ class ConfigLA:
     """
     def __init__(self):
 
+        self.track = g_LA_track
         self.pooled_tag = 'Pooled'        
         self.subset_col = 'subset'
+        # subsets evaluated by --subset all
+        self.subsets = ['eval', 'progress', 'hidden']
         self.score_col = 'score'
         self.index_col = 'trial'
                 
@@ -131,8 +136,11 @@ class ConfigPA:
     """
     def __init__(self):
 
+        self.track = g_PA_track
         self.index_col = 'trial'
         self.subset_col = 'subset'
+        # subsets evaluated by --subset all
+        self.subsets = ['eval', 'progress', 'hidden1_PA', 'hidden2_PA']
         self.pooled_tag = 'Pooled'
         self.score_col = 'score'
 
@@ -226,8 +234,11 @@ class ConfigDF:
     """
     def __init__(self):
        
+        self.track = g_DF_track
         self.index_col = 'trial'
         self.subset_col = 'subset'
+        # subsets evaluated by --subset all
+        self.subsets = ['eval', 'progress', 'hidden']
         self.pooled_tag = 'Pooled'
         self.score_col = 'score'
 
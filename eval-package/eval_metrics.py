@@ -15,6 +15,11 @@ import numpy as np
 __author__ = "ASVspoof consortium"
 __copyright__ = "Copyright 2022, ASVspoof consortium"
 
+# SortedScoreContext.select sorts the positions of the selected trials if
+# (number of selected trials) * g_select_sort_ratio < (number of trials),
+# otherwise it marks the selected trials over all the trials
+g_select_sort_ratio = 8
+
 
 def obtain_asv_error_rates(tar_asv, non_asv, spoof_asv, asv_threshold):
 
@@ -43,13 +48,37 @@ def compute_det_curve(target_scores, nontarget_scores):
     indices = np.argsort(all_scores, kind='mergesort')
     labels = labels[indices]
 
+    return compute_det_curve_from_sorted(
+        all_scores[indices], labels, target_scores.size, nontarget_scores.size)
+
+
+def compute_det_curve_from_sorted(sorted_scores, sorted_labels, n_target, n_nontarget):
+    """ frr, far, thresholds = compute_det_curve_from_sorted(
+           sorted_scores, sorted_labels, n_target, n_nontarget)
+
+    Compute the DET curve from scores that are already sorted.
+
+    input
+    -----
+      sorted_scores  np.array, scores sorted in ascending order
+      sorted_labels  np.array, labels of the sorted scores
+                     1 (or True) for target, 0 (or False) for nontarget
+      n_target       int, number of target trials
+      n_nontarget    int, number of nontarget trials
+
+    output
+    ------
+      frr, far, thresholds, same as compute_det_curve
+    """
+    n_scores = sorted_labels.size
+
     # Compute false rejection and false acceptance rates
-    tar_trial_sums = np.cumsum(labels)
-    nontarget_trial_sums = nontarget_scores.size - (np.arange(1, n_scores + 1) - tar_trial_sums)
+    tar_trial_sums = np.cumsum(sorted_labels)
+    nontarget_trial_sums = n_nontarget - (np.arange(1, n_scores + 1) - tar_trial_sums)
 
-    frr = np.concatenate((np.atleast_1d(0), tar_trial_sums / target_scores.size))  # false rejection rates
-    far = np.concatenate((np.atleast_1d(1), nontarget_trial_sums / nontarget_scores.size))  # false acceptance rates
-    thresholds = np.concatenate((np.atleast_1d(all_scores[indices[0]] - 0.001), all_scores[indices]))  # Thresholds are the sorted scores
+    frr = np.concatenate((np.atleast_1d(0), tar_trial_sums / n_target))  # false rejection rates
+    far = np.concatenate((np.atleast_1d(1), nontarget_trial_sums / n_nontarget))  # false acceptance rates
+    thresholds = np.concatenate((np.atleast_1d(sorted_scores[0] - 0.001), sorted_scores))  # Thresholds are the sorted scores
 
     return frr, far, thresholds
 
@@ -57,12 +86,539 @@ def compute_det_curve(target_scores, nontarget_scores):
 def compute_eer(target_scores, nontarget_scores):
     """ Returns equal error rate (EER) and the corresponding threshold. """
     frr, far, thresholds = compute_det_curve(target_scores, nontarget_scores)
+    return compute_eer_from_det(frr, far, thresholds)
+
+
+def compute_eer_from_det(frr, far, thresholds):
+    """ Returns EER and the corresponding threshold, given the DET curve. """
     abs_diffs = np.abs(frr - far)
     min_index = np.argmin(abs_diffs)
     eer = np.mean((frr[min_index], far[min_index]))
     return eer, thresholds[min_index]
 
 
+def compute_det_curve_compact_from_sorted(sorted_scores, sorted_labels, 
+                                          n_target, n_nontarget):
+    """ frr, far, thresholds, tar_counts, non_counts = 
+          compute_det_curve_compact_from_sorted(
+            sorted_scores, sorted_labels, n_target, n_nontarget)
+
+    DET curve with one point per unique score (i.e., tied scores are 
+    collapsed into one step), e.g., for quantized scores.
+
+    input
+    -----
+      sorted_scores  np.array, scores sorted in ascending order
+      sorted_labels  np.array, labels of the sorted scores
+                     1 (or True) for target, 0 (or False) for nontarget
+      n_target       int, number of target trials
+      n_nontarget    int, number of nontarget trials
+
+    output
+    ------
+      frr            np.array, (G+1, ), false rejection rates
+      far            np.array, (G+1, ), false acceptance rates
+      thresholds     np.array, (G+1, ), thresholds
+      tar_counts     np.array, (G, ), number of target trials of each 
+                     unique score
+      non_counts     np.array, (G, ), number of nontarget trials of each 
+                     unique score
+
+    G is the number of unique scores. The points are those of 
+    compute_det_curve_from_sorted at the last trial of each unique score
+    (and the first point). Hence, min t-DCF on (frr, far) is identical to
+    that on the full DET curve, and compute_eer_from_compact_det gives the
+    same EER as compute_eer_from_det on the full DET curve.
+    """
+    n_scores = sorted_labels.size
+    if n_scores == 0:
+        return compute_det_curve_from_sorted(
+            sorted_scores, sorted_labels, n_target, n_nontarget) + \
+            (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    # start of each group of tied scores
+    group_start = np.flatnonzero(
+        np.concatenate(([True], sorted_scores[1:] != sorted_scores[:-1])))
+    group_end = np.append(group_start[1:], n_scores)
+
+    tar_counts = np.add.reduceat(sorted_labels.astype(np.int64), group_start)
+    non_counts = (group_end - group_start) - tar_counts
+
+    # same values as compute_det_curve_from_sorted at the end of each group
+    tar_trial_sums = np.cumsum(tar_counts)
+    nontarget_trial_sums = n_nontarget - np.cumsum(non_counts)
+    frr = np.concatenate((np.atleast_1d(0), tar_trial_sums / n_target))
+    far = np.concatenate((np.atleast_1d(1), nontarget_trial_sums / n_nontarget))
+    thresholds = np.concatenate((np.atleast_1d(sorted_scores[0] - 0.001), 
+                                 sorted_scores[group_start]))
+    return frr, far, thresholds, tar_counts, non_counts
+
+
+def compute_det_curve_compact(target_scores, nontarget_scores):
+    """ frr, far, thresholds, tar_counts, non_counts = 
+          compute_det_curve_compact(target_scores, nontarget_scores)
+
+    Same as compute_det_curve, but with one point per unique score.
+    See compute_det_curve_compact_from_sorted.
+    """
+    all_scores = np.concatenate((target_scores, nontarget_scores))
+    labels = np.concatenate((np.ones(target_scores.size, dtype=bool), 
+                             np.zeros(nontarget_scores.size, dtype=bool)))
+    indices = np.argsort(all_scores, kind='mergesort')
+    return compute_det_curve_compact_from_sorted(
+        all_scores[indices], labels[indices], 
+        target_scores.size, nontarget_scores.size)
+
+
+def compute_eer_from_compact_det(frr, far, thresholds, tar_counts, non_counts):
+    """ eer, threshold = compute_eer_from_compact_det(
+          frr, far, thresholds, tar_counts, non_counts)
+
+    EER and the corresponding threshold, given the compact DET curve from 
+    compute_det_curve_compact. They are identical to compute_eer_from_det 
+    on the full DET curve.
+
+    In the full DET curve, the target trials of a unique score come before
+    the nontarget trials of the same score. Between two points of the 
+    compact curve, the full curve first moves along frr (with far fixed), 
+    then along far (with frr fixed). |frr - far| on each move is smallest 
+    near the crossing point, which is located directly. Only a few points 
+    around the crossing are evaluated.
+    """
+    n_target = int(np.sum(tar_counts))
+    n_nontarget = int(np.sum(non_counts))
+    # number of target and remaining nontarget trials before each group
+    tar_prev = np.concatenate(([0], np.cumsum(tar_counts)[:-1]))
+    non_prev = n_nontarget - np.concatenate(([0], np.cumsum(non_counts)[:-1]))
+    # index of the point before each group in the full DET curve
+    index_prev = np.concatenate(
+        ([0], np.cumsum(tar_counts + non_counts)[:-1]))
+    offsets = np.arange(-2, 3)
+
+    # move along frr, k-th target trial of the group, far fixed
+    far_fix = far[:-1]
+    k_est = np.ceil(far_fix * n_target).astype(np.int64) - tar_prev
+    k_cand = np.clip(k_est[:, None] + offsets, 1, 
+                     np.maximum(tar_counts, 1)[:, None])
+    frr_a = (tar_prev[:, None] + k_cand) / n_target
+    far_a = np.broadcast_to(far_fix[:, None], frr_a.shape)
+    diff_a = np.abs(frr_a - far_a)
+    diff_a[tar_counts == 0] = np.inf
+    index_a = index_prev[:, None] + k_cand
+
+    # move along far, j-th nontarget trial of the group, frr fixed
+    frr_fix = frr[1:]
+    j_est = np.round(non_prev - frr_fix * n_nontarget).astype(np.int64)
+    j_cand = np.clip(j_est[:, None] + offsets, 1, 
+                     np.maximum(non_counts, 1)[:, None])
+    far_b = (non_prev[:, None] - j_cand) / n_nontarget
+    frr_b = np.broadcast_to(frr_fix[:, None], far_b.shape)
+    diff_b = np.abs(frr_b - far_b)
+    diff_b[non_counts == 0] = np.inf
+    index_b = (index_prev + tar_counts)[:, None] + j_cand
+
+    # group of each candidate, 0 for the first point
+    group = np.arange(1, len(tar_counts) + 1)[:, None] * \
+            np.ones(len(offsets), dtype=np.int64)
+    cand_diff = np.concatenate(
+        ([np.abs(frr[0] - far[0])], diff_a.ravel(), diff_b.ravel()))
+    cand_index = np.concatenate(([0], index_a.ravel(), index_b.ravel()))
+    cand_frr = np.concatenate(([frr[0]], frr_a.ravel(), frr_b.ravel()))
+    cand_far = np.concatenate(([far[0]], far_a.ravel(), far_b.ravel()))
+    cand_group = np.concatenate(([0], group.ravel(), group.ravel()))
+
+    # first minimum in the order of the full DET curve
+    flag_min = cand_diff == np.min(cand_diff)
+    best = np.flatnonzero(flag_min)[np.argmin(cand_index[flag_min])]
+    eer = np.mean((cand_frr[best], cand_far[best]))
+    return eer, thresholds[cand_group[best]]
+
+
+def downsample_det_curve(frr, far, thresholds, max_points = 2000):
+    """ frr, far, thresholds = downsample_det_curve(frr, far, thresholds,
+                                                    max_points = 2000)
+
+    Keep at most max_points points of a DET curve, e.g., for plotting and
+    storage. Points are kept evenly along the curve (measured by the change
+    of frr plus far). The first, the last, and the EER points are always 
+    kept. The curve is returned as it is if it is short enough.
+    """
+    num_points = len(frr)
+    if num_points <= max_points:
+        return frr, far, thresholds
+    length = np.concatenate(
+        ([0], np.cumsum(np.abs(np.diff(frr)) + np.abs(np.diff(far)))))
+    keep = np.searchsorted(length, np.linspace(0, length[-1], max_points - 3))
+    keep = np.unique(np.concatenate((
+        np.minimum(keep, num_points - 1), 
+        [0, num_points - 1, np.argmin(np.abs(frr - far))])))
+    return frr[keep], far[keep], thresholds[keep]
+
+
+def invert_sorted_scores(sorted_scores, sorted_labels):
+    """ inv_scores, inv_labels = invert_sorted_scores(sorted_scores, 
+                                                      sorted_labels)
+
+    Sorted scores and labels of the negated scores, without sorting again.
+
+    input
+    -----
+      sorted_scores  np.array, scores sorted in ascending order, with target
+                     trials before nontarget trials among tied scores 
+                     (e.g., from compute_det_curve or SortedScoreContext)
+      sorted_labels  np.array, labels of the sorted scores
+
+    output
+    ------
+      inv_scores     np.array, negated scores in ascending order
+      inv_labels     np.array, labels of inv_scores
+
+    The groups of tied scores are reversed as a whole, so that target trials
+    stay before nontarget trials among ties. Hence
+
+      compute_det_curve_from_sorted(inv_scores, inv_labels, ...)
+
+    is identical to compute_det_curve(-target_scores, -nontarget_scores).
+    """
+    n_scores = sorted_scores.size
+    if n_scores == 0:
+        return -sorted_scores, sorted_labels
+    # start and length of each group of tied scores
+    group_start = np.flatnonzero(
+        np.concatenate(([True], sorted_scores[1:] != sorted_scores[:-1])))
+    group_len = np.diff(np.append(group_start, n_scores))
+    # put the groups in reversed order
+    group_start = group_start[::-1]
+    group_len = group_len[::-1]
+    new_start = np.concatenate(([0], np.cumsum(group_len)[:-1]))
+    order = np.arange(n_scores) + np.repeat(group_start - new_start, group_len)
+    return -sorted_scores[order], sorted_labels[order]
+
+
+def compute_det_curve_polarity(target_scores, nontarget_scores):
+    """ det, det_inv = compute_det_curve_polarity(target_scores, 
+                                                  nontarget_scores)
+
+    DET curves of the scores and of the negated scores, with one sort.
+    det is identical to compute_det_curve(target_scores, nontarget_scores),
+    and det_inv to compute_det_curve(-target_scores, -nontarget_scores).
+    Each of them is a tuple (frr, far, thresholds).
+    """
+    all_scores = np.concatenate((target_scores, nontarget_scores))
+    labels = np.concatenate((np.ones(target_scores.size), np.zeros(nontarget_scores.size)))
+    indices = np.argsort(all_scores, kind='mergesort')
+    sorted_scores, sorted_labels = all_scores[indices], labels[indices]
+
+    inv_scores, inv_labels = invert_sorted_scores(sorted_scores, sorted_labels)
+    det = compute_det_curve_from_sorted(
+        sorted_scores, sorted_labels, target_scores.size, nontarget_scores.size)
+    det_inv = compute_det_curve_from_sorted(
+        inv_scores, inv_labels, target_scores.size, nontarget_scores.size)
+    return det, det_inv
+
+
+def compute_polarity_check(bonafide_score_cm, spoof_score_cm, Pfa_asv = None,
+                           Pmiss_asv = None, Pfa_spoof_asv = None,
+                           cost_model = None):
+    """ eer, eer_inv, min_tDCF, min_tDCF_inv = compute_polarity_check(
+          bonafide_score_cm, spoof_score_cm, Pfa_asv = None, 
+          Pmiss_asv = None, Pfa_spoof_asv = None, cost_model = None)
+
+    EER and min t-DCF of the scores and of the negated scores, computed
+    from one sort of the scores. If the negated scores give a lower min 
+    t-DCF (or EER), the class labels were likely swapped in training.
+
+    min_tDCF and min_tDCF_inv are the same as the minimum of compute_tDCF,
+    and they are None if cost_model is None.
+    """
+    det, det_inv = compute_det_curve_polarity(bonafide_score_cm, spoof_score_cm)
+    eer = compute_eer_from_det(*det)[0]
+    eer_inv = compute_eer_from_det(*det_inv)[0]
+    if cost_model is None:
+        return eer, eer_inv, None, None
+
+    # Sanity check of scores, same as compute_tDCF
+    if not np.isfinite(det[2]).all():
+        sys.exit('ERROR: Your scores contain nan or inf.')
+    n_uniq = np.count_nonzero(np.diff(det[2][1:])) + 1
+    if n_uniq < 3:
+        sys.exit('ERROR: You should provide soft CM scores - not binary decisions')
+
+    # Constants - see ASVspoof 2019 evaluation plan, same as compute_tDCF
+    C0 = cost_model['Ptar'] * cost_model['Cmiss'] * Pmiss_asv + cost_model['Pnon']*cost_model['Cfa']*Pfa_asv
+    C1 = cost_model['Ptar'] * cost_model['Cmiss'] - (cost_model['Ptar'] * cost_model['Cmiss'] * Pmiss_asv + cost_model['Pnon'] * cost_model['Cfa'] * Pfa_asv)
+    C2 = cost_model['Pspoof'] * cost_model['Cfa_spoof'] * Pfa_spoof_asv;
+    if C0 < 0 or C1 < 0 or C2 < 0:
+        sys.exit('You should never see this error but I cannot evalute tDCF with negative weights - please check whether your ASV error rates are correctly computed?')
+    tDCF_default = C0 + np.minimum(C1, C2)
+
+    min_tDCF, min_tDCF_inv = [
+        np.min((C0 + C1 * Pmiss_cm + C2 * Pfa_cm) / tDCF_default)
+        for Pmiss_cm, Pfa_cm, _ in (det, det_inv)]
+    return eer, eer_inv, min_tDCF, min_tDCF_inv
+
+
+def compute_det_curve_weighted(sorted_labels, weights):
+    """ frr, far = compute_det_curve_weighted(sorted_labels, weights)
+
+    Compute the DET curves of multiple sets of weighted trials at once,
+    e.g., bootstrap replicates of the trials.
+
+    input
+    -----
+      sorted_labels  np.array of bool, (N, ), labels of the trials sorted
+                     by score, True for target
+      weights        np.array of int, (B, N), weights[b, n] is the number
+                     of times that the n-th trial appears in the b-th set
+
+    output
+    ------
+      frr            np.array, (B, N+1), false rejection rates
+      far            np.array, (B, N+1), false acceptance rates
+
+    If weights are all 1, frr[b] and far[b] are identical to the output of
+    compute_det_curve_from_sorted.
+    """
+    weights = np.atleast_2d(weights)
+    num_set = weights.shape[0]
+
+    all_trial_sums = np.cumsum(weights, axis=1)
+    tar_trial_sums = np.cumsum(weights * sorted_labels, axis=1)
+    nontarget_trial_sums = all_trial_sums - tar_trial_sums
+
+    n_target = tar_trial_sums[:, -1:]
+    n_nontarget = nontarget_trial_sums[:, -1:]
+    frr = np.concatenate(
+        (np.zeros([num_set, 1]), tar_trial_sums / n_target), axis=1)
+    far = np.concatenate(
+        (np.ones([num_set, 1]),
+         (n_nontarget - nontarget_trial_sums) / n_nontarget), axis=1)
+    return frr, far
+
+
+def compute_eer_from_det_batch(frr, far):
+    """ eers = compute_eer_from_det_batch(frr, far)
+
+    Same as compute_eer_from_det, but for multiple DET curves.
+    frr and far are in shape (B, N), eers is in shape (B, ).
+    """
+    min_index = np.argmin(np.abs(frr - far), axis=1)[:, None]
+    return (np.take_along_axis(frr, min_index, axis=1)[:, 0]
+            + np.take_along_axis(far, min_index, axis=1)[:, 0]) / 2
+
+
+def bootstrap_weights(num_trial, num_boot, rng):
+    """ weights = bootstrap_weights(num_trial, num_boot, rng)
+
+    Integer weights of bootstrap replicates.
+    weights[b, n] is the number of times that the n-th trial is drawn
+    in the b-th replicate, and each replicate draws num_trial trials with
+    replacement.
+
+    input
+    -----
+      num_trial  int, number of trials
+      num_boot   int, number of bootstrap replicates
+      rng        np.random.Generator
+
+    output
+    ------
+      weights    np.array, int32, (num_boot, num_trial)
+    """
+    draws = rng.integers(0, num_trial, size=(num_boot, num_trial))
+    draws += np.arange(num_boot)[:, None] * num_trial
+    weights = np.bincount(draws.ravel(), minlength = num_boot * num_trial)
+    return weights.reshape(num_boot, num_trial).astype(np.int32)
+
+
+def compute_error_rates_at_threshold_from_sorted(sorted_scores, sorted_labels,
+                                                 n_target, n_nontarget,
+                                                 threshold):
+    """ frr, far = compute_error_rates_at_threshold_from_sorted(
+          sorted_scores, sorted_labels, n_target, n_nontarget, threshold)
+
+    False rejection and false acceptance rates at a fixed threshold.
+    Trials with scores below the threshold are rejected, as in
+    obtain_asv_error_rates.
+    """
+    n_below = np.searchsorted(sorted_scores, threshold, side='left')
+    tar_below = np.count_nonzero(sorted_labels[:n_below])
+    frr = tar_below / n_target
+    far = (n_nontarget - (n_below - tar_below)) / n_nontarget
+    return frr, far
+
+
+def compute_cllr(target_llrs, nontarget_llrs):
+    """ cllr = compute_cllr(target_llrs, nontarget_llrs)
+
+    Log-likelihood-ratio cost (in bits), where the scores are taken as
+    natural log-likelihood ratios of the target class.
+    """
+    c_tar = np.mean(np.logaddexp(0, -target_llrs))
+    c_non = np.mean(np.logaddexp(0, nontarget_llrs))
+    return (c_tar + c_non) / 2 / np.log(2)
+
+
+def compute_pav_from_sorted(sorted_scores, sorted_labels):
+    """ tar_counts, non_counts = compute_pav_from_sorted(
+          sorted_scores, sorted_labels)
+
+    Pool-adjacent-violators (PAV) on scores that are already sorted.
+    The result is the monotonic (non-decreasing in score) posterior of the
+    target class that best fits the labels.
+
+    input
+    -----
+      sorted_scores  np.array, scores sorted in ascending order
+      sorted_labels  np.array, labels of the sorted scores
+                     1 (or True) for target, 0 (or False) for nontarget
+
+    output
+    ------
+      tar_counts     np.array, (B, ), number of target trials in each block
+      non_counts     np.array, (B, ), number of nontarget trials in each
+                     block
+
+    Blocks are consecutive trials in the sorted order, and the posterior of
+    the trials in a block is tar_counts / (tar_counts + non_counts).
+    Tied scores are in the same block. Runs of tied scores with the same
+    label do not violate each other, and they are merged before the PAV.
+    The PAV then visits each run once (linear time).
+    """
+    n_scores = sorted_labels.size
+    if n_scores == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    labels = np.asarray(sorted_labels, dtype=np.int64)
+
+    # groups of tied scores
+    group_start = np.flatnonzero(
+        np.concatenate(([True], sorted_scores[1:] != sorted_scores[:-1])))
+    group_tar = np.add.reduceat(labels, group_start)
+    group_size = np.diff(np.append(group_start, n_scores))
+
+    # runs of groups with the same label (-1 for groups of both labels)
+    group_type = np.where(group_tar == 0, 0,
+                          np.where(group_tar == group_size, 1, -1))
+    run_start = np.flatnonzero(
+        np.concatenate(([True], (group_type[1:] != group_type[:-1])
+                        | (group_type[1:] < 0))))
+    run_tar = np.add.reduceat(group_tar, run_start).tolist()
+    run_size = np.add.reduceat(group_size, run_start).tolist()
+
+    # PAV, pool the last two blocks as long as their posteriors
+    # are not increasing
+    block_tar = []
+    block_size = []
+    for tar, size in zip(run_tar, run_size):
+        while block_tar and block_tar[-1] * size >= tar * block_size[-1]:
+            tar += block_tar.pop()
+            size += block_size.pop()
+        block_tar.append(tar)
+        block_size.append(size)
+
+    tar_counts = np.array(block_tar, dtype=np.int64)
+    return tar_counts, np.array(block_size, dtype=np.int64) - tar_counts
+
+
+def compute_min_cllr_from_sorted(sorted_scores, sorted_labels):
+    """ min_cllr = compute_min_cllr_from_sorted(sorted_scores, sorted_labels)
+
+    Minimum Cllr (in bits), i.e., Cllr after the optimal monotonic
+    calibration of the scores given by the PAV. See compute_pav_from_sorted
+    for the input arguments.
+    """
+    tar_counts, non_counts = compute_pav_from_sorted(
+        sorted_scores, sorted_labels)
+    n_target = tar_counts.sum()
+    n_nontarget = non_counts.sum()
+
+    # the calibrated LLR of a block is
+    #   log(tar_counts / non_counts) - log(n_target / n_nontarget)
+    # and blocks without target (nontarget) trials give no target
+    # (nontarget) cost
+    tar_flag = tar_counts > 0
+    non_flag = non_counts > 0
+    c_tar = np.sum(tar_counts[tar_flag] * np.log1p(
+        non_counts[tar_flag] * n_target
+        / (tar_counts[tar_flag] * n_nontarget)))
+    c_non = np.sum(non_counts[non_flag] * np.log1p(
+        tar_counts[non_flag] * n_nontarget
+        / (non_counts[non_flag] * n_target)))
+    return (c_tar / n_target + c_non / n_nontarget) / 2 / np.log(2)
+
+
+class SortedScoreContext:
+    """ ctx = SortedScoreContext(scores, positive_flag)
+
+    Scores of all the trials sorted once. The DET curve of any subset of
+    the trials is then computed by a masked cumulative sum over the sorted
+    trials, without sorting the scores again.
+
+    input
+    -----
+      scores         np.array, scores of all the trials
+      positive_flag  np.array of bool, True for positive trials
+                     (e.g., bona fide trials for CM, target trials for ASV)
+
+    Among trials with the same score, positive trials are put before the
+    other trials, and trials of the same class are kept in the input order.
+    This is the order given by compute_det_curve. Hence, 
+
+      ctx.det_curve(tar_idx, non_idx)
+
+    is identical to 
+
+      compute_det_curve(scores[tar_idx], scores[non_idx])
+
+    if tar_idx are sorted indices of positive trials, and non_idx are sorted
+    indices of the other trials.
+    """
+    def __init__(self, scores, positive_flag):
+        self.scores = np.asarray(scores)
+        self.num_trial = self.scores.size
+
+        # sort by score, then by class (positive first), then by input order
+        positive_flag = np.asarray(positive_flag, dtype=bool)
+        self.order = np.lexsort((~positive_flag, self.scores))
+        self.sorted_scores = self.scores[self.order]
+
+        # position of each trial in the sorted order
+        self.rank = np.empty(self.num_trial, dtype=np.int64)
+        self.rank[self.order] = np.arange(self.num_trial)
+        return
+
+    def select(self, target_idx, nontarget_idx):
+        """ sorted_scores, sorted_labels = select(target_idx, nontarget_idx)
+
+        Sorted scores and labels (True for target) of a subset of trials
+        """
+        num_select = len(target_idx) + len(nontarget_idx)
+        if num_select * g_select_sort_ratio < self.num_trial:
+            # small subset, sort the positions of the selected trials
+            position = np.concatenate(
+                (self.rank[target_idx], self.rank[nontarget_idx]))
+            labels = np.zeros(num_select, dtype=bool)
+            labels[:len(target_idx)] = True
+            order = np.argsort(position)
+            position = position[order]
+            return self.sorted_scores[position], labels[order]
+
+        # large subset, mark the selected trials over all the trials
+        flag = np.zeros(self.num_trial, dtype=np.int8)
+        flag[self.rank[nontarget_idx]] = 1
+        flag[self.rank[target_idx]] = 2
+        position = np.flatnonzero(flag)
+        return self.sorted_scores[position], flag[position] == 2
+
+    def det_curve(self, target_idx, nontarget_idx):
+        """ frr, far, thresholds = det_curve(target_idx, nontarget_idx)
+
+        DET curve of a subset of trials, same as compute_det_curve
+        """
+        sorted_scores, sorted_labels = self.select(target_idx, nontarget_idx)
+        return compute_det_curve_from_sorted(
+            sorted_scores, sorted_labels, len(target_idx), len(nontarget_idx))
+
+
 def compute_tDCF(bonafide_score_cm, spoof_score_cm, Pfa_asv, Pmiss_asv, Pfa_spoof_asv, cost_model, print_cost):
     """
     Compute Tandem Detection Cost Function (t-DCF) [1] for a fixed ASV system.
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+Local evaluation server over a Unix domain socket
+
+The server is started by main.py:
+
+   python main.py --serve --socket /tmp/asvspoof-eval.sock --metadata keys
+
+It keeps the protocols, C012 coefficients, and factor indices of the
+recently used tracks in memory. Each request is one line of JSON, and each
+response is one line of JSON:
+
+   request  {"track": "LA", "subset": "eval",
+             "cm_score_file": "/path/to/score.txt"}
+   or       {"track": "LA", "subset": "eval",
+             "trial_ids": ["LA_E_1000147", ...], "scores": [0.1, ...]}
+
+   optional fields: "bootstrap": int, "c012_path": str
+
+   response {"status": "ok", "min_tDCF": [[...]], "EER": [[...]], ...}
+            (see result_tools.results_to_dict for the fields)
+   or       {"status": "error", "message": "..."}
+
+   Other requests: {"command": "ping"}, {"command": "shutdown"}
+
+This module can also be used as a client, which only imports the standard
+library and hence starts quickly:
+
+   python eval_server.py --socket /tmp/asvspoof-eval.sock
+                         --track LA --subset eval --cm-score-file score.txt
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import sys
+import json
+import socket
+import argparse
+import socketserver
+
+__author__ = "ASVspoof consortium"
+__copyright__ = "Copyright 2022, ASVspoof consortium"
+
+
+# default path of the socket
+g_default_socket = '/tmp/asvspoof-eval.sock'
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line.decode('utf-8'))
+            except ValueError as err:
+                request = {}
+                response = {'status': 'error',
+                            'message': 'invalid JSON: {:s}'.format(str(err))}
+            else:
+                if not isinstance(request, dict):
+                    response = {'status': 'error',
+                                'message': 'request should be a JSON object'}
+                    request = {}
+                else:
+                    response = self.server.process_json(request)
+            self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+            self.wfile.flush()
+            if request.get('command') == 'shutdown':
+                self.server.flag_shutdown = True
+                return
+        return
+
+
+class _UnixServer(socketserver.UnixStreamServer):
+    def __init__(self, socket_path, handle_request):
+        self.handle_request_func = handle_request
+        self.flag_shutdown = False
+        socketserver.UnixStreamServer.__init__(
+            self, socket_path, _RequestHandler)
+
+    def process_json(self, request):
+        if request.get('command') == 'ping':
+            return {'status': 'ok'}
+        elif request.get('command') == 'shutdown':
+            return {'status': 'ok', 'message': 'shutdown'}
+        try:
+            return self.handle_request_func(request)
+        except (SystemExit, Exception) as err:
+            return {'status': 'error', 'message': str(err)}
+
+
+def serve(socket_path, handle_request):
+    """ serve(socket_path, handle_request)
+
+    Serve requests on a Unix domain socket until a shutdown request arrives.
+    Requests are handled one by one.
+
+    input
+    -----
+      socket_path     str, path to the socket
+      handle_request  function, response = handle_request(request), where
+                      request and response are dict
+    """
+    if os.path.exists(socket_path):
+        # remove the socket left by a previous server
+        try:
+            send_request(socket_path, {'command': 'ping'})
+        except (OSError, ValueError):
+            os.remove(socket_path)
+        else:
+            print("Another server is running on {:s}".format(socket_path))
+            sys.exit(1)
+
+    server = _UnixServer(socket_path, handle_request)
+    print("Listening on {:s}".format(socket_path), flush=True)
+    try:
+        while not server.flag_shutdown:
+            server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+    return
+
+
+def send_request(socket_path, request, timeout = None):
+    """ response = send_request(socket_path, request, timeout = None)
+
+    Send a request (dict) to the server and return the response (dict)
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        with sock.makefile('rb') as file_ptr:
+            line = file_ptr.readline()
+    if not line:
+        raise ValueError("No response from {:s}".format(socket_path))
+    return json.loads(line.decode('utf-8'))
+
+
+def _parse_client_argument():
+    parser = argparse.ArgumentParser(
+        epilog=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--socket', type=str, default=g_default_socket,
+                        help='Path to the socket of the server')
+    parser.add_argument('--cm-score-file', type=str, default="",
+                        help='CM score file (two column, txt format)')
+    parser.add_argument('--track', type=str, default="",
+                        help='Name of the track, either LA, PA, or DF')
+    parser.add_argument('--subset', type=str, default="eval",
+                        help='Name of the subset')
+    parser.add_argument('--c012-path', type=str, default="",
+                        help='Path to external C012 data dictionary')
+    parser.add_argument('--bootstrap', type=int, default=0,
+                        help='Number of bootstrap replicates')
+    parser.add_argument('--shutdown', action='store_true', default=False,
+                        help='Stop the server')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_client_argument()
+    if args.shutdown:
+        request = {'command': 'shutdown'}
+    else:
+        request = {'track': args.track, 'subset': args.subset,
+                   'cm_score_file': os.path.abspath(args.cm_score_file),
+                   'bootstrap': args.bootstrap}
+        if args.c012_path:
+            request['c012_path'] = os.path.abspath(args.c012_path)
+    response = send_request(args.socket, request)
+    print(json.dumps(response, indent=1))
+    sys.exit(0 if response.get('status') == 'ok' else 1)
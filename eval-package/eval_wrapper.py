@@ -6,23 +6,127 @@ Wrapper functions over eval_metrics
 from __future__ import absolute_import
 from __future__ import print_function
 
+import os
 import sys
+import json
+import hashlib
 import numpy as np
 import eval_metrics as em
 
 __author__ = "ASVspoof consortium"
 __copyright__ = "Copyright 2022, ASVspoof consortium"
 
+# maximum number of (replicate, trial) pairs in one batch of bootstrap
+g_boot_max_elements = 2 ** 22
+
+# get_mintDCF_eer_sorted uses the compact DET curve (one point per unique
+# score) if (number of unique scores) * g_compact_det_ratio <= (number of 
+# trials)
+g_compact_det_ratio = 8
+
+# name and version of the C012 file format written by dump_C012_dict
+g_c012_format = 'ASVspoof-C012'
+g_c012_version = 1
+
 #=================
 # Helper functions
 #=================
 
-def dump_C012_dict(data_dict, filepath):
-    np.array(data_dict).dump(filepath)
+def get_file_sha256(filepath):
+    """ digest = get_file_sha256(filepath)
+
+    SHA-256 of a file in hex string
+    """
+    sha = hashlib.sha256()
+    with open(filepath, 'rb') as file_ptr:
+        for block in iter(lambda: file_ptr.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def dump_C012_dict(data_dict, filepath, info = None):
+    """ dump_C012_dict(data_dict, filepath, info = None)
+
+    Save C012 dictionary to a JSON file.
+
+    input
+    -----
+      data_dict  dictionary, C012[factor_1][factor_2]['C0'] -> C0 ...
+      filepath   str, path to the output file
+      info       dictionary, saved together with the C012 values, e.g.,
+                 {'cost_model': ..., 'asv_score_sha256': ...}
+                 See check_C012_info.
+    """
+    data_buf = {'format': g_c012_format, 'version': g_c012_version}
+    if info is not None:
+        data_buf.update(info)
+    data_buf['C012'] = data_dict
+    with open(filepath, 'w') as file_ptr:
+        json.dump(data_buf, file_ptr, indent=1)
     return 
 
+def load_C012_file(filepath):
+    """ C012_dict, info = load_C012_file(filepath)
+
+    Load C012 dictionary saved by dump_C012_dict, or by the previous 
+    version of this package (a pickled numpy array). 
+    info is the dictionary saved with the C012 values, or None for the 
+    previous version.
+    """
+    with open(filepath, 'rb') as file_ptr:
+        flag_json = file_ptr.read(64).lstrip().startswith(b'{')
+    if not flag_json:
+        return dict(np.load(filepath, allow_pickle=True).tolist()), None
+
+    with open(filepath, 'r') as file_ptr:
+        info = json.load(file_ptr)
+    if info.get('format') != g_c012_format:
+        raise ValueError("{:s} is not a C012 file".format(filepath))
+    if info.get('version', 0) > g_c012_version:
+        raise ValueError("{:s} is saved by a newer version (v{:d})".format(
+            filepath, info['version']))
+    return info.pop('C012'), info
+
 def load_C012_dict(filepath):
-    return dict(np.load(filepath, allow_pickle=True).tolist())
+    return load_C012_file(filepath)[0]
+
+def check_C012_info(info, cost_model, track, subset, asv_score_file = None):
+    """ reasons = check_C012_info(info, cost_model, track, subset,
+                                  asv_score_file = None)
+
+    Check whether the C012 values saved with info are computed with the 
+    given configuration.
+
+    input
+    -----
+      info            dictionary, see load_C012_file
+      cost_model      dictionary, cost model of t-DCF
+      track           str, name of the track
+      subset          str, name of the subset
+      asv_score_file  str, path to the ASV score file
+                      If None, the ASV score file saved in info is checked 
+                      (if it still exists)
+
+    output
+    ------
+      reasons         list of str, why the C012 values are out of date.
+                      Empty if they are up to date.
+    """
+    reasons = []
+    if info is None:
+        # previous version, nothing to check
+        return reasons
+    if info.get('cost_model') != cost_model:
+        reasons.append("cost model is different")
+    for name, value in [('track', track), ('subset', subset)]:
+        if info.get(name) != value:
+            reasons.append("computed for {:s} {:s}".format(
+                name, str(info.get(name))))
+    if asv_score_file is None or len(asv_score_file) == 0:
+        asv_score_file = info.get('asv_score_file')
+    if asv_score_file and os.path.isfile(asv_score_file) and \
+       get_file_sha256(asv_score_file) != info.get('asv_score_sha256'):
+        reasons.append("{:s} has been modified".format(asv_score_file))
+    return reasons
 
 #=================
 # Wrappers
@@ -225,6 +329,85 @@ def get_tDCF_C012_from_asv_scores(tar_asv, non_asv, spoof_asv, cost_model):
 
     return C0, C1, C2
 
+def get_tDCF_C012_sorted(asv_ctx, tar_idx, non_idx, spoof_idx, cost_model):
+    """ C0, C1, C2 = get_tDCF_C012_sorted(asv_ctx, tar_idx, non_idx, 
+                                          spoof_idx, cost_model)
+
+    Same as get_tDCF_C012_from_asv_scores, but the ASV scores are retrieved
+    from a eval_metrics.SortedScoreContext, which avoids sorting the scores 
+    again when computing the ASV EER threshold.
+
+    input
+    -----
+      asv_ctx    eval_metrics.SortedScoreContext, over ASV scores
+                 target trials should be the positive trials
+      tar_idx    np.array, sorted indices of target speaker trials
+      non_idx    np.array, sorted indices of non-target speaker trials
+      spoof_idx  np.array, sorted indices of spoofed trials
+
+    output
+    ------
+      C0                 scalar, coefficient for min tDCF computation
+      C1                 scalar, coefficient for min tDCF computation
+      C2                 scalar, coefficient for min tDCF computation
+    """
+    C0, C1, C2 = get_tDCF_C012_cells(
+        asv_ctx, [(tar_idx, non_idx, spoof_idx)], cost_model)
+    return C0[0], C1[0], C2[0]
+
+def get_tDCF_C012_cells(asv_ctx, cells, cost_model):
+    """ C0, C1, C2 = get_tDCF_C012_cells(asv_ctx, cells, cost_model)
+
+    Same as get_tDCF_C012_sorted, but for many cells at once.
+
+    For each cell, the ASV EER threshold is found on the target and 
+    non-target scores selected from the pre-sorted asv_ctx. The error rates
+    are counted on the sorted scores, and C012 of all the cells are 
+    computed together.
+
+    input
+    -----
+      asv_ctx    eval_metrics.SortedScoreContext, over ASV scores
+                 target trials should be the positive trials
+      cells      list of (tar_idx, non_idx, spoof_idx), see 
+                 get_tDCF_C012_sorted
+
+    output
+    ------
+      C0         np.array, (num_cell, ), NaN if a cell has no target,
+                 non-target, or spoofed trials
+      C1         np.array, (num_cell, )
+      C2         np.array, (num_cell, )
+    """
+    Pfa_asv = np.full(len(cells), np.nan)
+    Pmiss_asv = np.full(len(cells), np.nan)
+    Pfa_spoof_asv = np.full(len(cells), np.nan)
+
+    for cell_idx, (tar_idx, non_idx, spoof_idx) in enumerate(cells):
+        if not (len(tar_idx) and len(non_idx) and len(spoof_idx)):
+            continue
+        # ASV threshold at EER
+        sorted_scores, sorted_labels = asv_ctx.select(tar_idx, non_idx)
+        frr, far, thresholds = em.compute_det_curve_from_sorted(
+            sorted_scores, sorted_labels, len(tar_idx), len(non_idx))
+        eer_asv, asv_threshold = em.compute_eer_from_det(frr, far, thresholds)
+
+        # target trials below and non-target trials above the threshold,
+        # same as em.obtain_asv_error_rates
+        num_miss = np.searchsorted(
+            sorted_scores[sorted_labels], asv_threshold, side='left')
+        num_fa = len(non_idx) - np.searchsorted(
+            sorted_scores[~sorted_labels], asv_threshold, side='left')
+        num_fa_spoof = np.count_nonzero(
+            asv_ctx.scores[spoof_idx] >= asv_threshold)
+
+        Pfa_asv[cell_idx] = num_fa / len(non_idx)
+        Pmiss_asv[cell_idx] = num_miss / len(tar_idx)
+        Pfa_spoof_asv[cell_idx] = num_fa_spoof / len(spoof_idx)
+
+    # get the C012 values
+    return get_tDCF_C012(Pfa_asv, Pmiss_asv, Pfa_spoof_asv, cost_model)
+
 def get_mintDCF_eer(bonafide_score_cm, spoof_score_cm, C0, C1, C2):
     """ mintDCF, eer = get_mintDCF_eer(bonafide_score_cm, 
                                        spoof_score_cm, C0, C1, C2)
@@ -275,7 +458,148 @@ def get_mintDCF_eer(bonafide_score_cm, spoof_score_cm, C0, C1, C2):
     # Obtain miss and false alarm rates of CM
     Pmiss_cm, Pfa_cm, CM_thresholds = em.compute_det_curve(
         bonafide_score_cm, spoof_score_cm)
+
+    return get_mintDCF_eer_from_det(Pmiss_cm, Pfa_cm, C0, C1, C2)
+
+
+def get_mintDCF_eer_sorted(score_ctx, bonafide_idx, spoof_idx, C0, C1, C2):
+    """ mintDCF, eer = get_mintDCF_eer_sorted(score_ctx, bonafide_idx, 
+                                              spoof_idx, C0, C1, C2)
+
+    Same as get_mintDCF_eer, but the scores are retrieved from a 
+    eval_metrics.SortedScoreContext, which avoids sorting the scores again.
+    
+    input
+    -----
+      score_ctx          eval_metrics.SortedScoreContext, over CM scores
+                         bona fide trials should be the positive trials
+      bonafide_idx       np.array, sorted indices of bonafide trials
+      spoof_idx          np.array, sorted indices of spoofed trials
+      C0                 scalar, coefficient for min tDCF computation
+      C1                 scalar, coefficient for min tDCF computation
+      C2                 scalar, coefficient for min tDCF computation
     
+    output
+    ------
+      mintDCF            scalar, value of min tDCF
+      eer                scalar, value of EER
+    """
+    sorted_scores, sorted_labels = score_ctx.select(bonafide_idx, spoof_idx)
+    return get_mintDCF_eer_from_sorted(
+        sorted_scores, sorted_labels, len(bonafide_idx), len(spoof_idx),
+        C0, C1, C2)
+
+
+def get_mintDCF_eer_from_sorted(sorted_scores, sorted_labels, 
+                                num_bonafide, num_spoof, C0, C1, C2):
+    """ mintDCF, eer = get_mintDCF_eer_from_sorted(sorted_scores, 
+          sorted_labels, num_bonafide, num_spoof, C0, C1, C2)
+
+    Same as get_mintDCF_eer_sorted, given the sorted scores and labels 
+    (True for bona fide) from eval_metrics.SortedScoreContext.select
+    """
+    # Sanity check of scores
+    if not np.isfinite(sorted_scores).all():
+        sys.exit('ERROR: Your scores contain nan or inf.')
+
+    # Sanity check that inputs are scores and not decisions
+    n_uniq = np.count_nonzero(np.diff(sorted_scores)) + 1
+    if n_uniq < 3:
+        sys.exit('ERROR: You should provide soft CM scores - not binary decisions')
+
+    if n_uniq * g_compact_det_ratio <= len(sorted_scores):
+        # many tied scores, use one point per unique score
+        compact_det = em.compute_det_curve_compact_from_sorted(
+            sorted_scores, sorted_labels, num_bonafide, num_spoof)
+        return get_mintDCF_eer_from_compact_det(compact_det, C0, C1, C2)
+
+    # Obtain miss and false alarm rates of CM
+    Pmiss_cm, Pfa_cm, CM_thresholds = em.compute_det_curve_from_sorted(
+        sorted_scores, sorted_labels, num_bonafide, num_spoof)
+
+    return get_mintDCF_eer_from_det(Pmiss_cm, Pfa_cm, C0, C1, C2)
+
+
+def get_calibration_from_sorted(sorted_scores, sorted_labels, 
+                                num_bonafide, num_spoof, C0, C1, C2, 
+                                threshold):
+    """ actDCF, cllr, min_cllr = get_calibration_from_sorted(sorted_scores,
+          sorted_labels, num_bonafide, num_spoof, C0, C1, C2, threshold)
+
+    Calibration metrics of CM scores, given the sorted scores and labels 
+    (True for bona fide) from eval_metrics.SortedScoreContext.select
+
+    input
+    -----
+      sorted_scores      np.array, CM scores sorted in ascending order
+      sorted_labels      np.array, True for bona fide trials
+      num_bonafide       int, number of bona fide trials
+      num_spoof          int, number of spoofed trials
+      C0                 scalar, coefficient for t-DCF computation
+      C1                 scalar, coefficient for t-DCF computation
+      C2                 scalar, coefficient for t-DCF computation
+      threshold          scalar, CM threshold, trials with scores below
+                         the threshold are rejected
+    
+    output
+    ------
+      actDCF             scalar, normalized t-DCF at the threshold
+                         (NaN if C0, C1, or C2 is NaN)
+      cllr               scalar, Cllr of the scores taken as LLRs (bits)
+      min_cllr           scalar, Cllr after the PAV calibration (bits)
+    """
+    if np.isnan(C0) or np.isnan(C1) or np.isnan(C2):
+        actDCF = np.nan
+    else:
+        Pmiss_cm, Pfa_cm = em.compute_error_rates_at_threshold_from_sorted(
+            sorted_scores, sorted_labels, num_bonafide, num_spoof, threshold)
+        actDCF = (C0 + C1 * Pmiss_cm + C2 * Pfa_cm) / (C0 + np.minimum(C1, C2))
+
+    cllr = em.compute_cllr(sorted_scores[sorted_labels], 
+                           sorted_scores[~sorted_labels])
+    min_cllr = em.compute_min_cllr_from_sorted(sorted_scores, sorted_labels)
+    return actDCF, cllr, min_cllr
+
+
+def get_mintDCF_eer_polarity(score_ctx, bonafide_idx, spoof_idx, C0, C1, C2):
+    """ (mintDCF, eer), (mintDCF_inv, eer_inv) = get_mintDCF_eer_polarity(
+          score_ctx, bonafide_idx, spoof_idx, C0, C1, C2)
+
+    Same as get_mintDCF_eer_sorted, but also return min tDCF and EER of
+    the negated scores. They are computed from the same sorted scores, 
+    see eval_metrics.invert_sorted_scores.
+    """
+    sorted_scores, sorted_labels = score_ctx.select(bonafide_idx, spoof_idx)
+    inv_scores, inv_labels = em.invert_sorted_scores(
+        sorted_scores, sorted_labels)
+
+    results = []
+    for scores, labels in [(sorted_scores, sorted_labels), 
+                           (inv_scores, inv_labels)]:
+        Pmiss_cm, Pfa_cm, CM_thresholds = em.compute_det_curve_from_sorted(
+            scores, labels, len(bonafide_idx), len(spoof_idx))
+        results.append(get_mintDCF_eer_from_det(Pmiss_cm, Pfa_cm, C0, C1, C2))
+    return results[0], results[1]
+
+
+def get_mintDCF_eer_from_det(Pmiss_cm, Pfa_cm, C0, C1, C2):
+    """ mintDCF, eer = get_mintDCF_eer_from_det(Pmiss_cm, Pfa_cm, C0, C1, C2)
+
+    Compute min t-DCF and EER given the miss and false alarm rates of CM.
+
+    input
+    -----
+      Pmiss_cm           np.array, miss rates of CM
+      Pfa_cm             np.array, false alarm rates of CM
+      C0                 scalar, coefficient for min tDCF computation
+      C1                 scalar, coefficient for min tDCF computation
+      C2                 scalar, coefficient for min tDCF computation
+    
+    output
+    ------
+      mintDCF            scalar, value of min tDCF
+      eer                scalar, value of EER
+    """
     # =====
     # tDCF
     # =====
@@ -302,5 +626,87 @@ def get_mintDCF_eer(bonafide_score_cm, spoof_score_cm, C0, C1, C2):
     return mintDCF, eer
 
 
+def get_mintDCF_eer_from_compact_det(compact_det, C0, C1, C2):
+    """ mintDCF, eer = get_mintDCF_eer_from_compact_det(compact_det, 
+                                                        C0, C1, C2)
+
+    Same as get_mintDCF_eer_from_det on the full DET curve, given the 
+    compact DET curve from eval_metrics.compute_det_curve_compact.
+    """
+    Pmiss_cm, Pfa_cm = compact_det[0], compact_det[1]
+    mintDCF, _ = get_mintDCF_eer_from_det(Pmiss_cm, Pfa_cm, C0, C1, C2)
+    eer, _ = em.compute_eer_from_compact_det(*compact_det)
+    return mintDCF, eer
+
+
+def get_mintDCF_eer_bootstrap(score_ctx, bonafide_idx, spoof_idx, 
+                              C0, C1, C2, num_boot, rng):
+    """ mintDCFs, eers = get_mintDCF_eer_bootstrap(score_ctx, bonafide_idx, 
+                                  spoof_idx, C0, C1, C2, num_boot, rng)
+
+    Compute min t-DCF and EER on bootstrap replicates of the trials.
+    Bona fide and spoofed trials are resampled with replacement separately.
+    The replicates are computed in batches, using integer weights over the
+    trials sorted in score_ctx.
+
+    input
+    -----
+      score_ctx          eval_metrics.SortedScoreContext, over CM scores
+                         bona fide trials should be the positive trials
+      bonafide_idx       np.array, sorted indices of bonafide trials
+      spoof_idx          np.array, sorted indices of spoofed trials
+      C0                 scalar, coefficient for min tDCF computation
+      C1                 scalar, coefficient for min tDCF computation
+      C2                 scalar, coefficient for min tDCF computation
+      num_boot           int, number of bootstrap replicates
+      rng                np.random.Generator
+    
+    output
+    ------
+      mintDCFs           np.array, (num_boot, ), min tDCF of the replicates
+      eers               np.array, (num_boot, ), EER of the replicates
+    """
+    _, sorted_labels = score_ctx.select(bonafide_idx, spoof_idx)
+    num_trial = sorted_labels.size
+
+    mintDCFs = np.zeros([num_boot])
+    eers = np.zeros([num_boot])
+    
+    # number of replicates in one batch, limited by memory
+    batch_size = max(1, g_boot_max_elements // num_trial)
+    for start in range(0, num_boot, batch_size):
+        num_batch = min(batch_size, num_boot - start)
+        weights = np.zeros([num_batch, num_trial], dtype=np.int32)
+        weights[:, sorted_labels] = em.bootstrap_weights(
+            len(bonafide_idx), num_batch, rng)
+        weights[:, ~sorted_labels] = em.bootstrap_weights(
+            len(spoof_idx), num_batch, rng)
+
+        Pmiss_cm, Pfa_cm = em.compute_det_curve_weighted(sorted_labels, weights)
+        
+        if np.isnan(C0) or np.isnan(C1) or np.isnan(C2): 
+            mintDCFs[start:start+num_batch] = np.nan
+        else:
+            tDCF_norm = (C0 + C1 * Pmiss_cm + C2 * Pfa_cm) / \
+                        (C0 + np.minimum(C1, C2))
+            mintDCFs[start:start+num_batch] = tDCF_norm.min(axis=1)
+        eers[start:start+num_batch] = em.compute_eer_from_det_batch(
+            Pmiss_cm, Pfa_cm)
+    return mintDCFs, eers
+
+
+def get_confidence_interval(values, ci_alpha = 0.05):
+    """ lower, upper = get_confidence_interval(values, ci_alpha = 0.05)
+
+    Percentile confidence interval at level (1 - ci_alpha) from the 
+    bootstrap replicates. NaN if any value is NaN.
+    """
+    if np.isnan(values).any():
+        return np.nan, np.nan
+    lower, upper = np.percentile(
+        values, [ci_alpha / 2 * 100, (1 - ci_alpha / 2) * 100])
+    return lower, upper
+
+
 if __name__ == "__main__":
     print("eval_wrapper")
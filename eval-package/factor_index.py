@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+"""
+Integer-encoded index over the factors of a protocol
+
+Each factor column (e.g., attack, codec) is encoded into integer codes once.
+The sorted indices of the trials that have a given label and a given factor
+value are computed once and cached.
+
+The trials in one cell of the decomposed tables are then retrieved by
+intersecting the cached indices, rather than by scanning the whole
+dataFrame with a new query for each cell.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import numpy as np
+
+import config
+
+__author__ = "ASVspoof consortium"
+__copyright__ = "Copyright 2022, ASVspoof consortium"
+
+
+# ==========
+# helper functions
+# ==========
+
+def flatten_factors(factor_name, factor_value, factor_type):
+    """ factor_list = flatten_factors(factor_name, factor_value, factor_type)
+
+    Flatten a group of factors into a list of (name, value, type).
+
+    input
+    -----
+      factor_name   str or list of str, name(s) of the factor data series
+      factor_value  list of str, or list of list of str, factor values
+      factor_type   str or list of str, type(s) of the factor
+
+      See compute_decomposed_mintdcf_eer in main.py for details
+
+    output
+    ------
+      factor_list   list of tuple (name, value, type), one for each row
+                    (or column) of the result table, in the order of the
+                    table
+    """
+    def _wrap_list(data):
+         return [data] if type(data) is str else data
+
+    def _wrap_list_list(data):
+         return [data] if type(data[0]) is str else data
+
+    factor_names = _wrap_list(factor_name)
+    factor_types = _wrap_list(factor_type)
+    factor_lists = _wrap_list_list(factor_value)
+
+    factor_list = []
+    for name, values, ftype in zip(factor_names, factor_lists, factor_types):
+        for value in values:
+            factor_list.append((name, value, ftype))
+    return factor_list
+
+
+def factor_condition(factor_name, factor_value, factor_type,
+                     flag_spoof, pooled_tag = config.g_pooled_tag):
+    """ condition = factor_condition(factor_name, factor_value, factor_type,
+                                     flag_spoof, pooled_tag = 'Pooled')
+
+    Get the condition that a factor imposes on bona fide or spoofed trials.
+
+    input
+    -----
+      factor_name   str, name of the factor data series
+      factor_value  str, value of the factor
+      factor_type   str, type of the factor, 'spoof', 'bonafide', or 'both'
+      flag_spoof    bool, True for spoofed trials,
+                    False for bona fide (or target, non-target) trials
+      pooled_tag    str, tag for pooled condition, default 'Pooled'
+
+    output
+    ------
+      condition     list of (factor_name, factor_value)
+                    empty list if the factor does not apply
+    """
+    if factor_value == pooled_tag:
+        # pooled condition
+        return []
+    elif factor_type == config.g_factor_type_spoof:
+        # if factor is only for spoofed data (e.g., attack type)
+        return [(factor_name, factor_value)] if flag_spoof else []
+    elif factor_type == config.g_factor_type_bonafide:
+        # if factor is only for bonafide
+        return [] if flag_spoof else [(factor_name, factor_value)]
+    else:
+        # if factor is for both spoofed and bona fide data (e.g., codec)
+        return [(factor_name, factor_value)]
+
+
+# ==========
+# index
+# ==========
+
+class FactorIndex:
+    """Integer-encoded index over the label and factors of trials
+
+    factor_idx = FactorIndex(data_pd, label_col = 'label')
+
+    # indices of spoofed trials with attack A07 and codec alaw
+    idx = factor_idx.get_cell_index(
+              'spoof', [('attack', 'A07'), ('codec', 'alaw')])
+
+    Factor columns are encoded only when they are used for the first time.
+    The returned indices are sorted and can be used to index numpy arrays
+    that follow the order of data_pd, e.g., data_pd['score'].to_numpy().
+    """
+    def __init__(self, data_pd, label_col = 'label'):
+        self.data_pd = data_pd
+        self.label_col = label_col
+        self.num_trial = len(data_pd)
+
+        # column name -> (codes, {value: code})
+        self._codes = dict()
+        # (column name, value) -> boolean mask over trials
+        self._masks = dict()
+        # (label, column name, value) -> sorted indices of trials
+        self._indices = dict()
+        return
+
+    def get_codes(self, col):
+        """ codes, value_dict = get_codes(col)
+
+        Integer codes of a column and the dictionary {value: code}
+        """
+        if col not in self._codes:
+            import pandas
+            codes, categories = pandas.factorize(self.data_pd[col])
+            value_dict = {value: code for code, value in enumerate(categories)}
+            self._codes[col] = (codes, value_dict)
+        return self._codes[col]
+
+    def get_mask(self, col, value):
+        """ mask = get_mask(col, value)
+
+        Boolean mask of trials where data_pd[col] == value
+        """
+        key = (col, value)
+        if key not in self._masks:
+            codes, value_dict = self.get_codes(col)
+            if value in value_dict:
+                self._masks[key] = codes == value_dict[value]
+            else:
+                self._masks[key] = np.zeros(self.num_trial, dtype=bool)
+        return self._masks[key]
+
+    def get_index(self, label, col = None, value = None):
+        """ idx = get_index(label, col = None, value = None)
+
+        Sorted indices of trials with the label.
+        If col is not None, only trials where data_pd[col] == value are kept.
+        """
+        key = (label, col, value)
+        if key not in self._indices:
+            if col is None:
+                self._indices[key] = np.flatnonzero(
+                    self.get_mask(self.label_col, label))
+            else:
+                idx = self.get_index(label)
+                self._indices[key] = idx[self.get_mask(col, value)[idx]]
+        return self._indices[key]
+
+    def precompute(self, labels, conditions):
+        """ precompute(labels, conditions)
+
+        Compute the indices of trials for every pair of label in labels and
+        (col, value) in conditions. This is useful before sharing the index
+        with other processes, so that the workers don't compute them again.
+        """
+        for label in labels:
+            self.get_index(label)
+            for col, value in conditions:
+                self.get_index(label, col, value)
+        return
+
+    def get_cell_index(self, label, conditions):
+        """ idx = get_cell_index(label, conditions)
+
+        Sorted indices of trials with the label that satisfy all the
+        conditions.
+
+        input
+        -----
+          label       str, value of the label
+          conditions  list of (col, value)
+
+        output
+        ------
+          idx         np.array, sorted indices of trials
+        """
+        if len(conditions) == 0:
+            return self.get_index(label)
+
+        # start from the smallest set of trials
+        idx_list = [self.get_index(label, col, value)
+                    for col, value in conditions]
+        order = sorted(range(len(conditions)), key = lambda x: len(idx_list[x]))
+        idx = idx_list[order[0]]
+        for cond_id in order[1:]:
+            idx = idx[self.get_mask(*conditions[cond_id])[idx]]
+        return idx
+
+
+if __name__ == "__main__":
+    print("factor_index")
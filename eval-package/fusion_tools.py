@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+"""
+Tools for score-level fusion of multiple CM systems
+
+The fused score of a trial is a weighted sum of the scores of K systems.
+For W candidate weight vectors, all the fused scores are computed by one
+matrix product:
+
+   fused_scores = weights @ score_matrix.T
+
+   score_matrix   (num_trial, K), aligned scores of the K systems
+   weights        (W, K), one candidate weight vector per row
+   fused_scores   (W, num_trial), fused scores of each candidate
+
+Each row of fused_scores is then evaluated as the scores of one system.
+
+Results of all the candidates are saved in output_dir/fusion.json:
+ {
+   "score_files": ["sys1/score.txt", ...],
+   "track": "LA",
+   "subset": "eval",
+   "best": 3,                      # index of the best candidate
+   "candidates": [{"weights": [...], ...}, ...]
+ }
+Each candidate has the same fields as result_tools.results_to_dict, plus
+its weights.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import json
+import itertools
+import numpy as np
+
+import result_tools
+
+__author__ = "ASVspoof consortium"
+__copyright__ = "Copyright 2022, ASVspoof consortium"
+
+
+# default step of the weight grid
+g_default_grid_step = 0.1
+
+
+def get_weight_grid(num_system, step = g_default_grid_step):
+    """ weights = get_weight_grid(num_system, step = 0.1)
+
+    All the weight vectors on a grid over the simplex, i.e., weights are
+    multiples of step, non-negative, and sum up to 1.
+
+    input
+    -----
+      num_system  int, number of systems K
+      step        float, step of the grid, 1 / step should be an integer
+
+    output
+    ------
+      weights     np.array, (W, K)
+    """
+    num_step = int(round(1.0 / step))
+    if num_step < 1 or not np.isclose(num_step * step, 1.0):
+        raise ValueError("1 / step should be an integer, got {:f}".format(step))
+    # stars and bars: positions of the (K - 1) bars among (num_step + K - 1)
+    weights = []
+    num_slot = num_step + num_system - 1
+    for bars in itertools.combinations(range(num_slot), num_system - 1):
+        edges = (-1, ) + bars + (num_slot, )
+        weights.append([edges[idx + 1] - edges[idx] - 1
+                        for idx in range(num_system)])
+    return np.array(weights, dtype=np.float64) / num_step
+
+
+def parse_weights(text, num_system):
+    """ weights = parse_weights(text, num_system)
+
+    Parse weight vectors such as '0.5,0.3,0.2;1,0,0' into np.array (W, K).
+    Weight vectors are separated by ';', and weights by ','.
+    """
+    weights = []
+    for item in text.split(';'):
+        if not item.strip():
+            continue
+        try:
+            weight = [float(x) for x in item.split(',')]
+        except ValueError:
+            raise ValueError("invalid weights: {:s}".format(item))
+        if len(weight) != num_system:
+            raise ValueError("expect {:d} weights, got {:s}".format(
+                num_system, item))
+        weights.append(weight)
+    if len(weights) == 0:
+        raise ValueError("no weights in {:s}".format(text))
+    return np.array(weights, dtype=np.float64)
+
+
+def fuse_scores(score_matrix, weights):
+    """ fused_scores = fuse_scores(score_matrix, weights)
+
+    input
+    -----
+      score_matrix   np.array, (num_trial, K), scores of K systems
+      weights        np.array, (W, K), candidate weight vectors
+
+    output
+    ------
+      fused_scores   np.array, (W, num_trial), fused_scores[w] are the
+                     scores fused with weights[w]
+    """
+    return np.dot(weights, score_matrix.T)
+
+
+def write_fusion_results(results_list, weights, score_files, output_dir,
+                         num_print = 10):
+    """ best_idx, summary = write_fusion_results(results_list, weights,
+                              score_files, output_dir, num_print = 10)
+
+    Save the results of all the candidates to output_dir/fusion.json, and
+    the ranked pooled results to output_dir/fusion.txt.
+
+    input
+    -----
+      results_list   list of dict, results of each candidate,
+                     see result_tools.results_to_dict
+      weights        np.array, (W, K), weights of the candidates
+      score_files    list of str, score files of the K systems
+      output_dir     str, path to the output directory
+      num_print      int, number of candidates in the returned summary
+
+    output
+    ------
+      best_idx       int, index of the best candidate, ranked by pooled
+                     min t-DCF (if available), then pooled EER
+      summary        str, pooled results of the best num_print candidates
+    """
+    order = sorted(range(len(results_list)),
+                   key = lambda idx: result_tools.get_ranking_key(
+                       results_list[idx]))
+    best_idx = order[0]
+
+    candidates = []
+    for weight, results in zip(weights, results_list):
+        candidate = {'weights': [float(x) for x in weight]}
+        candidate.update(results)
+        candidates.append(candidate)
+    fusion_buf = {'score_files': list(score_files),
+                  'track': results_list[best_idx]['track'],
+                  'subset': results_list[best_idx]['subset'],
+                  'best': best_idx,
+                  'candidates': candidates}
+    with open(os.path.join(output_dir, 'fusion.json'), 'w') as file_ptr:
+        json.dump(fusion_buf, file_ptr, indent=1)
+
+    # text summary
+    names = result_tools.get_system_names(score_files)
+    lines = ['systems: ' + ', '.join(names)]
+    lines.append('{:<30s} {:>10s} {:>10s}'.format(
+        'weights', 'min_tDCF', 'EER(%)'))
+    for idx in order:
+        mintdcf = results_list[idx]['pooled_min_tDCF']
+        eer = results_list[idx]['pooled_EER']
+        lines.append('{:<30s} {:>10s} {:>10s}'.format(
+            ','.join('{:.3g}'.format(x) for x in weights[idx]),
+            '-' if mintdcf is None else '{:1.4f}'.format(mintdcf),
+            '-' if eer is None else '{:1.2f}'.format(eer)))
+    with open(os.path.join(output_dir, 'fusion.txt'), 'w') as file_ptr:
+        file_ptr.write('\n'.join(lines) + '\n')
+    return best_idx, '\n'.join(lines[:num_print + 2])
+
+
+if __name__ == "__main__":
+    print("fusion_tools")
@@ -43,40 +43,131 @@ Example usage:
    python main.py --cm-score-file score.txt --track LA --subset eval
    
    Case 2
-   Recompute C012 using official ASV scores, save it to ./LA-c012.npy,
+   Recompute C012 using official ASV scores, save it to ./LA-c012.json,
    and use the new C012 to compute EER and min tDCFs
    
    python main.py --cm-score-file score.txt --track LA --subset eval 
-                  --recompute-c012 --c012-path ./LA-c012.npy
+                  --recompute-c012 --c012-path ./LA-c012.json
 
    Case 3
-   Recompute C012 using my own ASV scores, save it to ./LA-c012.npy
+   Recompute C012 using my own ASV scores, save it to ./LA-c012.json
    and use the new C012 to compute EER and min tDCFs
    
    python main.py --cm-score-file score.txt --track LA --subset eval 
-                  --recompute-c012 --c012-path ./LA-c012.npy 
+                  --recompute-c012 --c012-path ./LA-c012.json 
                   --asv-score-file ./asv-score.txt
 
    Case 4
-   Compute min tDCF using my own C012 coeffs ./LA-c012.npy
+   Compute min tDCF using my own C012 coeffs ./LA-c012.json
 
    python main.py --cm-score-file score.txt --track LA --subset eval 
-                  --c012-path ./LA-c012.npy
+                  --c012-path ./LA-c012.json
+
+   Case 5
+   Use 4 processes to compute the decomposed EERs and min tDCFs
+
+   python main.py --cm-score-file score.txt --track LA --subset eval 
+                  --jobs 4
+
+   Case 6
+   Evaluate many score files (e.g., for a leaderboard) with 4 processes.
+   Results of each score file are saved to ./results/SYSTEM.json, 
+   and the ranked pooled results are saved to ./results/summary.txt
+
+   python main.py --cm-score-files sys1/score.txt sys2/score.txt 
+                  --track LA --subset eval --output-dir ./results --jobs 4
+
+   Case 7
+   Compute 95% bootstrap confidence intervals of the decomposed EERs and 
+   min tDCFs with 1000 replicates
+
+   python main.py --cm-score-file score.txt --track LA --subset eval 
+                  --bootstrap 1000 --jobs 4
+
+   Case 8
+   Print the wall time and memory of each stage, and save them to JSON
+
+   python main.py --cm-score-file score.txt --track DF --subset eval 
+                  --profile --profile-json profile.json
+
+   Case 9
+   Save the DET curve of the pooled condition for plotting
+
+   python main.py --cm-score-file score.txt --track LA --subset eval 
+                  --det-curve det.txt
+
+   Case 10
+   Search the weights of a linear fusion of 3 systems on a grid with 
+   step 0.1, and print the results of the best weights. Results of all 
+   the weights are saved to ./results/fusion.json and fusion.txt
+
+   python main.py --fusion-score-files sys1/score.txt sys2/score.txt
+                  sys3/score.txt --track LA --subset progress
+                  --fusion-grid 0.1 --output-dir ./results --jobs 4
+
+   Use --fusion-weights "0.5,0.3,0.2;1,0,0" to give the weights instead.
+
+   Case 11
+   Evaluate all the subsets of all the tracks with 4 processes. The 
+   protocol and score file of each track are loaded only once. 
+   {track} is replaced by LA, PA, and DF. Results are saved to
+   ./results/TRACK-SUBSET.json and ./results/summary.txt
+
+   python main.py --cm-score-file scores/{track}/score.txt 
+                  --track all --subset all --output-dir ./results --jobs 4
+
+   Case 12
+   Save the results to a store, so that an identical evaluation (same 
+   score file content, track, subset, C012, and code) is loaded from the
+   store instead of being computed again, e.g., for dashboard refreshes
+
+   python main.py --cm-score-files sys*/score.txt --track LA --subset eval
+                  --results-store ./results_store --results-store-size 256
+
+   Case 13
+   Start a local server that keeps the protocols and C012 in memory, 
+   and send score files to it (e.g., for every checkpoint)
+
+   python main.py --serve --socket /tmp/asvspoof-eval.sock &
+   python eval_server.py --socket /tmp/asvspoof-eval.sock 
+                         --cm-score-file score.txt --track LA --subset eval
+   python eval_server.py --socket /tmp/asvspoof-eval.sock --shutdown
+
+   Case 14
+   Also print the actual tDCF at the CM threshold 0.0, Cllr, and min Cllr
+   in the decomposed conditions (scores are taken as log-likelihood ratios)
+
+   python main.py --cm-score-file score.txt --track LA --subset eval 
+                  --calibration --calibration-threshold 0.0
 """
 
 from __future__ import absolute_import
 from __future__ import print_function
 
+import io
 import os
 import sys
-import pandas
+import glob
 import argparse
+import contextlib
+import collections
 import numpy as np
 
 import config
 import pd_tools
+import protocol_cache
 import table_API
+import factor_index
 import eval_wrapper
+import eval_metrics
+import fusion_tools
+import parallel_tools
+import profile_tools
+import result_tools
+import result_store
+import score_reader
+import trial_align
+import eval_server
 
 __author__ = "ASVspoof consortium"
 __copyright__ = "Copyright 2022, ASVspoof consortium"
@@ -90,7 +181,29 @@ __copyright__ = "Copyright 2022, ASVspoof consortium"
 
 def sanity_check(args):
     # sanity check
-    if not os.path.isfile(args.cm_score_file):
+    if args.serve:
+        # score files are given by the requests
+        pass
+    elif len(args.fusion_score_files):
+        if len(args.fusion_score_files) < 2:
+            print("--fusion-score-files requires at least 2 score files")
+            return False
+        for cm_score_file in args.fusion_score_files:
+            if not os.path.isfile(cm_score_file):
+                print("Cannot find {:s}".format(cm_score_file))
+                return False
+        if args.fusion_grid <= 0:
+            print("--fusion-grid must be positive")
+            return False
+    elif len(args.cm_score_files):
+        for cm_score_file in args.cm_score_files:
+            if not os.path.isfile(cm_score_file):
+                print("Cannot find {:s}".format(cm_score_file))
+                return False
+    elif args.track == config.g_all_tag and '{track}' in args.cm_score_file:
+        # score files of the tracks are checked by evaluation_API_all
+        pass
+    elif not os.path.isfile(args.cm_score_file):
         print("Cannot find {:s}".format(args.cm_score_file))
         return False
     if not os.path.isdir(args.metadata):
@@ -104,12 +217,24 @@ def sanity_check(args):
             print("Cannot find ", tmp_dir)
             return False
         
-    if args.track not in config.g_possible_tracks:
-        print("track must be from", str(config.g_possible_tracks))
+    if args.serve:
+        return True
+    if args.track not in config.g_possible_tracks + [config.g_all_tag]:
+        print("track must be from", str(config.g_possible_tracks), 
+              "or", config.g_all_tag)
         return False
-    if args.subset not in config.g_possible_subsets:
-        print("subset must be from", str(config.g_possible_subsets))
+    if args.subset not in config.g_possible_subsets + [config.g_all_tag]:
+        print("subset must be from", str(config.g_possible_subsets),
+              "or", config.g_all_tag)
         return False
+    if config.g_all_tag in [args.track, args.subset]:
+        if len(args.cm_score_files) or len(args.fusion_score_files):
+            print("--track all and --subset all require --cm-score-file")
+            return False
+        if args.c012_path:
+            print("--c012-path cannot be used with --track all or "
+                  "--subset all")
+            return False
 
     return True
 
@@ -120,11 +245,25 @@ def parse_argument():
     
     mes = 'CM score file (two column, txt format)'
     parser.add_argument('--cm-score-file', type=str, default="", help=mes)
+
+    mes = 'CM score files of multiple systems. Results of each system '
+    mes += 'are saved to output-dir. Wildcards such as sys*/score.txt '
+    mes += 'are accepted.'
+    parser.add_argument('--cm-score-files', type=str, nargs='+', default=[], 
+                        help=mes)
+
+    mes = 'Directory to save the results of --cm-score-files, '
+    mes += '--fusion-score-files, and --track all or --subset all. '
+    mes += 'Default ./results'
+    parser.add_argument('--output-dir', type=str, default="results", help=mes)
     
-    mes = 'Name of the track, either LA, PA, or DF'
+    mes = 'Name of the track, either LA, PA, or DF, or all for all tracks. '
+    mes += 'With all, {track} in --cm-score-file is replaced by the name '
+    mes += 'of each track.'
     parser.add_argument('--track', type=str, default="", help=mes)
 
-    mes = 'Name of the subset, either eval, progress, hidden, hidden1_PA, hidden2_PA.'
+    mes = 'Name of the subset, either eval, progress, hidden, hidden1_PA, hidden2_PA,'
+    mes += ' or all for all the subsets of the track.'
     parser.add_argument('--subset', type=str, default="", help=mes)
 
     mes = 'Directory of the key and meta data. Default ./keys'
@@ -144,10 +283,100 @@ def parse_argument():
     mes += 'When recompute-c012 is off, load pre-computed C012 from here.\n'
     mes += 'If c012-path is not provided, use c012 path specified on config.py.'
     parser.add_argument('--c012-path', type=str, default="", help=mes)    
+
+    mes = 'Start a local server that evaluates score files sent to --socket.'
+    mes += ' Protocols and C012 are loaded once and kept in memory.'
+    mes += ' See eval_server.py for the client.'
+    parser.add_argument('--serve', action='store_true', default=False, 
+                        help=mes)
+
+    mes = 'Path to the Unix socket of the server. '
+    mes += 'Default {:s}'.format(eval_server.g_default_socket)
+    parser.add_argument('--socket', type=str, 
+                        default=eval_server.g_default_socket, help=mes)
+
+    mes = 'Max number of (track, subset) kept in memory by the server. '
+    mes += 'Default 4'
+    parser.add_argument('--max-loaded', type=int, default=4, help=mes)
+
+    mes = 'Number of bootstrap replicates. If > 0, 95%% confidence intervals'
+    mes += ' of the decomposed EERs and min tDCFs are computed. Default 0'
+    parser.add_argument('--bootstrap', type=int, default=0, help=mes)
+
+    mes = 'Also compute the actual tDCF at --calibration-threshold, Cllr, '
+    mes += 'and min Cllr (after PAV calibration) in the decomposed '
+    mes += 'conditions. Scores are taken as natural log-likelihood ratios '
+    mes += 'for Cllr. Used with --cm-score-file.'
+    parser.add_argument('--calibration', action='store_true', default=False,
+                        help=mes)
+
+    mes = 'CM threshold of the actual tDCF for --calibration. Trials with '
+    mes += 'scores below the threshold are rejected. Default 0.0'
+    parser.add_argument('--calibration-threshold', type=float, default=0.0,
+                        help=mes)
+
+    mes = 'Number of processes to compute the decomposed EERs and min tDCFs.'
+    mes += ' With --cm-score-files, number of score files evaluated in '
+    mes += 'parallel. Default 1'
+    parser.add_argument('--jobs', type=int, default=1, help=mes)
+
+    mes = 'Print the wall time and memory of each stage (loading, subset '
+    mes += 'query, C012, decomposition, ...) and the number of trials in '
+    mes += 'each decomposed cell.'
+    parser.add_argument('--profile', action='store_true', default=False, 
+                        help=mes)
+
+    mes = 'Save the profile of --profile to this JSON file.'
+    parser.add_argument('--profile-json', type=str, default="", help=mes)
+
+    mes = 'Save the DET curve of the pooled condition to this text file '
+    mes += '(threshold, miss rate, false alarm rate). Tied scores are '
+    mes += 'merged and at most 2000 points are saved.'
+    parser.add_argument('--det-curve', type=str, default="", help=mes)
+
+    mes = 'Directory of the results store. Results are saved to the store, '
+    mes += 'and an identical evaluation (same score file content, track, '
+    mes += 'subset, C012, code version, and --bootstrap) is loaded from the'
+    mes += ' store without computation. Used with --cm-score-file and '
+    mes += '--cm-score-files. Default: no store'
+    parser.add_argument('--results-store', type=str, default="", help=mes)
+
+    mes = 'Max size of the results store in MB. The least recently used '
+    mes += 'results are deleted. '
+    mes += 'Default {:d}'.format(result_store.g_default_max_size_mb)
+    parser.add_argument('--results-store-size', type=float, 
+                        default=result_store.g_default_max_size_mb, help=mes)
+
+    mes = 'CM score files of the systems to be fused by a weighted sum. '
+    mes += 'All the weights of --fusion-weights or --fusion-grid are '
+    mes += 'evaluated, and the results are saved to output-dir/fusion.json.'
+    parser.add_argument('--fusion-score-files', type=str, nargs='+', 
+                        default=[], help=mes)
+
+    mes = 'Weights of the systems in --fusion-score-files, e.g., '
+    mes += '"0.5,0.3,0.2;1,0,0" for two candidates of three systems. '
+    mes += 'If not provided, the weights on --fusion-grid are used.'
+    parser.add_argument('--fusion-weights', type=str, default="", help=mes)
+
+    mes = 'Step of the grid of fusion weights (non-negative, sum to 1). '
+    mes += 'Default {:.1f}'.format(fusion_tools.g_default_grid_step)
+    parser.add_argument('--fusion-grid', type=float, 
+                        default=fusion_tools.g_default_grid_step, help=mes)
     
     # load argument
     args = parser.parse_args()
 
+    # expand wildcards (e.g., on shells that do not expand them)
+    cm_score_files = []
+    for pattern in args.cm_score_files:
+        cm_score_files += sorted(glob.glob(pattern)) or [pattern]
+    args.cm_score_files = cm_score_files
+
+    fusion_score_files = []
+    for pattern in args.fusion_score_files:
+        fusion_score_files += sorted(glob.glob(pattern)) or [pattern]
+    args.fusion_score_files = fusion_score_files
+
     # sanity check
     if not sanity_check(args):
         print("ERROR: arguments are invalid. ")
@@ -156,6 +385,49 @@ def parse_argument():
     return args
 
 
+def _compute_tDCF_C012_row(shared_buf, id1):
+    """ row_C012 = _compute_tDCF_C012_row(shared_buf, id1)
+
+    Compute C012 for the id1-th row. Used by compute_tDCF_C012.
+    row_C012 is a list of (factor_2, (C0, C1, C2)) along the row.
+    """
+    factor_idx = shared_buf['factor_idx']
+    pooled_tag = shared_buf['pooled_tag']
+    factor_name_1, factor_1, factor_type_1 = shared_buf['factor_list_1'][id1]
+
+    # conditions on the data corresponding to the factor_1
+    # target and nontarget trials are bona fide trials
+    cond_bona_fac1 = factor_index.factor_condition(
+        factor_name_1, factor_1, factor_type_1, False, pooled_tag)
+    cond_spoof_fac1 = factor_index.factor_condition(
+        factor_name_1, factor_1, factor_type_1, True, pooled_tag)
+
+    # loop over factor in cols (factor 2)
+    cells = []
+    for factor_name_2, factor_2, factor_type_2 in shared_buf['factor_list_2']:
+
+        cond_bona_fac2 = factor_index.factor_condition(
+            factor_name_2, factor_2, factor_type_2, False, pooled_tag)
+        cond_spoof_fac2 = factor_index.factor_condition(
+            factor_name_2, factor_2, factor_type_2, True, pooled_tag)
+
+        # retrive data
+        tar_idx = factor_idx.get_cell_index(
+            shared_buf['target_tag'], cond_bona_fac1 + cond_bona_fac2)
+        ntar_idx = factor_idx.get_cell_index(
+            shared_buf['nontarget_tag'], cond_bona_fac1 + cond_bona_fac2)
+        spoof_idx = factor_idx.get_cell_index(
+            shared_buf['spoofed_tag'], cond_spoof_fac1 + cond_spoof_fac2)
+        cells.append((tar_idx, ntar_idx, spoof_idx))
+
+    # compute C012 values of the whole row
+    C0, C1, C2 = eval_wrapper.get_tDCF_C012_cells(
+        shared_buf['asv_ctx'], cells, shared_buf['cost_model'])
+    row_C012 = [(x[1], (C0[idx], C1[idx], C2[idx])) 
+                for idx, x in enumerate(shared_buf['factor_list_2'])]
+    return row_C012
+
+
 def compute_tDCF_C012(asv_score_pd, 
                       factor_name_v,
                       factor_value_v, 
@@ -169,7 +441,8 @@ def compute_tDCF_C012(asv_score_pd,
                       nontarget_tag = config.g_nontarget_tag,
                       spoofed_tag = config.g_spoofed_tag,
                       col_score_name = config.g_score_col_name,
-                      flag_verbose = False):
+                      flag_verbose = False,
+                      n_jobs = 1):
     """C012_dict = compute_tDCF_C012(asv_score_pd, 
                                    factor_name_v,
                                    factor_value_v, 
@@ -183,7 +456,8 @@ def compute_tDCF_C012(asv_score_pd,
                                    nontarget_tag = 'nontarget',
                                    spoofed_tag = 'spoof',
                                    col_score_name = 'score',
-                                   flag_verbose = False)
+                                   flag_verbose = False,
+                                   n_jobs = 1)
     
     Function to loop over two sets of factors and compute C012.
     The output C012_dict can be used to compute min tDCF values
@@ -241,6 +515,8 @@ def compute_tDCF_C012(asv_score_pd,
                       default 'spoof'
       col_score_name  str, name of the column for score
                       default 'score'
+      n_jobs          int, number of processes over which the rows are 
+                      computed, default 1
 
     output
     ------
@@ -249,106 +525,232 @@ def compute_tDCF_C012(asv_score_pd,
                       C012[factor_1][factor_2]['C1'] -> C1
                       C012[factor_1][factor_2]['C2'] -> C2
     """
-    def _wrap_list(data):
-         return [data] if type(data) is str else data
-
-    def _wrap_list_list(data):
-         return [data] if type(data[0]) is str else data
-    
-    # wrap them into a list
-    factor_names_1 = _wrap_list(factor_name_v)
-    factor_names_2 = _wrap_list(factor_name_h)
-    factor_types_1 = _wrap_list(factor_type_v)
-    factor_types_2 = _wrap_list(factor_type_h)
-    factor_list_1_list = _wrap_list_list(factor_value_v)
-    factor_list_2_list = _wrap_list_list(factor_value_h)
+    # flatten the factors along the rows and columns
+    factor_list_1 = factor_index.flatten_factors(
+        factor_name_v, factor_value_v, factor_type_v)
+    factor_list_2 = factor_index.flatten_factors(
+        factor_name_h, factor_value_h, factor_type_h)
 
     # number of rows and columns in the result table
-    num_row = sum([len(x) for x in factor_list_1_list])
-    num_col = sum([len(x) for x in factor_list_2_list])
+    num_row = len(factor_list_1)
+    num_col = len(factor_list_2)
 
     # output buffer
     C012 = dict()
 
     print('\n' + ''.join(['-'] * (num_row - 1)) + '>| computing C012 for tDCF')
 
+    # encode the factors once, and sort the ASV scores once
+    factor_idx = factor_index.FactorIndex(asv_score_pd)
+    factor_idx.precompute(
+        [target_tag, nontarget_tag, spoofed_tag], 
+        [(x[0], x[1]) for x in factor_list_1 + factor_list_2 
+         if x[1] != pooled_tag])
+    asv_ctx = eval_metrics.SortedScoreContext(
+        asv_score_pd[col_score_name].to_numpy(), 
+        factor_idx.get_mask(factor_idx.label_col, target_tag))
+
+    # data shared by all the rows
+    shared_buf = {'factor_idx': factor_idx, 'asv_ctx': asv_ctx,
+                  'factor_list_1': factor_list_1, 
+                  'factor_list_2': factor_list_2,
+                  'cost_model': cost_model, 'pooled_tag': pooled_tag,
+                  'target_tag': target_tag, 'nontarget_tag': nontarget_tag,
+                  'spoofed_tag': spoofed_tag}
+
     # loop over factor along the row (factor 1)
-    for factor_name_1, factor_list_1, factor_type_1 in zip(
-        factor_names_1, factor_list_1_list, factor_types_1):
-        for _, factor_1 in enumerate(factor_list_1):
-            
-            print(".", end = '', flush=True)
-            
-            # creat the query to retrieve the data corresponding to the factor_1
-            if factor_1 == pooled_tag:
-                # pooled condition
-                qr_tar_fac1 = ''
-                qr_ntar_fac1 = ''
-                qr_spoof_fac1 = ''
-            elif factor_type_1 == config.g_factor_type_spoof:
-                # if factor is only for spoofed data (e.g., attack type)
-                qr_tar_fac1 = ''
-                qr_ntar_fac1 = ''
-                qr_spoof_fac1 = ' and {:s} == "{:s}"'.format(factor_name_1, factor_1)
-            elif factor_type_1 == config.g_factor_type_bonafide:
-                # if factor is only for bonafide (target and nontarget)
-                qr_tar_fac1 = ' and {:s} == "{:s}"'.format(factor_name_1, factor_1)
-                qr_ntar_fac1 = ' and {:s} == "{:s}"'.format(factor_name_1, factor_1)
-                qr_spoof_fac1 = ''
-            else:
-                # if factor is for both spoofed and bona fide data (e.g., codec)
-                qr_tar_fac1 = ' and {:s} == "{:s}"'.format(factor_name_1, factor_1)
-                qr_ntar_fac1 = ' and {:s} == "{:s}"'.format(factor_name_1, factor_1)
-                qr_spoof_fac1 = ' and {:s} == "{:s}"'.format(factor_name_1, factor_1)
+    def _save_row(id1, row_C012):
+        print(".", end = '', flush=True)
+        for factor_2, (C0, C1, C2) in row_C012:
+            # save C012 coef
+            eval_wrapper.save_C012_value(
+                C012, C0, C1, C2, [factor_list_1[id1][1], factor_2])
+        return
+
+    parallel_tools.map_jobs(_compute_tDCF_C012_row, list(range(num_row)), 
+                            shared_buf, n_jobs, _save_row)
+    print("")
+    return C012
+
+
+
+def _get_row_cells(shared_buf, id1):
+    """ cells = _get_row_cells(shared_buf, id1)
+
+    Trials and C012 of the cells in the id1-th row of the decomposed table.
+    cells is a list of (bona_idx, spoof_idx, (C0, C1, C2)), one for each 
+    column.
+    """
+    factor_idx = shared_buf['factor_idx']
+    C012_buf = shared_buf['C012_buf']
+    pooled_tag = shared_buf['pooled_tag']
+    bonafide_tag = shared_buf['bonafide_tag']
+    spoofed_tag = shared_buf['spoofed_tag']
+    factor_name_1, factor_1, factor_type_1 = shared_buf['factor_list_1'][id1]
+    
+    # conditions on the data corresponding to the factor_1
+    cond_bona_fac1 = factor_index.factor_condition(
+        factor_name_1, factor_1, factor_type_1, False, pooled_tag)
+    cond_spoof_fac1 = factor_index.factor_condition(
+        factor_name_1, factor_1, factor_type_1, True, pooled_tag)
             
-            # loop over factor in cols (factor 2)
-            for factor_name_2, factor_list_2, factor_type_2 in zip(
-                factor_names_2, factor_list_2_list, factor_types_2):
-                for _, factor_2 in enumerate(factor_list_2):
-                                        
-                    if factor_2 == pooled_tag:
-                        # pooled condition
-                        qr_tar_fac2 = ''
-                        qr_ntar_fac2 = ''
-                        qr_spoof_fac2 = ''
-                    elif factor_type_2 == config.g_factor_type_spoof:
-                        # if factor is only for spoofed data (e.g., attack type)
-                        qr_tar_fac2 = ''
-                        qr_ntar_fac2 = ''
-                        qr_spoof_fac2 = ' and {:s} == "{:s}"'.format(factor_name_2, factor_2)
-                    elif factor_type_2 == config.g_factor_type_bonafide:
-                        qr_tar_fac2 = ' and {:s} == "{:s}"'.format(factor_name_2, factor_2)
-                        qr_ntar_fac2 = ' and {:s} == "{:s}"'.format(factor_name_2, factor_2)
-                        qr_spoof_fac2 = ''
-                    else:
-                        # if factor is for both spoofed and bona fide data (e.g., codec)
-                        qr_tar_fac2 = ' and {:s} == "{:s}"'.format(factor_name_2, factor_2)
-                        qr_ntar_fac2 = ' and {:s} == "{:s}"'.format(factor_name_2, factor_2)
-                        qr_spoof_fac2 = ' and {:s} == "{:s}"'.format(factor_name_2, factor_2)
-
-                    # query that we will use to retrieve the data
-                    qr_tar = 'label == "{:s}"'.format(target_tag) + qr_tar_fac1 + qr_tar_fac2
-                    qr_ntar = 'label == "{:s}"'.format(nontarget_tag) + qr_ntar_fac1 + qr_ntar_fac2
-                    qr_spoof = 'label == "{:s}"'.format(spoofed_tag) +  qr_spoof_fac1 + qr_spoof_fac2
-                    
-                    # retrive data
-                    tar_env_pd = asv_score_pd.query(qr_tar)
-                    ntar_env_pd = asv_score_pd.query(qr_ntar)
-                    spoof_env_pd = asv_score_pd.query(qr_spoof)
+    cells = []
+    # loop over factor in cols (factor 2)
+    for factor_name_2, factor_2, factor_type_2 in shared_buf['factor_list_2']:
                     
-                    tar_data = tar_env_pd[col_score_name].to_numpy()
-                    ntar_data = ntar_env_pd[col_score_name].to_numpy()
-                    spoof_data = spoof_env_pd[col_score_name].to_numpy()
+        cond_bona_fac2 = factor_index.factor_condition(
+            factor_name_2, factor_2, factor_type_2, False, pooled_tag)
+        cond_spoof_fac2 = factor_index.factor_condition(
+            factor_name_2, factor_2, factor_type_2, True, pooled_tag)
+
+        # retrive data
+        bona_idx = factor_idx.get_cell_index(
+            bonafide_tag, cond_bona_fac1 + cond_bona_fac2)
+        spoof_idx = factor_idx.get_cell_index(
+            spoofed_tag, cond_spoof_fac1 + cond_spoof_fac2)
                     
-                    # compute C012 values
-                    C0, C1, C2 = eval_wrapper.get_tDCF_C012_from_asv_scores(
-                        tar_data, ntar_data, spoof_data, cost_model)
-                    # save C012 coef
-                    eval_wrapper.save_C012_value(
-                        C012, C0, C1, C2, [factor_1, factor_2])
-    print("")
-    return C012
+        # load C012 values
+        if C012_buf is None:
+            # dummy value 
+            C012 = (0.1, 0.1, 0.1)
+        else:
+            C012 = eval_wrapper.load_C012_value(C012_buf, [factor_1, factor_2])
+
+        # print infor
+        if shared_buf['flag_verbose']:
+            print(bonafide_tag, cond_bona_fac1 + cond_bona_fac2, 
+                  "{:d} entries".format(len(bona_idx)))
+            print(spoofed_tag, cond_spoof_fac1 + cond_spoof_fac2, 
+                  "{:d} entries".format(len(spoof_idx)))
+        cells.append((bona_idx, spoof_idx, C012))
+    return cells
+
+
+def _compute_decomposed_row(shared_buf, id1):
+    """ mintDCF_row, eer_row, trial_row, calib_row = _compute_decomposed_row(
+          shared_buf, id1)
+
+    Compute min t-DCF and EER for the id1-th row. 
+    Used by compute_decomposed_mintdcf_eer.
+    trial_row[id2] is the number of bona fide and spoofed trials in the cell.
+    calib_row[id2] is the actual t-DCF, Cllr, and min Cllr of the cell, 
+    or calib_row is None if the calibration metrics are not required.
+    """
+    cells = _get_row_cells(shared_buf, id1)
+    calib_threshold = shared_buf['calib_threshold']
+
+    # output buffer
+    mintDCF_row = np.zeros([len(cells)])
+    eer_row = np.zeros_like(mintDCF_row)
+    trial_row = np.array([[len(x[0]), len(x[1])] for x in cells], 
+                         dtype=np.int64).reshape([-1, 2])
+    if calib_threshold is None:
+        calib_row = None
+    else:
+        calib_row = np.zeros([len(cells), 3]) * np.nan
+
+    for id2, (bona_idx, spoof_idx, (C0, C1, C2)) in enumerate(cells):
+        # computation
+        if len(bona_idx) and len(spoof_idx):
+            # the sorted scores of the cell are shared by all the metrics
+            sorted_scores, sorted_labels = shared_buf['score_ctx'].select(
+                bona_idx, spoof_idx)
+            mintdcf, eer_tmp = eval_wrapper.get_mintDCF_eer_from_sorted(
+                sorted_scores, sorted_labels, len(bona_idx), len(spoof_idx),
+                C0, C1, C2)
+            if calib_row is not None:
+                calib_row[id2] = eval_wrapper.get_calibration_from_sorted(
+                    sorted_scores, sorted_labels, 
+                    len(bona_idx), len(spoof_idx), C0, C1, C2, 
+                    calib_threshold)
+                if shared_buf['C012_buf'] is None:
+                    calib_row[id2, 0] = np.nan
+        else:
+            mintdcf, eer_tmp = np.nan, np.nan
+
+        # mask the min t-DCF values when C012 is invalid
+        if shared_buf['C012_buf'] is None:
+            mintdcf = mintdcf * np.nan
+                        
+        # save the value
+        mintDCF_row[id2] = mintdcf
+        eer_row[id2] = eer_tmp
+    return mintDCF_row, eer_row, trial_row, calib_row
+
+
+def _compute_bootstrap_row(shared_buf, id1):
+    """ mintDCF_ci_row, eer_ci_row = _compute_bootstrap_row(shared_buf, id1)
+
+    Compute the bootstrap confidence intervals for the id1-th row.
+    Used by compute_decomposed_bootstrap_ci.
+    """
+    cells = _get_row_cells(shared_buf, id1)
+
+    # output buffer
+    mintDCF_ci_row = np.zeros([len(cells), 2]) * np.nan
+    eer_ci_row = np.zeros_like(mintDCF_ci_row) * np.nan
+
+    for id2, (bona_idx, spoof_idx, (C0, C1, C2)) in enumerate(cells):
+        if len(bona_idx) == 0 or len(spoof_idx) == 0:
+            continue
+        # random numbers of each cell do not depend on n_jobs
+        rng = np.random.default_rng([shared_buf['boot_seed'], id1, id2])
+        mintdcfs, eers = eval_wrapper.get_mintDCF_eer_bootstrap(
+            shared_buf['score_ctx'], bona_idx, spoof_idx, C0, C1, C2, 
+            shared_buf['num_boot'], rng)
+        eer_ci_row[id2] = eval_wrapper.get_confidence_interval(
+            eers, shared_buf['ci_alpha'])
+        if shared_buf['C012_buf'] is not None:
+            mintDCF_ci_row[id2] = eval_wrapper.get_confidence_interval(
+                mintdcfs, shared_buf['ci_alpha'])
+    return mintDCF_ci_row, eer_ci_row
+
+
+def _prepare_decomposed_buf(score_pd, 
+                            factor_name_v, factor_value_v, factor_type_v,
+                            factor_name_h, factor_value_h, factor_type_h,
+                            C012_buf, pooled_tag, bonafide_tag, spoofed_tag,
+                            col_score_name, flag_verbose, factor_idx, scores,
+                            calib_threshold = None):
+    """ shared_buf = _prepare_decomposed_buf(score_pd, ...)
+
+    Data shared by the rows of the decomposed table. 
+    See compute_decomposed_mintdcf_eer for the input arguments.
+    """
+    # flatten the factors along the rows and columns
+    factor_list_1 = factor_index.flatten_factors(
+        factor_name_v, factor_value_v, factor_type_v)
+    factor_list_2 = factor_index.flatten_factors(
+        factor_name_h, factor_value_h, factor_type_h)
+
+    # encode the factors once, and retrieve the data of each cell
+    # by intersecting the indices of trials
+    if factor_idx is None:
+        factor_idx = factor_index.FactorIndex(score_pd)
+    elif factor_idx.num_trial != len(score_pd):
+        print("ERROR: factor index does not match the score dataFrame")
+        sys.exit(1)
+    factor_idx.precompute(
+        [bonafide_tag, spoofed_tag], 
+        [(x[0], x[1]) for x in factor_list_1 + factor_list_2 
+         if x[1] != pooled_tag])
+    # sort the scores once, and compute the DET curve of each cell 
+    # from the sorted scores
+    if scores is None:
+        scores = score_pd[col_score_name].to_numpy()
+    elif len(scores) != len(score_pd):
+        print("ERROR: scores do not match the score dataFrame")
+        sys.exit(1)
+    score_ctx = eval_metrics.SortedScoreContext(
+        scores, 
+        factor_idx.get_mask(factor_idx.label_col, bonafide_tag))
 
+    return {'factor_idx': factor_idx, 'score_ctx': score_ctx,
+            'factor_list_1': factor_list_1, 
+            'factor_list_2': factor_list_2,
+            'C012_buf': C012_buf, 'pooled_tag': pooled_tag,
+            'bonafide_tag': bonafide_tag, 'spoofed_tag': spoofed_tag,
+            'flag_verbose': flag_verbose, 'calib_threshold': calib_threshold}
 
 
 def compute_decomposed_mintdcf_eer(score_pd, 
@@ -363,7 +765,14 @@ def compute_decomposed_mintdcf_eer(score_pd,
                                    bonafide_tag = config.g_bonafide_tag,
                                    spoofed_tag = config.g_spoofed_tag,
                                    col_score_name = config.g_score_col_name,
-                                   flag_verbose = False):
+                                   flag_verbose = False,
+                                   n_jobs = 1,
+                                   factor_idx = None,
+                                   scores = None,
+                                   profiler = None,
+                                   pooled_buf = None,
+                                   calib_buf = None,
+                                   calib_threshold = 0.0):
     """mintDCF_array, eer_array = compute_decomposed_mintdcf_eer(score_pd, 
                                    factor_name_v,
                                    factor_value_v, 
@@ -376,7 +785,14 @@ def compute_decomposed_mintdcf_eer(score_pd,
                                    bonafide_tag = 'bonafide',
                                    spoofed_tag = 'spoof',
                                    col_score_name = 'score',
-                                   flag_verbose = False)
+                                   flag_verbose = False,
+                                   n_jobs = 1,
+                                   factor_idx = None,
+                                   scores = None,
+                                   profiler = None,
+                                   pooled_buf = None,
+                                   calib_buf = None,
+                                   calib_threshold = 0.0)
     
     Function to loop over two sets of factors and compute min t-DCF and EER in
     each pair of the factor.
@@ -438,6 +854,34 @@ def compute_decomposed_mintdcf_eer(score_pd,
                       default 'spoof'
       col_score_name  str, name of the column for score
                       default 'score'
+      n_jobs          int, number of processes over which the rows are 
+                      computed, default 1
+      factor_idx      factor_index.FactorIndex, or None
+                      index over the rows of score_pd. It can be built once
+                      and shared across score files of the same protocol.
+                      If None, it is built from score_pd.
+      scores          np.array, or None
+                      scores of the trials in the order of score_pd.
+                      If None, score_pd[col_score_name] is used. 
+      profiler        profile_tools.StageProfiler, or None
+                      if not None, the number of trials in each cell is
+                      recorded
+      pooled_buf      dict, or None
+                      if not None, results on the pooled condition are 
+                      saved to it: min t-DCF and EER of the scores and of
+                      the negated scores (see print_polarity_check), and 
+                      the compact DET curve in 'det' (see 
+                      eval_metrics.compute_det_curve_compact)
+      calib_buf       dict, or None
+                      if not None, calibration metrics of each condition
+                      are saved to it, in arrays of the same shape as 
+                      mintDCF_array (see 
+                      eval_wrapper.get_calibration_from_sorted):
+                      'actual_tDCF', normalized t-DCF at calib_threshold
+                      (NaN if C012_buf is None); 'Cllr', Cllr of the 
+                      scores taken as LLRs; 'min_Cllr', Cllr after PAV
+      calib_threshold float, CM threshold of the actual t-DCF, 
+                      default 0.0
 
     output
     ------
@@ -450,27 +894,23 @@ def compute_decomposed_mintdcf_eer(score_pd,
       eer_array       np.array, EER values in all conditions.
                       same shape as mintDCF_array
     """
-    def _wrap_list(data):
-         return [data] if type(data) is str else data
+    # data shared by all the rows
+    shared_buf = _prepare_decomposed_buf(
+        score_pd, factor_name_v, factor_value_v, factor_type_v,
+        factor_name_h, factor_value_h, factor_type_h,
+        C012_buf, pooled_tag, bonafide_tag, spoofed_tag,
+        col_score_name, flag_verbose, factor_idx, scores,
+        None if calib_buf is None else calib_threshold)
 
-    def _wrap_list_list(data):
-         return [data] if type(data[0]) is str else data
-    
-    # wrap them into a list
-    factor_names_1 = _wrap_list(factor_name_v)
-    factor_names_2 = _wrap_list(factor_name_h)
-    factor_types_1 = _wrap_list(factor_type_v)
-    factor_types_2 = _wrap_list(factor_type_h)
-    factor_list_1_list = _wrap_list_list(factor_value_v)
-    factor_list_2_list = _wrap_list_list(factor_value_h)
-        
     # number of rows and columns in the result table
-    num_row = sum([len(x) for x in factor_list_1_list])
-    num_col = sum([len(x) for x in factor_list_2_list])
+    num_row = len(shared_buf['factor_list_1'])
+    num_col = len(shared_buf['factor_list_2'])
 
     # output buffer
     mintDCF_array = np.zeros([num_row, num_col])
     eer_array = np.zeros_like(mintDCF_array)
+    trial_array = np.zeros([num_row, num_col, 2], dtype=np.int64)
+    calib_array = np.zeros([num_row, num_col, 3]) * np.nan
 
     if C012_buf is None:
         print('\n' + ''.join(['-'] * (num_row - 1)) + '>| computing EERs')
@@ -478,217 +918,334 @@ def compute_decomposed_mintdcf_eer(score_pd,
         print('\n' + ''.join(['-'] * (num_row - 1)) + '>| computing EERs and min tDCF')
 
     # loop over factor along the row (factor 1)
-    id1 = 0
-    for factor_name_1, factor_list_1, factor_type_1 in zip(
-        factor_names_1, factor_list_1_list, factor_types_1):
-        for _, factor_1 in enumerate(factor_list_1):
-            
-            print(".", end = '', flush=True)
-            
-            # creat the query to retrieve the data corresponding to the factor_1
-            if factor_1 == pooled_tag:
-                # pooled condition
-                qr_bona_fac1 = ''
-                qr_spoof_fac1 = ''
-            elif factor_type_1 == config.g_factor_type_spoof:
-                # if factor is only for spoofed data (e.g., attack type)
-                qr_bona_fac1 = ''
-                qr_spoof_fac1 = ' and {:s} == "{:s}"'.format(factor_name_1, factor_1)
-            elif factor_type_1 == config.g_factor_type_bonafide:
-                # if factor is only for bonafide
-                qr_bona_fac1 = ' and {:s} == "{:s}"'.format(factor_name_1, factor_1)
-                qr_spoof_fac1 = ''
-            else:
-                # if factor is for both spoofed and bona fide data (e.g., codec)
-                qr_bona_fac1 = ' and {:s} == "{:s}"'.format(factor_name_1, factor_1)
-                qr_spoof_fac1 = ' and {:s} == "{:s}"'.format(factor_name_1, factor_1)
-            
-            # loop over factor in cols (factor 2)
-            id2 = 0
-            for factor_name_2, factor_list_2, factor_type_2 in zip(
-                factor_names_2, factor_list_2_list, factor_types_2):
-                for _, factor_2 in enumerate(factor_list_2):
-                    
-                    if factor_2 == pooled_tag:
-                        # pooled condition
-                        qr_bona_fac2 = ''
-                        qr_spoof_fac2 = ''
-                    elif factor_type_2 == config.g_factor_type_spoof:
-                        # if factor is only for spoofed data (e.g., attack type)
-                        qr_bona_fac2 = ''
-                        qr_spoof_fac2 = ' and {:s} == "{:s}"'.format(factor_name_2, factor_2)
-                    elif factor_type_2 == config.g_factor_type_bonafide:
-                        qr_bona_fac2 = ' and {:s} == "{:s}"'.format(factor_name_2, factor_2)
-                        qr_spoof_fac2 = ''
-                    else:
-                        # if factor is for both spoofed and bona fide data (e.g., codec)
-                        qr_bona_fac2 = ' and {:s} == "{:s}"'.format(factor_name_2, factor_2)
-                        qr_spoof_fac2 = ' and {:s} == "{:s}"'.format(factor_name_2, factor_2)
-
-                    # query that we will use to retrieve the data
-                    qr_bonafide = 'label == "{:s}"'.format(bonafide_tag) + qr_bona_fac1 + qr_bona_fac2
-                    qr_spoof = 'label == "{:s}"'.format(spoofed_tag) +  qr_spoof_fac1 + qr_spoof_fac2
-                    
-                    # retrive data
-                    bona_env_pd = score_pd.query(qr_bonafide)
-                    spoof_env_pd = score_pd.query(qr_spoof)
-                    bona_data = bona_env_pd[col_score_name].to_numpy()
-                    spoof_data = spoof_env_pd[col_score_name].to_numpy()
-                    
-                    # load C012 values
-                    if C012_buf is None:
-                        # dummy value 
-                        C0, C1, C2 = 0.1, 0.1, 0.1
-                    else:
-                        C0, C1, C2 = eval_wrapper.load_C012_value(
-                            C012_buf, [factor_1, factor_2])
-
-                    # print infor
-                    if flag_verbose:
-                        print(qr_bonafide, "{:d} entries".format(len(bona_data)))
-                        print(qr_spoof, "{:d} entries".format(len(spoof_data)))
-                    
-                    # computation
-                    if len(bona_data) and len(spoof_data):
-                        mintdcf, eer_tmp = eval_wrapper.get_mintDCF_eer(
-                            bona_data, spoof_data, C0, C1, C2)
-                    else:
-                        mintdcf, eer_tmp = np.nan, np.nan
-
-                    # mask the min t-DCF values when C012 is invalid
-                    if C012_buf is None:
-                        mintdcf = mintdcf * np.nan
-                        
-                    # save the value
-                    mintDCF_array[id1, id2] = mintdcf
-                    eer_array[id1, id2] = eer_tmp
-
-                    id2 += 1
-            # loop over horizotal factors
-            id1 += 1
+    def _save_row(id1, row_result):
+        print(".", end = '', flush=True)
+        mintDCF_array[id1], eer_array[id1], trial_array[id1] = row_result[:3]
+        if row_result[3] is not None:
+            calib_array[id1] = row_result[3]
+        return
+
+    parallel_tools.map_jobs(_compute_decomposed_row, list(range(num_row)), 
+                            shared_buf, n_jobs, _save_row)
     print("")
+
+    if profiler is not None:
+        profiler.add_cells(
+            'decomposition', 
+            [x[1] for x in shared_buf['factor_list_1']], 
+            [x[1] for x in shared_buf['factor_list_2']], trial_array)
+
+    if calib_buf is not None:
+        calib_buf['actual_tDCF'] = calib_array[:, :, 0]
+        calib_buf['Cllr'] = calib_array[:, :, 1]
+        calib_buf['min_Cllr'] = calib_array[:, :, 2]
+        calib_buf['threshold'] = calib_threshold
+
+    if pooled_buf is not None:
+        # pooled condition, from the scores already sorted
+        if C012_buf is None:
+            C0, C1, C2 = np.nan, np.nan, np.nan
+        else:
+            C0, C1, C2 = eval_wrapper.load_C012_value(
+                C012_buf, [pooled_tag, pooled_tag])
+        factor_idx = shared_buf['factor_idx']
+        bona_idx = factor_idx.get_index(bonafide_tag)
+        spoof_idx = factor_idx.get_index(spoofed_tag)
+        (pooled_buf['min_tDCF'], pooled_buf['EER']), \
+            (pooled_buf['min_tDCF_negated'], pooled_buf['EER_negated']) \
+            = eval_wrapper.get_mintDCF_eer_polarity(
+                shared_buf['score_ctx'], bona_idx, spoof_idx, C0, C1, C2)
+        pooled_buf['det'] = eval_metrics.compute_det_curve_compact_from_sorted(
+            *shared_buf['score_ctx'].select(bona_idx, spoof_idx), 
+            len(bona_idx), len(spoof_idx))
     return mintDCF_array, eer_array
 
 
-def evaluation_API(cm_score_file, track, subset = 'eval', label_dir = './',
-                   flag_recompute_c012 = False,
-                   asv_score_file = None, 
-                   external_c012_path = None):
-    """ mintdcf_array, eer_array = evaluation_API(cm_score_file, 
-          track, subset = 'eval', label_dir = './',
-          flag_recompute_c012 = True, asv_score_file = None, 
-          external_c012_path = None)
+def compute_decomposed_bootstrap_ci(score_pd, 
+                                    factor_name_v,
+                                    factor_value_v, 
+                                    factor_type_v,
+                                    factor_name_h, 
+                                    factor_value_h, 
+                                    factor_type_h,
+                                    num_boot,
+                                    C012_buf = None,
+                                    ci_alpha = 0.05,
+                                    boot_seed = 0,
+                                    pooled_tag = config.g_pooled_tag, 
+                                    bonafide_tag = config.g_bonafide_tag,
+                                    spoofed_tag = config.g_spoofed_tag,
+                                    col_score_name = config.g_score_col_name,
+                                    n_jobs = 1,
+                                    factor_idx = None,
+                                    scores = None):
+    """mintDCF_ci, eer_ci = compute_decomposed_bootstrap_ci(score_pd, 
+                                   factor_name_v,
+                                   factor_value_v, 
+                                   factor_type_v,
+                                   factor_name_h,
+                                   factor_value_h,  
+                                   factor_type_h,
+                                   num_boot,
+                                   C012_buf = None,
+                                   ci_alpha = 0.05,
+                                   boot_seed = 0,
+                                   pooled_tag = 'Pooled', 
+                                   bonafide_tag = 'bonafide',
+                                   spoofed_tag = 'spoof',
+                                   col_score_name = 'score',
+                                   n_jobs = 1,
+                                   factor_idx = None,
+                                   scores = None)
+    
+    Bootstrap confidence intervals of the min t-DCF and EER in the 
+    decomposed conditions.
 
-    Compute the min tDCF and EER values given a score file.
-    The output shares the same format as that on CodaLab page.
+    In each cell, the bona fide and spoofed trials are resampled with 
+    replacement num_boot times, and the percentile interval of the min t-DCF 
+    (or EER) over the replicates is returned. The replicates are computed in 
+    batches as integer weights over the sorted scores, without sorting the
+    scores again.
+
+    The random numbers of each cell are decided by boot_seed and the position
+    of the cell. The results do not depend on n_jobs.
 
     input
     -----
-      cm_score_file   str, path to the CM score file
-      track           str, 'LA', 'PA', or 'DF'
-      subset          str, name of subset, eval, progress, or hidden
-      label_dir       str, path to the directory of key and meta labels
-                      label_dir is the directory downloaded from ASVspoof.org
-                      It should contain the following files
-                      \- DF
-                         \- CM 
-                             |- trial_metadata.txt
-                             |- ...
-                      \- LA
-                         ...
-                      \- PA
-                         ...
-      asv_score_file      str, path to the ASV score file, default None
-                          If None, ASV score in label_dir will be loaded
+      num_boot        int, number of bootstrap replicates
+      ci_alpha        float, the confidence level is (1 - ci_alpha),
+                      default 0.05
+      boot_seed       int, random seed, default 0
 
-      flag_recompute_c012 bool, whether recompute C012 coef
-                          default False
-
-      external_c012_path  str, path to external C012 file
-                          If None, path is specified by config.py
+      For other arguments, see compute_decomposed_mintdcf_eer
 
     output
     ------
-      mintdcf_array   np.array, the numpy array of min t-DCF
-      eer_array       np.array, the numpy array of EER
+      mintDCF_ci      np.array, (num_row, num_col, 2), lower and upper bounds
+                      of min t-DCF values in all conditions
+      eer_ci          np.array, (num_row, num_col, 2), lower and upper bounds
+                      of EER values in all conditions
+    """
+    # data shared by all the rows
+    shared_buf = _prepare_decomposed_buf(
+        score_pd, factor_name_v, factor_value_v, factor_type_v,
+        factor_name_h, factor_value_h, factor_type_h,
+        C012_buf, pooled_tag, bonafide_tag, spoofed_tag,
+        col_score_name, False, factor_idx, scores)
+    shared_buf['num_boot'] = num_boot
+    shared_buf['ci_alpha'] = ci_alpha
+    shared_buf['boot_seed'] = boot_seed
+
+    num_row = len(shared_buf['factor_list_1'])
+    num_col = len(shared_buf['factor_list_2'])
+
+    # output buffer
+    mintDCF_ci = np.zeros([num_row, num_col, 2])
+    eer_ci = np.zeros_like(mintDCF_ci)
+
+    print('\n' + ''.join(['-'] * (num_row - 1)) + 
+          '>| bootstrap with {:d} replicates'.format(num_boot))
+
+    def _save_row(id1, row_result):
+        print(".", end = '', flush=True)
+        mintDCF_ci[id1], eer_ci[id1] = row_result
+        return
+
+    parallel_tools.map_jobs(_compute_bootstrap_row, list(range(num_row)), 
+                            shared_buf, n_jobs, _save_row)
+    print("")
+    return mintDCF_ci, eer_ci
+
+
+def load_track_config(track):
+    """ config_buf = load_track_config(track)
+
+    Load the configuration of a track, None if the track is unknown
     """
-    
-    # ===========
-    # load configuration for each trakc
-    # ===========
     if track == config.g_LA_track:
-        config_buf = config.ConfigLA()
+        return config.ConfigLA()
     elif track == config.g_PA_track:
-        config_buf = config.ConfigPA()
+        return config.ConfigPA()
     elif track == config.g_DF_track:
-        config_buf = config.ConfigDF()
+        return config.ConfigDF()
     else:
         print("ERROR: unknown track: {:s}".format(track))
         return None
 
-    # ===========
-    # load CM protocol & score
-    # ===========
-    protocol_cm_file = os.path.join(label_dir, config_buf.protocol_cm_file)
-    protocol_cm_pd = pd_tools.load_protocol(protocol_cm_file, 
-                                            names = config_buf.p_names, 
-                                            index_col = config_buf.index_col)
-    # load score file
-    score_cm_pd = pd_tools.load_score(cm_score_file, config_buf.s_names, 
-                                      index_col = config_buf.index_col)
-    # merge score and protocol into a single dataFrame
-    score_cm_pd = pd_tools.join_protocol_score(
-        protocol_cm_pd, score_cm_pd[[config_buf.score_col]])
 
-    # ===========
-    # select the subset
-    # ===========
+def get_subset_query(config_buf, track, subset):
+    """ subset_query = get_subset_query(config_buf, track, subset)
+
+    Query to select the trials in the subset
+    """
     if track == config.g_PA_track and subset in config_buf.hidden:
         # special for PA
-        subset_query = config_buf.hidden[subset]
+        return config_buf.hidden[subset]
     else:
         # other cases
-        subset_query = '{:s} == "{:s}"'.format(config_buf.subset_col, subset)
-    # get the evaluation subset data frame
-    tmp_score_cm_pd = score_cm_pd.query(subset_query)
+        return '{:s} == "{:s}"'.format(config_buf.subset_col, subset)
 
 
-    # ===========
-    # on C012
-    # ===========
-    
-    # specify the path C012 dictionary
+def get_subset_mask(protocol_cm_pd, subset_query):
+    """ mask = get_subset_mask(protocol_cm_pd, subset_query)
+
+    Boolean mask of the protocol trials in the subset, np.array
+    """
+    return protocol_cm_pd.eval(subset_query).to_numpy(dtype=bool)
+
+
+def load_cm_protocol(config_buf, label_dir):
+    """ protocol_cm_pd, aligner = load_cm_protocol(config_buf, label_dir)
+
+    Load the CM protocol and the aligner of its trial IDs
+    """
+    protocol_cm_file = os.path.join(label_dir, config_buf.protocol_cm_file)
+    protocol_cm_pd = pd_tools.load_protocol(protocol_cm_file, 
+                                            names = config_buf.p_names, 
+                                            index_col = config_buf.index_col)
+    # sorted trial IDs saved in the protocol cache, if any
+    trial_ids, order = protocol_cache.load_index_order(
+        protocol_cm_file, config_buf.p_names, config_buf.index_col)
+    if trial_ids is None:
+        aligner = trial_align.TrialAligner(protocol_cm_pd.index)
+    else:
+        aligner = trial_align.TrialAligner(trial_ids, order)
+    return protocol_cm_pd, aligner
+
+
+def load_cm_score(cm_score_file, aligner, config_buf):
+    """ scores = load_cm_score(cm_score_file, aligner, config_buf)
+
+    Load the CM score and put the scores in the order of the CM protocol
+    """
+    # read and validate the score file block by block
+    return score_reader.load_scores(
+        cm_score_file, len(config_buf.s_names), 
+        config_buf.s_names.index(config_buf.index_col), 
+        config_buf.s_names.index(config_buf.score_col), 
+        aligner = aligner)
+
+
+def get_C012_path(config_buf, subset, label_dir = './', 
+                  external_c012_path = None, flag_recompute = False):
+    """ c012_file = get_C012_path(config_buf, subset, label_dir = './', 
+                                  external_c012_path = None,
+                                  flag_recompute = False)
+
+    Path to the C012 file of the subset, external_c012_path if given.
+
+    Otherwise, C012 re-computed with flag_recompute is saved as JSON next
+    to the pre-computed file in config.py (e.g., LA/LA-C012-eval.json next
+    to LA/LA-C012-eval.npy), and is used instead of the pre-computed file
+    if it exists.
+    """
     if external_c012_path is None or len(external_c012_path) == 0:
-        # use pre-computed C012
+        # pre-computed C012 in the previous (pickle) format
         c012_file = os.path.join(label_dir, config_buf.c012_file[subset])
-    else:
-        c012_file = external_c012_path
+        recomputed_file = os.path.splitext(c012_file)[0] + '.json'
+        if flag_recompute or os.path.isfile(recomputed_file):
+            return recomputed_file
+        return c012_file
+    return external_c012_path
+
+
+def get_result_store_key(store, cm_score_file, config_buf, subset, 
+                         label_dir = './', external_c012_path = None,
+                         num_boot = 0, ci_alpha = 0.05):
+    """ key = get_result_store_key(store, cm_score_file, config_buf, subset,
+          label_dir = './', external_c012_path = None, num_boot = 0, 
+          ci_alpha = 0.05)
+
+    Key of the results in store (result_store.ResultStore).
+    None if the score file, the protocol, or the C012 file cannot be found.
+    """
+    protocol_cm_file = os.path.join(label_dir, config_buf.protocol_cm_file)
+    if not os.path.isfile(cm_score_file) or \
+       not os.path.isfile(protocol_cm_file):
+        return None
+    c012_file = None
+    if config_buf.flag_tDCF:
+        c012_file = get_C012_path(config_buf, subset, label_dir, 
+                                  external_c012_path)
+        if not os.path.isfile(c012_file):
+            return None
+    return store.get_key(cm_score_file, config_buf.track, subset, c012_file,
+                         num_boot, ci_alpha, protocol_file = protocol_cm_file)
+
+
+def load_asv_score(config_buf, label_dir = './', asv_score_file = None):
+    """ asv_score_pd, asv_score_file = load_asv_score(config_buf, 
+                                         label_dir = './', 
+                                         asv_score_file = None)
+
+    Load the ASV protocol and ASV scores of a track into one dataFrame.
+    If asv_score_file is None, the ASV scores by organizers are loaded, and
+    the path to them is returned as asv_score_file.
+    """
+    # protocol ASV
+    protocol_asv_file = os.path.join(label_dir, config_buf.protocol_asv_file)
+    if not os.path.isfile(protocol_asv_file):
+        print("Cannot find ASV protocol {:s}".format(protocol_asv_file))
+        sys.exit(1)
+    # score ASV
+    if asv_score_file is None or len(asv_score_file) == 0:
+        # use pre-computed ASV score
+        asv_score_file = os.path.join(label_dir, config_buf.pre_score_asv_file)
+    if not os.path.isfile(asv_score_file):
+        print("Cannot find ASV score file {:s}".format(asv_score_file))
+        sys.exit(1)
+
+    protocol_asv_pd = pd_tools.load_protocol(protocol_asv_file, 
+                                             names = config_buf.p_names_asv)
+    # load score file, the i-th line is the score of the i-th trial
+    asv_scores = score_reader.load_scores(
+        asv_score_file, len(config_buf.s_names_asv), 
+        config_buf.s_names_asv.index(config_buf.index_col),
+        config_buf.s_names_asv.index(config_buf.score_col),
+        num_trial = len(protocol_asv_pd))
+    # add score to the protocol dataFrame
+    asv_score_pd = protocol_asv_pd.assign(
+        **{config_buf.score_col: asv_scores})
+    return asv_score_pd, asv_score_file
+
+
+def get_C012_info(config_buf, subset, asv_score_file):
+    """ c012_info = get_C012_info(config_buf, subset, asv_score_file)
+
+    Configuration saved with C012, see eval_wrapper.check_C012_info
+    """
+    return {'track': config_buf.track, 'subset': subset,
+            'cost_model': config.cost_model,
+            'asv_score_file': os.path.abspath(asv_score_file),
+            'asv_score_sha256': eval_wrapper.get_file_sha256(asv_score_file)}
+
+
+def load_C012(config_buf, subset, subset_query, label_dir = './',
+              flag_recompute_c012 = False,
+              asv_score_file = None, 
+              external_c012_path = None,
+              n_jobs = 1):
+    """ C012_buf = load_C012(config_buf, subset, subset_query, 
+                             label_dir = './', flag_recompute_c012 = False,
+                             asv_score_file = None, external_c012_path = None,
+                             n_jobs = 1)
+
+    Load (or re-compute) C012 dictionary of a track.
+    See evaluation_API for the input arguments.
+
+    C012_buf is None if t-DCF is not applicable to the track.
+    """
+    # specify the path C012 dictionary
+    c012_file = get_C012_path(config_buf, subset, label_dir, 
+                              external_c012_path, 
+                              config_buf.flag_tDCF and flag_recompute_c012)
         
         
     # compute C012 if necessary
     if config_buf.flag_tDCF and flag_recompute_c012:
-        # protocol ASV
-        protocol_asv_file = os.path.join(label_dir, config_buf.protocol_asv_file)
-        if not os.path.isfile(protocol_asv_file):
-            print("Cannot find ASV protocol {:s}".format(protocol_asv_file))
-            sys.exit(1)
-        # score ASV
-        if asv_score_file is None or len(asv_score_file) == 0:
-            # use pre-computed ASV score
-            asv_score_file = os.path.join(label_dir, config_buf.pre_score_asv_file)
-        if not os.path.isfile(asv_score_file):
-            print("Cannot find ASV score file {:s}".format(asv_score_file))
-            sys.exit(1)
-
         print("===============\nCompute C012 coef\n===============")
-        protocol_asv_pd = pd_tools.load_protocol(protocol_asv_file, 
-                                                 names = config_buf.p_names_asv)
-        # load score file
-        asv_score_pd = pd_tools.load_score(
-            asv_score_file, config_buf.s_names_asv)
-        # merge score and protocol into a single dataFrame
-        asv_score_pd = pd_tools.join_protocol_score(
-            protocol_asv_pd, asv_score_pd[[config_buf.score_col]])
+        asv_score_pd, asv_score_file = load_asv_score(
+            config_buf, label_dir, asv_score_file)
 
         # get the evaluation subset data frame
         tmp_asv_score_pd = asv_score_pd.query(subset_query)
@@ -699,8 +1256,12 @@ def evaluation_API(cm_score_file, track, subset = 'eval', label_dir = './',
                                      config_buf.factor_1_type,
                                      config_buf.factor_name_2, 
                                      config_buf.factor_2_list, 
-                                     config_buf.factor_2_type)
-        eval_wrapper.dump_C012_dict(C012_buf, c012_file)
+                                     config_buf.factor_2_type,
+                                     n_jobs = n_jobs)
+        # save the configuration, so that out-of-date C012 can be detected
+        eval_wrapper.dump_C012_dict(
+            C012_buf, c012_file, 
+            get_C012_info(config_buf, subset, asv_score_file))
         print("Save C012 coef to {:s}".format(c012_file))
             
     
@@ -711,34 +1272,35 @@ def evaluation_API(cm_score_file, track, subset = 'eval', label_dir = './',
             sys.exit(1)
         print("=============== \nCompute EERs, min tDCFs\n===============")
         print("Load C012 coeffs from {:s}".format(c012_file))
-        C012_buf = eval_wrapper.load_C012_dict(c012_file)        
+        try:
+            C012_buf, c012_info = eval_wrapper.load_C012_file(c012_file)
+        except ValueError as err:
+            print("Error: {:s}".format(str(err)))
+            sys.exit(1)
+        reasons = eval_wrapper.check_C012_info(
+            c012_info, config.cost_model, config_buf.track, subset, 
+            asv_score_file)
+        if len(reasons):
+            print("Error: C012 file {:s} is out of date:".format(c012_file))
+            for reason in reasons:
+                print("  " + reason)
+            print("Please re-compute it with --recompute-c012")
+            sys.exit(1)
     else:
         print("========== \nCompute EERs\n==========")
         print("Track without considering ASV")
         C012_buf = None
-    
-    # ===========        
-    # compute min tDCF and EERs
-    # ===========
-    mintdcf_array, eer_array = compute_decomposed_mintdcf_eer(
-        tmp_score_cm_pd, 
-        config_buf.factor_name_1, 
-        config_buf.factor_1_list, 
-        config_buf.factor_1_type,
-        config_buf.factor_name_2, 
-        config_buf.factor_2_list, 
-        config_buf.factor_2_type,
-        C012_buf = C012_buf,
-        pooled_tag = config_buf.pooled_tag, 
-        col_score_name = config_buf.score_col,
-        flag_verbose = False)
-    
-    # ===========
-    # print results
-    # ===========
+    return C012_buf
+
+
+def print_results(mintdcf_array, eer_array, config_buf, flag_tDCF):
+    """ print_results(mintdcf_array, eer_array, config_buf, flag_tDCF)
+
+    Print the min tDCF (if flag_tDCF) and EER tables
+    """
     print("\n\n")
     # print min tDCF table
-    if C012_buf is not None:
+    if flag_tDCF:
         print("\n===============\nTable for min tDCFs\n===============\n")
         table_API.print_table(mintdcf_array, 
                     config_buf.factor_2_tag_list, 
@@ -757,10 +1319,966 @@ def evaluation_API(cm_score_file, track, subset = 'eval', label_dir = './',
                 with_color_cell = True,
                 print_latex_table=True, 
                 print_text_table=True);
+    return
 
+
+def print_polarity_check(pooled_buf, flag_tDCF):
+    """ print_polarity_check(pooled_buf, flag_tDCF)
+
+    Warn if the negated scores give a better pooled min tDCF (if flag_tDCF)
+    or EER, which suggests that the class labels were swapped.
+    pooled_buf is filled by compute_decomposed_mintdcf_eer.
+    """
+    if flag_tDCF:
+        name, value, value_neg = 'min tDCF', pooled_buf['min_tDCF'], \
+                                 pooled_buf['min_tDCF_negated']
+    else:
+        name, value, value_neg = 'EER', pooled_buf['EER'] * 100, \
+                                 pooled_buf['EER_negated'] * 100
+    if value_neg < value:
+        print("\nCHECK: we negated your scores and achieved a lower pooled "
+              "{:s}. Before: {:.3f} - Negated: {:.3f}".format(
+                  name, value, value_neg))
+        print("Are the positive (bona fide) and negative (spoofed) classes "
+              "swapped? Higher scores should indicate bona fide trials.")
+    elif value_neg == value:
+        print("\nWARNING: negating your scores gives the same pooled "
+              "{:s}. Are all the scores the same?".format(name))
+    return
+
+
+def print_calibration_results(calib_buf, config_buf, flag_tDCF):
+    """ print_calibration_results(calib_buf, config_buf, flag_tDCF)
+
+    Print the tables of actual tDCF (if flag_tDCF), Cllr, and min Cllr.
+    calib_buf is filled by compute_decomposed_mintdcf_eer.
+    """
+    tables = []
+    if flag_tDCF:
+        tables.append(("actual tDCFs (CM threshold {:g})".format(
+            calib_buf['threshold']), calib_buf['actual_tDCF']))
+    tables.append(("Cllrs", calib_buf['Cllr']))
+    tables.append(("min Cllrs", calib_buf['min_Cllr']))
+
+    print("\n\n")
+    for name, data_array in tables:
+        print("\n===============\nTable for {:s}\n===============\n".format(
+            name))
+        table_API.print_table(data_array, 
+                    config_buf.factor_2_tag_list, 
+                    config_buf.factor_1_tag_list, 
+                    print_format = "1.4f", 
+                    with_color_cell = True,
+                    print_latex_table=True, 
+                    print_text_table=True);
+    return
+
+
+def print_ci_results(mintdcf_ci, eer_ci, config_buf, flag_tDCF, 
+                     ci_alpha = 0.05):
+    """ print_ci_results(mintdcf_ci, eer_ci, config_buf, flag_tDCF,
+                         ci_alpha = 0.05)
+
+    Print the tables of the lower and upper bounds of the confidence 
+    intervals of min tDCF (if flag_tDCF) and EER
+    """
+    level = "{:g}% CI".format((1 - ci_alpha) * 100)
+    tables = []
+    if flag_tDCF:
+        tables.append(("min tDCFs", mintdcf_ci, "1.4f"))
+    tables.append(("EERs", eer_ci * 100, "1.2f"))
+
+    print("\n\n")
+    for name, data_ci, print_format in tables:
+        for bound_idx, bound in enumerate(["lower", "upper"]):
+            print("\n===============\nTable for {:s}, {:s} bound of {:s}"
+                  "\n===============\n".format(name, bound, level))
+            table_API.print_table(data_ci[:, :, bound_idx], 
+                        config_buf.factor_2_tag_list, 
+                        config_buf.factor_1_tag_list, 
+                        print_format = print_format, 
+                        with_color_cell = True,
+                        print_latex_table=True, 
+                        print_text_table=True);
+    return
+
+
+def evaluation_API(cm_score_file, track, subset = 'eval', label_dir = './',
+                   flag_recompute_c012 = False,
+                   asv_score_file = None, 
+                   external_c012_path = None,
+                   n_jobs = 1,
+                   num_boot = 0,
+                   ci_alpha = 0.05,
+                   profiler = None,
+                   det_curve_file = None,
+                   store = None,
+                   calib_threshold = None):
+    """ mintdcf_array, eer_array = evaluation_API(cm_score_file, 
+          track, subset = 'eval', label_dir = './',
+          flag_recompute_c012 = True, asv_score_file = None, 
+          external_c012_path = None, n_jobs = 1, num_boot = 0,
+          ci_alpha = 0.05, profiler = None, det_curve_file = None,
+          store = None, calib_threshold = None)
+
+    Compute the min tDCF and EER values given a score file.
+    The output shares the same format as that on CodaLab page.
+
+    input
+    -----
+      cm_score_file   str, path to the CM score file
+      track           str, 'LA', 'PA', or 'DF'
+      subset          str, name of subset, eval, progress, or hidden
+      label_dir       str, path to the directory of key and meta labels
+                      label_dir is the directory downloaded from ASVspoof.org
+                      It should contain the following files
+                      \- DF
+                         \- CM 
+                             |- trial_metadata.txt
+                             |- ...
+                      \- LA
+                         ...
+                      \- PA
+                         ...
+      asv_score_file      str, path to the ASV score file, default None
+                          If None, ASV score in label_dir will be loaded
+
+      flag_recompute_c012 bool, whether recompute C012 coef
+                          default False
+
+      external_c012_path  str, path to external C012 file
+                          If None, path is specified by config.py
+
+      n_jobs              int, number of processes to compute the
+                          decomposed results, default 1
+
+      num_boot            int, number of bootstrap replicates. If > 0, the
+                          (1 - ci_alpha) confidence intervals are printed 
+                          after the results. Default 0
+
+      ci_alpha            float, see num_boot, default 0.05
+
+      profiler            profile_tools.StageProfiler, or None
+                          if not None, wall time and memory of each stage
+                          are recorded in it. Default None
+
+      det_curve_file      str, path to save the DET curve of the pooled 
+                          condition (at most 2000 points), see 
+                          result_tools.dump_det_curve. Default None
+
+      store               result_store.ResultStore, or None
+                          if not None, results of an identical evaluation
+                          are loaded from the store, and new results are
+                          saved to the store. Default None
+
+      calib_threshold     float, or None
+                          if not None, the actual tDCF at this CM threshold 
+                          (if t-DCF is applicable), Cllr, and min Cllr are
+                          printed after the results, see 
+                          compute_decomposed_mintdcf_eer. Default None
+
+    output
+    ------
+      mintdcf_array   np.array, the numpy array of min t-DCF
+      eer_array       np.array, the numpy array of EER
+    """
+    
+    # ===========
+    # load configuration for each trakc
+    # ===========
+    config_buf = load_track_config(track)
+    if config_buf is None:
+        return None
+
+    if profiler is None:
+        profiler = profile_tools.StageProfiler(flag_active = False)
+
+    # ===========
+    # load results of an identical evaluation from the store
+    # ===========
+    # the DET curve and the calibration metrics are not stored, 
+    # and C012 may change if it is recomputed
+    if store is not None and not flag_recompute_c012 and not det_curve_file \
+       and calib_threshold is None:
+        with profiler.stage('results store'):
+            store_key = get_result_store_key(
+                store, cm_score_file, config_buf, subset, label_dir, 
+                external_c012_path, num_boot, ci_alpha)
+            results = store.get(store_key)
+        if results is not None:
+            print("Load results from the store {:s}".format(
+                store.store_dir))
+            with profiler.stage('print'):
+                mintdcf_array, eer_array = result_tools.results_to_arrays(
+                    results)
+                print_results(mintdcf_array, eer_array, config_buf, 
+                              config_buf.flag_tDCF)
+                if 'polarity' in results:
+                    print_polarity_check(results['polarity'], 
+                                         config_buf.flag_tDCF)
+                if num_boot > 0:
+                    print_ci_results(
+                        *result_tools.results_to_ci_arrays(results), 
+                        config_buf, config_buf.flag_tDCF, ci_alpha)
+            return mintdcf_array, eer_array
+
+    # ===========
+    # load CM protocol & score
+    # ===========
+    with profiler.stage('load protocol'):
+        protocol_cm_pd, aligner = load_cm_protocol(config_buf, label_dir)
+    # the score file is aligned with the protocol while being read
+    with profiler.stage('load score & align'):
+        cm_scores = load_cm_score(cm_score_file, aligner, config_buf)
+
+    # ===========
+    # select the subset
+    # ===========
+    with profiler.stage('subset query'):
+        subset_query = get_subset_query(config_buf, track, subset)
+        subset_mask = get_subset_mask(protocol_cm_pd, subset_query)
+        subset_pd = protocol_cm_pd[subset_mask]
+        subset_scores = cm_scores[subset_mask]
+
+    # ===========
+    # on C012
+    # ===========
+    with profiler.stage('C012 compute/load'):
+        C012_buf = load_C012(config_buf, subset, subset_query, label_dir,
+                             flag_recompute_c012, asv_score_file, 
+                             external_c012_path, n_jobs)
+    
+    # ===========        
+    # compute min tDCF and EERs
+    # ===========
+    pooled_buf = dict()
+    calib_buf = None if calib_threshold is None else dict()
+    with profiler.stage('decomposition'):
+        mintdcf_array, eer_array = compute_decomposed_mintdcf_eer(
+            subset_pd, 
+            config_buf.factor_name_1, 
+            config_buf.factor_1_list, 
+            config_buf.factor_1_type,
+            config_buf.factor_name_2, 
+            config_buf.factor_2_list, 
+            config_buf.factor_2_type,
+            C012_buf = C012_buf,
+            pooled_tag = config_buf.pooled_tag, 
+            col_score_name = config_buf.score_col,
+            flag_verbose = False,
+            n_jobs = n_jobs,
+            scores = subset_scores,
+            profiler = profiler,
+            pooled_buf = pooled_buf,
+            calib_buf = calib_buf,
+            calib_threshold = calib_threshold)
+    
+    # ===========
+    # print results
+    # ===========
+    with profiler.stage('print'):
+        print_results(mintdcf_array, eer_array, config_buf, 
+                      C012_buf is not None)
+        print_polarity_check(pooled_buf, C012_buf is not None)
+        if calib_buf is not None:
+            print_calibration_results(calib_buf, config_buf, 
+                                      C012_buf is not None)
+        if det_curve_file:
+            result_tools.dump_det_curve(det_curve_file, *pooled_buf['det'][:3])
+            print("Save DET curve of the pooled condition to {:s}".format(
+                det_curve_file))
+
+    # ===========
+    # bootstrap confidence intervals
+    # ===========
+    if num_boot > 0:
+        with profiler.stage('bootstrap'):
+            mintdcf_ci, eer_ci = compute_decomposed_bootstrap_ci(
+                subset_pd, 
+                config_buf.factor_name_1, 
+                config_buf.factor_1_list, 
+                config_buf.factor_1_type,
+                config_buf.factor_name_2, 
+                config_buf.factor_2_list, 
+                config_buf.factor_2_type,
+                num_boot,
+                C012_buf = C012_buf,
+                ci_alpha = ci_alpha,
+                pooled_tag = config_buf.pooled_tag, 
+                col_score_name = config_buf.score_col,
+                n_jobs = n_jobs,
+                scores = subset_scores)
+        with profiler.stage('print bootstrap'):
+            print_ci_results(mintdcf_ci, eer_ci, config_buf, 
+                             C012_buf is not None, ci_alpha)
+    else:
+        mintdcf_ci, eer_ci = None, None
+
+    # ===========
+    # save results to the store
+    # ===========
+    if store is not None:
+        with profiler.stage('results store'):
+            results = result_tools.results_to_dict(
+                mintdcf_array, eer_array, 
+                config_buf.factor_1_tag_list, config_buf.factor_2_tag_list,
+                track, subset, cm_score_file, config_buf.pooled_tag,
+                mintdcf_ci, eer_ci)
+            results['polarity'] = {
+                x: None if np.isnan(pooled_buf[x]) else float(pooled_buf[x])
+                for x in ['min_tDCF', 'EER', 'min_tDCF_negated', 
+                          'EER_negated']}
+            store.put(get_result_store_key(
+                store, cm_score_file, config_buf, subset, label_dir, 
+                external_c012_path, num_boot, ci_alpha), results)
     return mintdcf_array, eer_array
 
 
+def prepare_evaluation(track, subset = 'eval', label_dir = './',
+                       flag_recompute_c012 = False,
+                       asv_score_file = None, 
+                       external_c012_path = None,
+                       n_jobs = 1):
+    """ eval_buf = prepare_evaluation(track, subset = 'eval', 
+          label_dir = './', flag_recompute_c012 = False, 
+          asv_score_file = None, external_c012_path = None, n_jobs = 1)
+
+    Load the configuration, CM protocol, C012, and factor index of a track
+    and subset. The returned eval_buf can be used to evaluate any number of 
+    score files by evaluate_scores. 
+
+    See evaluation_API for the input arguments. 
+    eval_buf is None if the track is unknown.
+    """
+    config_buf = load_track_config(track)
+    if config_buf is None:
+        return None
+    
+    protocol_cm_pd, aligner = load_cm_protocol(config_buf, label_dir)
+    subset_query = get_subset_query(config_buf, track, subset)
+    subset_mask = get_subset_mask(protocol_cm_pd, subset_query)
+    return _prepare_subset_buf(config_buf, protocol_cm_pd, aligner, subset,
+                               subset_mask, label_dir, flag_recompute_c012,
+                               asv_score_file, external_c012_path, n_jobs)
+
+
+def _prepare_subset_buf(config_buf, protocol_cm_pd, aligner, subset, 
+                        subset_mask, label_dir, flag_recompute_c012,
+                        asv_score_file, external_c012_path, n_jobs):
+    """ eval_buf = _prepare_subset_buf(config_buf, protocol_cm_pd, aligner,
+          subset, subset_mask, label_dir, flag_recompute_c012,
+          asv_score_file, external_c012_path, n_jobs)
+
+    Load C012 and encode the factors of one subset of a loaded protocol. 
+    See prepare_evaluation.
+    """
+    subset_query = get_subset_query(config_buf, config_buf.track, subset)
+    subset_pd = protocol_cm_pd[subset_mask]
+    
+    C012_buf = load_C012(config_buf, subset, subset_query, label_dir,
+                         flag_recompute_c012, asv_score_file, 
+                         external_c012_path, n_jobs)
+
+    # the factors of the subset trials are encoded once
+    factor_idx = factor_index.FactorIndex(subset_pd)
+
+    return {'track': config_buf.track, 'subset': subset, 
+            'config_buf': config_buf, 
+            'aligner': aligner, 'subset_mask': subset_mask, 
+            'subset_pd': subset_pd, 'C012_buf': C012_buf, 
+            'factor_idx': factor_idx}
+
+
+def evaluate_scores(eval_buf, cm_scores, num_boot = 0, ci_alpha = 0.05,
+                    n_jobs = 1):
+    """ mintdcf_array, eer_array, mintdcf_ci, eer_ci = evaluate_scores(
+          eval_buf, cm_scores, num_boot = 0, ci_alpha = 0.05, n_jobs = 1)
+
+    Compute the min tDCF and EER values of the scores.
+
+    input
+    -----
+      eval_buf        dict, from prepare_evaluation
+      cm_scores       np.array, CM scores in the order of the CM protocol,
+                      e.g., from load_cm_score(path, eval_buf['aligner'], 
+                      eval_buf['config_buf'])
+      num_boot        int, number of bootstrap replicates, default 0
+      ci_alpha        float, the confidence level is (1 - ci_alpha)
+      n_jobs          int, number of processes, default 1
+
+    output
+    ------
+      mintdcf_array   np.array, the numpy array of min t-DCF
+      eer_array       np.array, the numpy array of EER
+      mintdcf_ci      np.array, confidence intervals of min t-DCF, 
+                      None if num_boot is 0
+      eer_ci          np.array, confidence intervals of EER,
+                      None if num_boot is 0
+    """
+    return evaluate_subset_scores(eval_buf, cm_scores[eval_buf['subset_mask']],
+                                  num_boot, ci_alpha, n_jobs)
+
+
+def evaluate_subset_scores(eval_buf, subset_scores, num_boot = 0, 
+                           ci_alpha = 0.05, n_jobs = 1):
+    """ mintdcf_array, eer_array, mintdcf_ci, eer_ci = evaluate_subset_scores(
+          eval_buf, subset_scores, num_boot = 0, ci_alpha = 0.05, n_jobs = 1)
+
+    Same as evaluate_scores, but subset_scores are the CM scores of the 
+    trials in eval_buf['subset_pd'], i.e., cm_scores[eval_buf['subset_mask']]
+    """
+    config_buf = eval_buf['config_buf']
+    factor_args = (config_buf.factor_name_1, 
+                   config_buf.factor_1_list, 
+                   config_buf.factor_1_type,
+                   config_buf.factor_name_2, 
+                   config_buf.factor_2_list, 
+                   config_buf.factor_2_type)
+
+    mintdcf_array, eer_array = compute_decomposed_mintdcf_eer(
+        eval_buf['subset_pd'], *factor_args,
+        C012_buf = eval_buf['C012_buf'],
+        pooled_tag = config_buf.pooled_tag, 
+        col_score_name = config_buf.score_col,
+        flag_verbose = False,
+        n_jobs = n_jobs,
+        factor_idx = eval_buf['factor_idx'],
+        scores = subset_scores)
+    if num_boot <= 0:
+        return mintdcf_array, eer_array, None, None
+
+    mintdcf_ci, eer_ci = compute_decomposed_bootstrap_ci(
+        eval_buf['subset_pd'], *factor_args, num_boot,
+        C012_buf = eval_buf['C012_buf'],
+        ci_alpha = ci_alpha,
+        pooled_tag = config_buf.pooled_tag, 
+        col_score_name = config_buf.score_col,
+        n_jobs = n_jobs,
+        factor_idx = eval_buf['factor_idx'],
+        scores = subset_scores)
+    return mintdcf_array, eer_array, mintdcf_ci, eer_ci
+
+
+def _evaluation_batch_job(shared_buf, cm_score_file):
+    """ mintdcf_array, eer_array, mintdcf_ci, eer_ci = 
+          _evaluation_batch_job(shared_buf, cm_score_file)
+
+    Evaluate one score file. Used by evaluation_API_batch.
+    mintdcf_ci and eer_ci are None if shared_buf['num_boot'] is 0.
+    Return (None, None, None, None) if the score file cannot be evaluated.
+    """
+    try:
+        cm_scores = load_cm_score(
+            cm_score_file, shared_buf['aligner'], shared_buf['config_buf'])
+        return evaluate_scores(shared_buf, cm_scores, 
+                               shared_buf['num_boot'], shared_buf['ci_alpha'])
+    except (SystemExit, Exception) as err:
+        # one invalid score file should not stop the others
+        print("\nERROR: fail to evaluate {:s}: {:s}".format(
+            cm_score_file, str(err)))
+        return None, None, None, None
+
+
+def evaluation_API_batch(cm_score_files, track, subset = 'eval', 
+                         label_dir = './',
+                         flag_recompute_c012 = False,
+                         asv_score_file = None, 
+                         external_c012_path = None,
+                         output_dir = './results',
+                         n_jobs = 1,
+                         num_boot = 0,
+                         ci_alpha = 0.05,
+                         store = None):
+    """ results_list = evaluation_API_batch(cm_score_files, 
+          track, subset = 'eval', label_dir = './',
+          flag_recompute_c012 = True, asv_score_file = None, 
+          external_c012_path = None, output_dir = './results', n_jobs = 1,
+          num_boot = 0, ci_alpha = 0.05, store = None)
+
+    Compute the min tDCF and EER values for many score files.
+
+    The configuration, protocol, and C012 of the track are loaded only once.
+    Results of each score file are saved to output_dir/SYSTEM.json, where
+    SYSTEM is derived from the name of the score file. 
+    A summary of the pooled results is saved to output_dir/summary.json and
+    output_dir/summary.txt.
+
+    input
+    -----
+      cm_score_files  list of str, paths to the CM score files
+      output_dir      str, directory to save the results
+      n_jobs          int, number of processes over which the score files
+                      are evaluated, default 1
+      num_boot        int, number of bootstrap replicates. If > 0, the 
+                      confidence intervals are saved in the results
+      store           result_store.ResultStore, or None. If not None, 
+                      score files evaluated before are loaded from the 
+                      store, and the protocol is loaded only if some score
+                      files are not in the store
+
+      For other arguments, see evaluation_API
+
+    output
+    ------
+      results_list    list of dict, results of each score file,
+                      see result_tools.results_to_dict.
+                      None if a score file cannot be evaluated.
+    """
+    config_buf = load_track_config(track)
+    if config_buf is None:
+        return None
+    
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    names = result_tools.get_system_names(cm_score_files)
+    results_list = [None] * len(cm_score_files)
+
+    def _save_results(file_idx, results):
+        result_tools.dump_results_json(
+            results, os.path.join(output_dir, names[file_idx] + '.json'))
+        results_list[file_idx] = results
+        return
+
+    # ===========
+    # load the results of identical evaluations from the store
+    # ===========
+    if store is not None and not flag_recompute_c012:
+        for file_idx, cm_score_file in enumerate(cm_score_files):
+            results = store.get(get_result_store_key(
+                store, cm_score_file, config_buf, subset, label_dir, 
+                external_c012_path, num_boot, ci_alpha))
+            if results is not None:
+                results['score_file'] = cm_score_file
+                results.pop('polarity', None)
+                _save_results(file_idx, results)
+        print("Load results of {:d} score files from the store {:s}".format(
+            sum(x is not None for x in results_list), store.store_dir))
+    todo_list = [x for x in range(len(cm_score_files)) 
+                 if results_list[x] is None]
+
+    if len(todo_list):
+        # ===========
+        # load configuration, protocol, and C012 once
+        # ===========
+        shared_buf = prepare_evaluation(track, subset, label_dir, 
+                                        flag_recompute_c012, asv_score_file,
+                                        external_c012_path, n_jobs)
+        config_buf = shared_buf['config_buf']
+
+        # ===========
+        # evaluate each score file
+        # ===========
+        shared_buf['num_boot'] = num_boot
+        shared_buf['ci_alpha'] = ci_alpha
+
+        def _save_job_results(job_id, job_result):
+            mintdcf_array, eer_array, mintdcf_ci, eer_ci = job_result
+            if eer_array is None:
+                return
+            file_idx = todo_list[job_id]
+            results = result_tools.results_to_dict(
+                mintdcf_array, eer_array, 
+                config_buf.factor_1_tag_list, config_buf.factor_2_tag_list, 
+                track, subset, cm_score_files[file_idx], 
+                config_buf.pooled_tag, mintdcf_ci, eer_ci)
+            _save_results(file_idx, results)
+            if store is not None:
+                store.put(get_result_store_key(
+                    store, cm_score_files[file_idx], config_buf, subset, 
+                    label_dir, external_c012_path, num_boot, ci_alpha), 
+                          results)
+            return
+
+        parallel_tools.map_jobs(_evaluation_batch_job, 
+                                [cm_score_files[x] for x in todo_list],
+                                shared_buf, n_jobs, _save_job_results)
+
+    # ===========
+    # summary
+    # ===========
+    summary = result_tools.write_summary(results_list, names, output_dir)
+    print("\n\n===============\nSummary of pooled results\n===============\n")
+    print(summary)
+    print("Results are saved to {:s}".format(output_dir))
+    return results_list
+
+
+def get_cross_track_jobs(tracks, subsets):
+    """ jobs = get_cross_track_jobs(tracks, subsets)
+
+    List of (track, subset) to be evaluated by evaluation_API_all.
+    'all' in tracks or subsets is expanded to all the tracks or to all
+    the subsets of each track (config_buf.subsets).
+    """
+    if config.g_all_tag in tracks:
+        tracks = config.g_possible_tracks
+    jobs = []
+    for track in tracks:
+        if config.g_all_tag in subsets:
+            jobs += [(track, x) for x in load_track_config(track).subsets]
+        else:
+            jobs += [(track, x) for x in subsets]
+    return jobs
+
+
+def _evaluation_cross_track_job(shared_buf, job):
+    """ mintdcf_array, eer_array, mintdcf_ci, eer_ci = 
+          _evaluation_cross_track_job(shared_buf, (track, subset))
+
+    Evaluate one subset of a track loaded by evaluation_API_all.
+    Return (None, None, None, None) if the subset cannot be evaluated.
+    """
+    track, subset = job
+    track_buf = shared_buf['tracks'][track]
+    try:
+        subset_mask = track_buf['subset_masks'][subset]
+        # nested process pools are not allowed in the workers
+        eval_buf = _prepare_subset_buf(
+            track_buf['config_buf'], track_buf['protocol_cm_pd'], 
+            track_buf['aligner'], subset, subset_mask, 
+            shared_buf['label_dir'], shared_buf['flag_recompute_c012'], 
+            track_buf['asv_score_file'], None, 1)
+        return evaluate_subset_scores(
+            eval_buf, track_buf['cm_scores'][subset_mask], 
+            shared_buf['num_boot'], shared_buf['ci_alpha'])
+    except (SystemExit, Exception) as err:
+        # one subset should not stop the others
+        print("\nERROR: fail to evaluate {:s} {:s}: {:s}".format(
+            track, subset, str(err)))
+        return None, None, None, None
+
+
+def evaluation_API_all(cm_score_file, tracks, subsets, label_dir = './',
+                       flag_recompute_c012 = False,
+                       asv_score_file = None, 
+                       output_dir = './results',
+                       n_jobs = 1,
+                       num_boot = 0,
+                       ci_alpha = 0.05):
+    """ results_list = evaluation_API_all(cm_score_file, tracks, subsets,
+          label_dir = './', flag_recompute_c012 = False, 
+          asv_score_file = None, output_dir = './results', n_jobs = 1,
+          num_boot = 0, ci_alpha = 0.05)
+
+    Compute the min tDCF and EER values of many subsets of many tracks.
+
+    The protocol and the score file of each track are loaded and aligned 
+    only once, and the trials of each subset are selected by a boolean mask
+    computed once from the protocol (including the trim conditions of the
+    PA hidden subsets). The (track, subset) pairs are then evaluated over 
+    a pool of n_jobs processes.
+    Results of each pair are saved to output_dir/TRACK-SUBSET.json, and a
+    summary to output_dir/summary.json and output_dir/summary.txt.
+
+    input
+    -----
+      cm_score_file   str, path to the CM score file. With more than one 
+                      track, '{track}' in the path is replaced by the name
+                      of the track, e.g., 'scores/{track}/score.txt'.
+                      Tracks without a score file are skipped
+      tracks          list of str, tracks, or ['all'] for all the tracks
+      subsets         list of str, subsets, or ['all'] for all the subsets
+                      of each track
+      asv_score_file  str, path to the ASV score file, '{track}' in the 
+                      path is replaced as in cm_score_file. Default None
+      output_dir      str, directory to save the results
+      n_jobs          int, number of processes, default 1
+      
+      For other arguments, see evaluation_API
+
+    output
+    ------
+      results_list    list of dict, results of each (track, subset),
+                      see result_tools.results_to_dict.
+                      None if a subset cannot be evaluated.
+    """
+    jobs = get_cross_track_jobs(tracks, subsets)
+
+    # ===========
+    # load the protocol and scores of each track once
+    # ===========
+    track_bufs = {}
+    for track in sorted(set(x[0] for x in jobs), 
+                        key = config.g_possible_tracks.index):
+        track_score_file = cm_score_file.replace('{track}', track)
+        if not os.path.isfile(track_score_file):
+            print("Cannot find {:s}, skip {:s}".format(
+                track_score_file, track))
+            continue
+        config_buf = load_track_config(track)
+        protocol_cm_pd, aligner = load_cm_protocol(config_buf, label_dir)
+        cm_scores = load_cm_score(track_score_file, aligner, config_buf)
+        track_subsets = [x[1] for x in jobs if x[0] == track]
+        subset_masks = {x: get_subset_mask(
+            protocol_cm_pd, get_subset_query(config_buf, track, x))
+                        for x in track_subsets}
+        track_bufs[track] = {
+            'config_buf': config_buf, 'protocol_cm_pd': protocol_cm_pd,
+            'aligner': aligner, 'cm_scores': cm_scores, 
+            'cm_score_file': track_score_file,
+            'subset_masks': subset_masks,
+            'asv_score_file': asv_score_file.replace('{track}', track) 
+            if asv_score_file else asv_score_file}
+    jobs = [x for x in jobs if x[0] in track_bufs]
+    if len(jobs) == 0:
+        print("ERROR: no score file to evaluate")
+        return None
+
+    shared_buf = {'tracks': track_bufs, 'label_dir': label_dir,
+                  'flag_recompute_c012': flag_recompute_c012,
+                  'num_boot': num_boot, 'ci_alpha': ci_alpha}
+
+    # ===========
+    # evaluate each (track, subset) 
+    # ===========
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    names = ['{:s}-{:s}'.format(*x) for x in jobs]
+
+    results_list = []
+    def _save_results(job_id, job_result):
+        mintdcf_array, eer_array, mintdcf_ci, eer_ci = job_result
+        if eer_array is None:
+            results_list.append(None)
+            return
+        track, subset = jobs[job_id]
+        config_buf = track_bufs[track]['config_buf']
+        results = result_tools.results_to_dict(
+            mintdcf_array, eer_array, 
+            config_buf.factor_1_tag_list, config_buf.factor_2_tag_list, 
+            track, subset, track_bufs[track]['cm_score_file'], 
+            config_buf.pooled_tag, mintdcf_ci, eer_ci)
+        result_tools.dump_results_json(
+            results, os.path.join(output_dir, names[job_id] + '.json'))
+        results_list.append(results)
+        return
+
+    job_results = parallel_tools.map_jobs(
+        _evaluation_cross_track_job, jobs, shared_buf, n_jobs, _save_results)
+
+    # ===========
+    # print results
+    # ===========
+    for (track, subset), job_result in zip(jobs, job_results):
+        mintdcf_array, eer_array, mintdcf_ci, eer_ci = job_result
+        if eer_array is None:
+            continue
+        config_buf = track_bufs[track]['config_buf']
+        print("\n\n===============\n{:s} {:s}\n===============".format(
+            track, subset))
+        print_results(mintdcf_array, eer_array, config_buf, 
+                      config_buf.flag_tDCF)
+        if num_boot > 0:
+            print_ci_results(mintdcf_ci, eer_ci, config_buf, 
+                             config_buf.flag_tDCF, ci_alpha)
+
+    summary = result_tools.write_summary(results_list, names, output_dir)
+    print("\n\n===============\nSummary of pooled results\n===============\n")
+    print(summary)
+    print("Results are saved to {:s}".format(output_dir))
+    return results_list
+
+
+def _evaluation_fusion_job(shared_buf, weight_idx):
+    """ mintdcf_array, eer_array = _evaluation_fusion_job(shared_buf, 
+                                                          weight_idx)
+
+    Evaluate the scores fused by the weight_idx-th weights. 
+    Used by evaluation_API_fusion.
+    Return NaN arrays if the fused scores cannot be evaluated.
+    """
+    try:
+        mintdcf_array, eer_array, _, _ = evaluate_subset_scores(
+            shared_buf, shared_buf['fused_scores'][weight_idx])
+        return mintdcf_array, eer_array
+    except (SystemExit, Exception) as err:
+        # e.g., degenerate fused scores should not stop the other weights
+        print("\nERROR: fail to evaluate weights {:d}: {:s}".format(
+            weight_idx, str(err)))
+        config_buf = shared_buf['config_buf']
+        nan_array = np.full((len(config_buf.factor_1_tag_list), 
+                             len(config_buf.factor_2_tag_list)), np.nan)
+        return nan_array, nan_array.copy()
+
+
+def evaluation_API_fusion(cm_score_files, weights, track, subset = 'eval', 
+                          label_dir = './',
+                          flag_recompute_c012 = False,
+                          asv_score_file = None, 
+                          external_c012_path = None,
+                          output_dir = './results',
+                          n_jobs = 1):
+    """ best_weights, results_list = evaluation_API_fusion(
+          cm_score_files, weights, track, subset = 'eval', label_dir = './',
+          flag_recompute_c012 = True, asv_score_file = None, 
+          external_c012_path = None, output_dir = './results', n_jobs = 1)
+
+    Compute the min tDCF and EER values of the weighted sum of the scores 
+    of K systems, for W candidate weight vectors.
+
+    The scores of the K systems are aligned to the protocol and stacked
+    into a (trials, K) matrix, and the fused scores of all the candidates
+    are computed by one matrix product, see fusion_tools.fuse_scores.
+    The candidates share the protocol, C012, and factor index.
+    Results of all the candidates are saved to output_dir/fusion.json and 
+    output_dir/fusion.txt.
+
+    input
+    -----
+      cm_score_files  list of str, paths to the CM score files of K systems
+      weights         np.array, (W, K), candidate weight vectors, 
+                      e.g., from fusion_tools.get_weight_grid
+      output_dir      str, directory to save the results
+      n_jobs          int, number of processes over which the candidates
+                      are evaluated, default 1
+
+      For other arguments, see evaluation_API
+
+    output
+    ------
+      best_weights    np.array, (K, ), the weights with the lowest pooled
+                      min tDCF (or pooled EER if min tDCF is not available)
+      results_list    list of dict, results of each candidate,
+                      see result_tools.results_to_dict
+    """
+    # ===========
+    # load configuration, protocol, and C012 once
+    # ===========
+    shared_buf = prepare_evaluation(track, subset, label_dir, 
+                                    flag_recompute_c012, asv_score_file,
+                                    external_c012_path, n_jobs)
+    if shared_buf is None:
+        return None, None
+    config_buf = shared_buf['config_buf']
+
+    # ===========
+    # fuse the scores of all the candidates
+    # ===========
+    score_matrix = np.stack(
+        [load_cm_score(x, shared_buf['aligner'], config_buf)[
+            shared_buf['subset_mask']] for x in cm_score_files], axis=1)
+    # (W, trials), each row is contiguous and shared by the workers
+    shared_buf['fused_scores'] = fusion_tools.fuse_scores(
+        score_matrix, weights)
+    del score_matrix
+
+    # ===========
+    # evaluate each candidate
+    # ===========
+    results_list = []
+    def _save_results(job_id, job_result):
+        mintdcf_array, eer_array = job_result
+        results_list.append(result_tools.results_to_dict(
+            mintdcf_array, eer_array, 
+            config_buf.factor_1_tag_list, config_buf.factor_2_tag_list, 
+            track, subset, '', config_buf.pooled_tag))
+        return
+    
+    parallel_tools.map_jobs(_evaluation_fusion_job, 
+                            list(range(weights.shape[0])),
+                            shared_buf, n_jobs, _save_results)
+
+    # ===========
+    # summary
+    # ===========
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    best_idx, summary = fusion_tools.write_fusion_results(
+        results_list, weights, cm_score_files, output_dir)
+    
+    print("\n\n===============\nFusion results\n===============\n")
+    print(summary)
+    print("\nBest weights: " + 
+          ", ".join('{:.4g}'.format(x) for x in weights[best_idx]))
+    mintdcf_array, eer_array = result_tools.results_to_arrays(
+        results_list[best_idx])
+    print_results(mintdcf_array, eer_array, config_buf, 
+                  shared_buf['C012_buf'] is not None)
+    print("Results are saved to {:s}".format(output_dir))
+    return weights[best_idx], results_list
+
+
+class EvaluationService:
+    """Evaluate scores with the protocols and C012 kept in memory
+
+    service = EvaluationService(label_dir, max_loaded = 4, n_jobs = 1)
+    response = service.handle_request(request)
+
+    The data of at most max_loaded (track, subset) pairs are kept. The least
+    recently used one is released when a new one is loaded.
+    See eval_server.py for the format of request and response.
+    """
+    def __init__(self, label_dir, max_loaded = 4, n_jobs = 1):
+        self.label_dir = label_dir
+        self.max_loaded = max(1, max_loaded)
+        self.n_jobs = n_jobs
+        # (track, subset, c012_path) -> eval_buf, in the order of use
+        self._eval_bufs = collections.OrderedDict()
+        return
+
+    def get_eval_buf(self, track, subset, c012_path = None):
+        """ eval_buf = get_eval_buf(track, subset, c012_path = None)
+        """
+        key = (track, subset, c012_path)
+        if key in self._eval_bufs:
+            self._eval_bufs.move_to_end(key)
+            return self._eval_bufs[key]
+
+        if track not in config.g_possible_tracks:
+            raise ValueError("track must be from " + 
+                             str(config.g_possible_tracks))
+        if subset not in config.g_possible_subsets:
+            raise ValueError("subset must be from " + 
+                             str(config.g_possible_subsets))
+        eval_buf = prepare_evaluation(track, subset, self.label_dir, 
+                                      external_c012_path = c012_path, 
+                                      n_jobs = self.n_jobs)
+        self._eval_bufs[key] = eval_buf
+        while len(self._eval_bufs) > self.max_loaded:
+            self._eval_bufs.popitem(last = False)
+        return eval_buf
+
+    def handle_request(self, request):
+        """ response = handle_request(request)
+        """
+        log = io.StringIO()
+        try:
+            # messages of the evaluation are returned only when it fails
+            with contextlib.redirect_stdout(log):
+                eval_buf = self.get_eval_buf(
+                    request.get('track', ''), request.get('subset', 'eval'),
+                    request.get('c012_path', None))
+                config_buf = eval_buf['config_buf']
+                
+                if 'cm_score_file' in request:
+                    cm_scores = load_cm_score(
+                        request['cm_score_file'], eval_buf['aligner'], 
+                        config_buf)
+                else:
+                    scores = np.asarray(request['scores'], dtype=np.float64)
+                    if not np.isfinite(scores).all():
+                        raise ValueError("scores contain NaN or inf")
+                    cm_scores = eval_buf['aligner'].align_scores(
+                        np.asarray(request['trial_ids']), scores)
+                
+                mintdcf_array, eer_array, mintdcf_ci, eer_ci = \
+                    evaluate_scores(eval_buf, cm_scores, 
+                                    int(request.get('bootstrap', 0)), 
+                                    n_jobs = self.n_jobs)
+        except (SystemExit, Exception) as err:
+            message = log.getvalue().strip()
+            if not isinstance(err, SystemExit) or isinstance(err.code, str):
+                message += '\n' + str(err)
+            return {'status': 'error', 'message': message.strip()}
+
+        response = result_tools.results_to_dict(
+            mintdcf_array, eer_array, 
+            config_buf.factor_1_tag_list, config_buf.factor_2_tag_list, 
+            eval_buf['track'], eval_buf['subset'], 
+            request.get('cm_score_file', ''), config_buf.pooled_tag,
+            mintdcf_ci, eer_ci)
+        response['status'] = 'ok'
+        return response
 
 
 if __name__ == "__main__":
@@ -774,15 +2292,89 @@ if __name__ == "__main__":
     # compute
     # ===
     # compute
-    min_tdcfs, eers = evaluation_API(
-        args.cm_score_file, 
-        args.track, 
-        args.subset, 
-        args.metadata, 
-        args.recompute_c012, 
-        args.asv_score_file, 
-        args.c012_path)
+    store = None
+    if args.results_store:
+        store = result_store.ResultStore(args.results_store, 
+                                         args.results_store_size)
+
+    if args.serve:
+        service = EvaluationService(args.metadata, args.max_loaded, args.jobs)
+        eval_server.serve(args.socket, service.handle_request)
+    elif len(args.fusion_score_files):
+        num_system = len(args.fusion_score_files)
+        if args.fusion_weights:
+            try:
+                weights = fusion_tools.parse_weights(
+                    args.fusion_weights, num_system)
+            except ValueError as err:
+                print("ERROR: " + str(err))
+                sys.exit(1)
+        else:
+            weights = fusion_tools.get_weight_grid(
+                num_system, args.fusion_grid)
+        evaluation_API_fusion(
+            args.fusion_score_files,
+            weights,
+            args.track, 
+            args.subset, 
+            args.metadata, 
+            args.recompute_c012, 
+            args.asv_score_file, 
+            args.c012_path,
+            args.output_dir,
+            args.jobs)
+    elif config.g_all_tag in [args.track, args.subset]:
+        evaluation_API_all(
+            args.cm_score_file,
+            [args.track],
+            [args.subset],
+            args.metadata, 
+            args.recompute_c012, 
+            args.asv_score_file, 
+            args.output_dir,
+            args.jobs,
+            args.bootstrap)
+    elif len(args.cm_score_files):
+        evaluation_API_batch(
+            args.cm_score_files, 
+            args.track, 
+            args.subset, 
+            args.metadata, 
+            args.recompute_c012, 
+            args.asv_score_file, 
+            args.c012_path,
+            args.output_dir,
+            args.jobs,
+            args.bootstrap,
+            store = store)
+    else:
+        profiler = profile_tools.StageProfiler(
+            flag_active = args.profile or bool(args.profile_json))
+        min_tdcfs, eers = evaluation_API(
+            args.cm_score_file, 
+            args.track, 
+            args.subset, 
+            args.metadata, 
+            args.recompute_c012, 
+            args.asv_score_file, 
+            args.c012_path,
+            args.jobs,
+            args.bootstrap,
+            profiler = profiler,
+            det_curve_file = args.det_curve,
+            store = store,
+            calib_threshold = args.calibration_threshold 
+            if args.calibration else None)
     
-    print("Please scroll up and check the results.")
+        print("Please scroll up and check the results.")
+
+        if args.profile:
+            print("\n===================")
+            print("Profile")
+            print("===================")
+            print(profiler.summary())
+        if args.profile_json:
+            profiler.dump_json(args.profile_json)
+            print("Profile is saved to {:s}".format(args.profile_json))
     
     
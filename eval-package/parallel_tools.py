@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""
+Tools to run independent jobs over a process pool
+
+The data shared by the jobs (e.g., sorted scores and factor indices) are
+stored in a module-level buffer before the pool is created. With the 'fork'
+start method, the worker processes inherit the buffer, and the numpy arrays
+are shared with the workers without being copied.
+
+On platforms without 'fork', the buffer is pickled and sent to each worker
+once when the worker starts.
+
+Results are returned in the order of the jobs, and each job is computed in
+the same way as in the serial case. Hence the results are deterministic.
+
+A job that calls sys.exit (e.g., the score checks in eval_wrapper) would
+kill its worker process and leave the pool waiting for the result. The
+exit is therefore caught in the worker and raised again in this process,
+after the pool is closed, as in the serial case.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import sys
+import multiprocessing
+
+__author__ = "ASVspoof consortium"
+__copyright__ = "Copyright 2022, ASVspoof consortium"
+
+
+# data shared with the worker processes
+_g_shared_buf = None
+
+
+def _init_worker(shared_buf):
+    global _g_shared_buf
+    _g_shared_buf = shared_buf
+    return
+
+class _JobExit:
+    """sys.exit (or another BaseException) of a job in a worker process
+    """
+    def __init__(self, code):
+        self.code = code
+
+
+def _run_job(args):
+    job_func, job_arg = args
+    try:
+        return job_func(_g_shared_buf, job_arg)
+    except Exception:
+        # returned to this process by the pool
+        raise
+    except BaseException as err:
+        # the message printed before sys.exit should not be lost
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if isinstance(err, SystemExit):
+            return _JobExit(err.code)
+        return _JobExit("{:s} in a worker process".format(
+            type(err).__name__))
+
+
+def get_mp_context():
+    """ ctx = get_mp_context()
+
+    Multiprocessing context, 'fork' if it is available
+    """
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def map_jobs(job_func, job_args, shared_buf, n_jobs = 1, callback = None):
+    """ results = map_jobs(job_func, job_args, shared_buf, n_jobs = 1,
+                           callback = None)
+
+    Compute [job_func(shared_buf, job_arg) for job_arg in job_args]
+
+    input
+    -----
+      job_func    function, job_func(shared_buf, job_arg) computes one job.
+                  It must be defined at the top level of a module.
+      job_args    list, arguments of the jobs
+      shared_buf  data shared by all the jobs
+      n_jobs      int, number of worker processes, default 1
+                  if n_jobs <= 1, jobs are computed in this process
+      callback    function or None, callback(job_id, result) is called
+                  in this process when the result of each job is available,
+                  following the order of the jobs
+
+    output
+    ------
+      results     list, results of the jobs, in the order of job_args
+    """
+    global _g_shared_buf
+
+    results = []
+    if n_jobs <= 1 or len(job_args) <= 1:
+        for job_id, job_arg in enumerate(job_args):
+            results.append(job_func(shared_buf, job_arg))
+            if callback is not None:
+                callback(job_id, results[-1])
+        return results
+
+    mp_ctx = get_mp_context()
+    if mp_ctx.get_start_method() == 'fork':
+        # workers inherit the buffer from this process
+        _g_shared_buf = shared_buf
+        pool_args = {}
+    else:
+        # workers receive a copy of the buffer
+        pool_args = {'initializer': _init_worker, 'initargs': (shared_buf,)}
+
+    job_exit = None
+    try:
+        with mp_ctx.Pool(min(n_jobs, len(job_args)), **pool_args) as pool:
+            job_iter = pool.imap(
+                _run_job, [(job_func, x) for x in job_args], chunksize=1)
+            for job_id, result in enumerate(job_iter):
+                if isinstance(result, _JobExit):
+                    job_exit = result
+                    break
+                results.append(result)
+                if callback is not None:
+                    callback(job_id, result)
+    finally:
+        _g_shared_buf = None
+    if job_exit is not None:
+        # exit as the job would do in the serial case
+        sys.exit(job_exit.code)
+    return results
+
+
+if __name__ == "__main__":
+    print("parallel_tools")
@@ -8,14 +8,16 @@ from __future__ import print_function
 
 import os
 import sys
-import pandas
+
+import protocol_cache
 
 __author__ = "ASVspoof consortium"
 __copyright__ = "Copyright 2022, ASVspoof consortium"
 
 
-def load_protocol(protocol_file, names, sep=' ', index_col=None):
-    """ pd_protocol = load_protocol(protocol_file, names, sep=' ', index_col=None)
+def load_protocol(protocol_file, names, sep=' ', index_col=None, flag_cache=True):
+    """ pd_protocol = load_protocol(protocol_file, names, sep=' ', index_col=None,
+                                    flag_cache=True)
 
     input
     -----
@@ -23,13 +25,25 @@ def load_protocol(protocol_file, names, sep=' ', index_col=None):
       names          list of str, name of the data Series in dataFrame 
       sep            str, separator, by default ' '
       index_col      str, name of the index column, by default None
+      flag_cache     bool, whether to use the binary cache of the protocol,
+                     by default True. See protocol_cache.py
 
     output
     ------
       pd_protocol    pandas dataFrame
     """
+    if flag_cache:
+        protocol = protocol_cache.load_cached_protocol(
+            protocol_file, names, index_col)
+        if protocol is not None:
+            return protocol.to_dataframe()
+
+    import pandas
     pd_protocol = pandas.read_csv(protocol_file, sep=' ', names=names, 
                                   index_col = index_col, skipinitialspace=True)
+    if flag_cache:
+        protocol_cache.build_protocol_cache(
+            protocol_file, pd_protocol, names, index_col)
     return pd_protocol
 
 
@@ -48,6 +62,8 @@ def load_score(score_file,  names,  sep=' ', index_col=None):
     ------
       pd_protocol    pandas dataFrame
     """
+    import pandas
+
     pd_score = pandas.read_csv(score_file, sep=sep, names=names, 
                                   index_col=index_col, skipinitialspace=True)
     return pd_score
@@ -65,6 +81,8 @@ def join_protocol_score(pd_protocol, pd_score):
     ------
       pd_final     dataFrame, joint dataFrame from pd_protocol and pd_score
     """
+    import pandas
+
     pd_final = pandas.concat([pd_protocol, pd_score], axis=1, join="inner")
     if len(pd_protocol) != len(pd_score) or len(pd_protocol) != len(pd_final):
         print("Error: protocol and score seem to mismatch. Please check!")
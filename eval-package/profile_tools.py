@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""
+Tools to measure the wall time and memory of each stage of the evaluation
+
+ profiler = StageProfiler()
+ with profiler.stage('load protocol'):
+     ...
+ profiler.add_cells('decomposition', row_tags, col_tags, trial_counts)
+ print(profiler.summary())
+ profiler.dump_json('trace.json')
+
+For each stage, the wall time, the resident memory (RSS) at the beginning
+and the end of the stage, and the peak RSS of the process until the end of
+the stage are recorded. The peak RSS of the finished worker processes
+(e.g., with --jobs) is reported separately.
+
+Memory is read from /proc/self/statm and resource.getrusage. It is reported
+as NaN on platforms where they are not available.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import contextlib
+
+__author__ = "ASVspoof consortium"
+__copyright__ = "Copyright 2022, ASVspoof consortium"
+
+
+# version of the JSON trace format
+g_trace_version = 1
+
+
+def _get_current_rss():
+    """ rss = _get_current_rss()
+
+    Current RSS of this process in MB, NaN if not available
+    """
+    try:
+        with open('/proc/self/statm', 'r') as file_ptr:
+            pages = int(file_ptr.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024.0 ** 2
+    except (OSError, ValueError, IndexError):
+        return float('nan')
+
+
+def _get_peak_rss(flag_children = False):
+    """ rss = _get_peak_rss(flag_children = False)
+
+    Peak RSS in MB of this process (or of its terminated children)
+    NaN if not available
+    """
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    who = resource.RUSAGE_CHILDREN if flag_children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    if sys.platform == 'darwin':
+        return peak / 1024.0 ** 2
+    return peak / 1024.0
+
+
+class StageProfiler:
+    """Record wall time and memory of stages
+
+    profiler = StageProfiler(flag_active = True)
+
+    If flag_active is False, nothing is recorded.
+    """
+    def __init__(self, flag_active = True):
+        self.flag_active = flag_active
+        self.stages = []
+        self.cells = dict()
+        return
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """ with profiler.stage(name): ...
+        """
+        if not self.flag_active:
+            yield
+            return
+        rss_start = _get_current_rss()
+        time_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append({
+                'name': name,
+                'wall_time': time.perf_counter() - time_start,
+                'rss_start_mb': rss_start,
+                'rss_end_mb': _get_current_rss(),
+                'peak_rss_mb': _get_peak_rss(),
+                'children_peak_rss_mb': _get_peak_rss(True)})
+        return
+
+    def add_cells(self, name, row_tags, col_tags, trial_counts):
+        """ add_cells(name, row_tags, col_tags, trial_counts)
+
+        Record the number of trials used by each cell of a decomposed table.
+
+        input
+        -----
+          name          str, name of the table
+          row_tags      list of str, tags of the rows
+          col_tags      list of str, tags of the columns
+          trial_counts  np.array, (row, col, 2), number of bona fide and
+                        spoofed trials in each cell
+        """
+        if not self.flag_active:
+            return
+        cells = []
+        for row_idx, row_tag in enumerate(row_tags):
+            for col_idx, col_tag in enumerate(col_tags):
+                num_bona, num_spoof = trial_counts[row_idx][col_idx]
+                cells.append({'row': row_tag, 'col': col_tag,
+                              'num_bonafide': int(num_bona),
+                              'num_spoof': int(num_spoof)})
+        self.cells[name] = cells
+        return
+
+    def summary(self):
+        """ text = summary()
+
+        Summary table of the stages and cells
+        """
+        lines = ['{:<24s} {:>10s} {:>12s} {:>12s} {:>12s}'.format(
+            'stage', 'time(s)', 'RSS end(MB)', 'peak(MB)', 'workers(MB)')]
+        for item in self.stages:
+            lines.append('{:<24s} {:>10.3f} {:>12.1f} {:>12.1f} {:>12.1f}'.format(
+                item['name'], item['wall_time'], item['rss_end_mb'],
+                item['peak_rss_mb'], item['children_peak_rss_mb']))
+        lines.append('{:<24s} {:>10.3f}'.format(
+            'total', sum(x['wall_time'] for x in self.stages)))
+
+        for name, cells in self.cells.items():
+            num_trials = [x['num_bonafide'] + x['num_spoof'] for x in cells]
+            num_computed = sum(1 for x in cells
+                               if x['num_bonafide'] and x['num_spoof'])
+            lines.append('')
+            lines.append('{:s}: {:d} cells, {:d} computed, '.format(
+                name, len(cells), num_computed) +
+                '{:d} trials in total, {:d} trials in the largest cell'.format(
+                sum(num_trials), max(num_trials) if num_trials else 0))
+        return '\n'.join(lines)
+
+    def to_dict(self):
+        """ trace = to_dict()
+        """
+        def _nan_to_none(value):
+            return None if isinstance(value, float) and value != value \
+                else value
+        stages = [{key: _nan_to_none(value) for key, value in item.items()}
+                  for item in self.stages]
+        return {'version': g_trace_version,
+                'argv': sys.argv,
+                'stages': stages,
+                'cells': self.cells}
+
+    def dump_json(self, filepath):
+        """ dump_json(filepath)
+
+        Save the trace as JSON
+        """
+        with open(filepath, 'w') as file_ptr:
+            json.dump(self.to_dict(), file_ptr, indent=1)
+        return
+
+
+if __name__ == "__main__":
+    print("profile_tools")
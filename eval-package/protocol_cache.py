@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+"""
+Binary columnar cache of protocol files
+
+The first time a protocol (e.g., keys/LA/CM/trial_metadata.txt) is loaded,
+it is converted into a binary cache in a directory next to the protocol,
+e.g., keys/LA/CM/trial_metadata.txt.cache:
+
+   trial_metadata.txt.cache
+   |- meta.json           # version, size and mtime of the protocol,
+   |                      # column names, and the dictionary of each column
+   |- col_0.npy           # categorical codes of the 1st column
+   |- col_1.npy           # raw values of the 2nd column (e.g., trial ID)
+   |- col_1_order.npy     # order that sorts the 2nd column
+   |- ...
+
+Factor columns with few distinct values are saved as categorical codes plus
+a dictionary. Columns with many distinct values (e.g., trial ID) are saved
+as they are, together with the order that sorts them, which is used to
+align score files with the protocol (see trial_align.py).
+
+Later runs memory-map the cache. The cache is rebuilt when the size or the
+modification time of the protocol changes.
+
+This module only depends on numpy.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import json
+import shutil
+import numpy as np
+
+__author__ = "ASVspoof consortium"
+__copyright__ = "Copyright 2022, ASVspoof consortium"
+
+
+# version of the cache format
+g_cache_version = 1
+# suffix of the cache directory
+g_cache_suffix = '.cache'
+# name of the meta data file in the cache directory
+g_meta_file = 'meta.json'
+# a column is saved as categorical codes if the number of distinct values
+# is no larger than this ratio of the number of trials
+g_categorical_ratio = 0.5
+
+
+# ==========
+# cached protocol
+# ==========
+
+class CachedProtocol:
+    """Protocol loaded from the binary cache
+
+    protocol = CachedProtocol(cache_dir, meta)
+
+    protocol.names         list of str, names of the columns
+    protocol.index_col     str or None, name of the index column
+    protocol.num_trial     int, number of trials
+    protocol.get_codes(col)   -> codes, categories (for categorical columns)
+    protocol.get_values(col)  -> np.array of values
+    protocol.get_order(col)   -> order that sorts the raw column
+    protocol.get_index_order()  -> values and order of the index column
+    protocol.to_dataframe()   -> pandas dataFrame
+    """
+    def __init__(self, cache_dir, meta):
+        self.cache_dir = cache_dir
+        self.names = meta['names']
+        self.index_col = meta['index_col']
+        self.num_trial = meta['num_trial']
+        self._columns = meta['columns']
+        self._arrays = dict()
+        return
+
+    def _load(self, filename):
+        if filename not in self._arrays:
+            self._arrays[filename] = np.load(
+                os.path.join(self.cache_dir, filename), mmap_mode='r')
+        return self._arrays[filename]
+
+    def is_categorical(self, col):
+        return 'categories' in self._columns[col]
+
+    def get_codes(self, col):
+        """ codes, categories = get_codes(col)
+
+        Integer codes and the list of values of a categorical column.
+        Code -1 denotes a missing value.
+        """
+        col_meta = self._columns[col]
+        return self._load(col_meta['file']), col_meta['categories']
+
+    def get_values(self, col):
+        """ values = get_values(col)
+
+        Values of a column, np.array
+        """
+        col_meta = self._columns[col]
+        if 'categories' in col_meta:
+            codes, categories = self.get_codes(col)
+            # missing value (code -1) is put at the end
+            values = np.array(categories + [np.nan], dtype=object)
+            return values[codes]
+        return self._load(col_meta['file'])
+
+    def get_order(self, col):
+        """ order = get_order(col)
+
+        Order that sorts the values of a non-categorical column
+        """
+        return self._load(self._columns[col]['order'])
+
+    def get_index_order(self):
+        """ trial_ids, order = get_index_order()
+
+        Values of the index column and the order that sorts them, or
+        None, None if the index column is categorical
+        """
+        if self.index_col is None or self.is_categorical(self.index_col):
+            return None, None
+        return self.get_values(self.index_col), self.get_order(self.index_col)
+
+    def to_dataframe(self):
+        """ data_pd = to_dataframe()
+
+        Convert the protocol into a pandas dataFrame.
+        Categorical columns are converted into pandas.Categorical.
+        """
+        import pandas
+
+        data = dict()
+        for col in self.names:
+            if self.is_categorical(col):
+                codes, categories = self.get_codes(col)
+                data[col] = pandas.Categorical.from_codes(
+                    np.asarray(codes), categories = categories)
+            else:
+                data[col] = np.asarray(self.get_values(col))
+        data_pd = pandas.DataFrame(data, columns = self.names)
+        if self.index_col is not None:
+            data_pd = data_pd.set_index(self.index_col)
+        return data_pd
+
+
+# ==========
+# functions
+# ==========
+
+def get_cache_dir(protocol_file):
+    return protocol_file + g_cache_suffix
+
+
+def _source_stat(protocol_file):
+    stat = os.stat(protocol_file)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def load_cached_protocol(protocol_file, names, index_col = None):
+    """ protocol = load_cached_protocol(protocol_file, names, index_col=None)
+
+    Load a protocol from its binary cache.
+
+    input
+    -----
+      protocol_file  str, path to the protocol file
+      names          list of str, name of the columns
+      index_col      str, name of the index column, by default None
+
+    output
+    ------
+      protocol       CachedProtocol, or None if the cache is unavailable
+                     or out of date
+    """
+    cache_dir = get_cache_dir(protocol_file)
+    try:
+        with open(os.path.join(cache_dir, g_meta_file), 'r') as file_ptr:
+            meta = json.load(file_ptr)
+        source_size, source_mtime = _source_stat(protocol_file)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get('version') != g_cache_version \
+       or meta.get('source_size') != source_size \
+       or meta.get('source_mtime_ns') != source_mtime \
+       or meta.get('names') != list(names) \
+       or meta.get('index_col') != index_col:
+        return None
+    return CachedProtocol(cache_dir, meta)
+
+
+def load_index_order(protocol_file, names, index_col):
+    """ trial_ids, order = load_index_order(protocol_file, names, index_col)
+
+    Trial IDs (values of the index column) of a protocol and the order that
+    sorts them, from the binary cache. Used by trial_align.TrialAligner.
+
+    output
+    ------
+      trial_ids      np.array of str (memory-mapped), or None if the cache
+                     is unavailable or out of date
+      order          np.array, int64, or None
+    """
+    protocol = load_cached_protocol(protocol_file, names, index_col)
+    if protocol is None:
+        return None, None
+    return protocol.get_index_order()
+
+
+def build_protocol_cache(protocol_file, data_pd, names, index_col = None):
+    """ flag = build_protocol_cache(protocol_file, data_pd, names,
+                                    index_col = None)
+
+    Save a protocol loaded by pandas into the binary cache.
+
+    input
+    -----
+      protocol_file  str, path to the protocol file
+      data_pd        pandas dataFrame, protocol loaded from protocol_file
+      names          list of str, name of the columns
+      index_col      str, name of the index column, by default None
+
+    output
+    ------
+      flag           bool, whether the cache is successfully saved
+    """
+    import pandas
+
+    cache_dir = get_cache_dir(protocol_file)
+    tmp_dir = '{:s}.tmp{:d}'.format(cache_dir, os.getpid())
+
+    try:
+        source_size, source_mtime = _source_stat(protocol_file)
+        if os.path.isdir(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+
+        num_trial = len(data_pd)
+        columns = dict()
+        for col_id, col in enumerate(names):
+            if col == index_col:
+                data = data_pd.index
+            else:
+                data = data_pd[col]
+            filename = 'col_{:d}.npy'.format(col_id)
+
+            codes, categories = pandas.factorize(data)
+            if len(categories) <= max(g_categorical_ratio * num_trial, 1):
+                # categorical codes + dictionary
+                dtype = np.int8 if len(categories) < 2**7 else \
+                        np.int16 if len(categories) < 2**15 else np.int32
+                np.save(os.path.join(tmp_dir, filename), codes.astype(dtype))
+                columns[col] = {'file': filename,
+                                'categories': categories.tolist()}
+            else:
+                # raw values + the order that sorts them
+                values = np.asarray(data).astype(str)
+                order_file = 'col_{:d}_order.npy'.format(col_id)
+                np.save(os.path.join(tmp_dir, filename), values)
+                np.save(os.path.join(tmp_dir, order_file),
+                        np.argsort(values, kind='mergesort').astype(np.int64))
+                columns[col] = {'file': filename, 'order': order_file}
+
+        meta = {'version': g_cache_version,
+                'source_size': source_size,
+                'source_mtime_ns': source_mtime,
+                'names': list(names),
+                'index_col': index_col,
+                'num_trial': num_trial,
+                'columns': columns}
+        with open(os.path.join(tmp_dir, g_meta_file), 'w') as file_ptr:
+            json.dump(meta, file_ptr)
+
+        # replace the old cache
+        if os.path.isdir(cache_dir):
+            shutil.rmtree(cache_dir)
+        os.rename(tmp_dir, cache_dir)
+
+    except (OSError, TypeError, ValueError) as err:
+        # e.g., the directory is read-only
+        print("Cannot save protocol cache to {:s}: {:s}".format(
+            cache_dir, str(err)))
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    print("protocol_cache")
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+"""
+Store of evaluation results on disk
+
+Results of an evaluation (see result_tools.results_to_dict) are saved as
+one JSON file per entry in a store directory. The key of an entry is the
+SHA-256 of
+
+  score file content, track, subset, protocol (trial_metadata.txt)
+  content, C012 file content, code version, number of bootstrap replicates
+  and CI level
+
+so that an identical re-evaluation (e.g., a dashboard refresh) is served
+from the store without loading the protocol or computing the metrics.
+
+ store = ResultStore('./results_store', max_size_mb = 256)
+ key = store.get_key(cm_score_file, track, subset, c012_file,
+                     protocol_file = protocol_file)
+ results = store.get(key)          # None if not in the store
+ store.put(key, results)
+
+The code version is the hash of the source files that compute the results,
+see g_code_files. When the size of the store exceeds max_size_mb, the
+least recently used entries are deleted.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import sys
+import json
+import hashlib
+
+import eval_wrapper
+
+__author__ = "ASVspoof consortium"
+__copyright__ = "Copyright 2022, ASVspoof consortium"
+
+
+# version of the entry format
+g_store_version = 1
+
+# default max size of the store in MB
+g_default_max_size_mb = 256
+
+# source files that affect the results
+g_code_files = ['config.py', 'eval_metrics.py', 'eval_wrapper.py',
+                'factor_index.py', 'main.py', 'pd_tools.py',
+                'protocol_cache.py', 'score_reader.py', 'trial_align.py']
+
+# code version, computed once
+_g_code_version = None
+
+# SHA-256 of protocol files, {(path, size, mtime): digest}
+_g_protocol_sha256 = dict()
+
+
+def get_code_version():
+    """ version = get_code_version()
+
+    SHA-256 of the source files in g_code_files, in hex string
+    """
+    global _g_code_version
+    if _g_code_version is None:
+        code_dir = os.path.dirname(os.path.abspath(__file__))
+        sha = hashlib.sha256()
+        for filename in g_code_files:
+            filepath = os.path.join(code_dir, filename)
+            if os.path.isfile(filepath):
+                sha.update(filename.encode('utf-8'))
+                sha.update(eval_wrapper.get_file_sha256(filepath).encode())
+        _g_code_version = sha.hexdigest()
+    return _g_code_version
+
+
+def get_protocol_sha256(protocol_file):
+    """ digest = get_protocol_sha256(protocol_file)
+
+    SHA-256 of a protocol file in hex string, computed once for each size
+    and modification time of the file
+    """
+    stat = os.stat(protocol_file)
+    stat_key = (os.path.abspath(protocol_file), stat.st_size, stat.st_mtime_ns)
+    if stat_key not in _g_protocol_sha256:
+        _g_protocol_sha256[stat_key] = eval_wrapper.get_file_sha256(
+            protocol_file)
+    return _g_protocol_sha256[stat_key]
+
+
+class ResultStore:
+    """Evaluation results on disk, keyed by the content of the inputs
+
+    store = ResultStore(store_dir, max_size_mb = 256)
+    """
+    def __init__(self, store_dir, max_size_mb = g_default_max_size_mb):
+        self.store_dir = store_dir
+        self.max_size = int(max_size_mb * 1024 ** 2)
+        if not os.path.isdir(store_dir):
+            os.makedirs(store_dir)
+        return
+
+    def get_key(self, cm_score_file, track, subset, c012_file = None,
+                num_boot = 0, ci_alpha = 0.05, protocol_file = None):
+        """ key = get_key(cm_score_file, track, subset, c012_file = None,
+                          num_boot = 0, ci_alpha = 0.05,
+                          protocol_file = None)
+
+        input
+        -----
+          cm_score_file  str, path to the CM score file
+          track          str, name of the track
+          subset         str, name of the subset
+          c012_file      str, path to the C012 file, None if t-DCF is not
+                         applicable to the track
+          num_boot       int, number of bootstrap replicates
+          ci_alpha       float, see num_boot
+          protocol_file  str, path to the CM protocol (trial_metadata.txt)
+
+        output
+        ------
+          key            str, key of the entry in hex string
+        """
+        key_info = [g_store_version,
+                    eval_wrapper.get_file_sha256(cm_score_file),
+                    track, subset,
+                    eval_wrapper.get_file_sha256(c012_file)
+                    if c012_file else '',
+                    get_protocol_sha256(protocol_file)
+                    if protocol_file else '',
+                    get_code_version(),
+                    int(num_boot), float(ci_alpha) if num_boot > 0 else 0]
+        return hashlib.sha256(json.dumps(key_info).encode()).hexdigest()
+
+    def _get_path(self, key):
+        return os.path.join(self.store_dir, key + '.json')
+
+    def get(self, key):
+        """ results = get(key)
+
+        Results of the entry, None if the entry is not in the store
+        """
+        if key is None:
+            return None
+        filepath = self._get_path(key)
+        try:
+            with open(filepath, 'r') as file_ptr:
+                entry = json.load(file_ptr)
+        except (OSError, ValueError):
+            return None
+        if entry.get('version') != g_store_version:
+            return None
+        # mark the entry as recently used
+        try:
+            os.utime(filepath)
+        except OSError:
+            pass
+        return entry['results']
+
+    def put(self, key, results):
+        """ put(key, results)
+
+        Save the results, and delete the least recently used entries if
+        the store is too large
+        """
+        if key is None:
+            return
+        filepath = self._get_path(key)
+        tmp_path = '{:s}.tmp{:d}'.format(filepath, os.getpid())
+        try:
+            with open(tmp_path, 'w') as file_ptr:
+                json.dump({'version': g_store_version, 'results': results},
+                          file_ptr, separators=(',', ':'))
+            os.replace(tmp_path, filepath)
+        except OSError as err:
+            print("Warning: fail to save results to the store: " + str(err),
+                  file=sys.stderr)
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict(keep = filepath)
+        return
+
+    def _evict(self, keep = None):
+        entries = []
+        total_size = 0
+        for filename in os.listdir(self.store_dir):
+            if not filename.endswith('.json'):
+                continue
+            filepath = os.path.join(self.store_dir, filename)
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filepath))
+            total_size += stat.st_size
+
+        # the least recently used first
+        for _, size, filepath in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            if filepath == keep:
+                continue
+            try:
+                os.remove(filepath)
+                total_size -= size
+            except OSError:
+                pass
+        return
+
+
+if __name__ == "__main__":
+    print("result_store")
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+"""
+Tools to save evaluation results in machine-readable format
+
+Results of one system are saved in a JSON file:
+ {
+   "score_file": "score.txt",
+   "track": "LA",
+   "subset": "eval",
+   "row_tags": ["A07", ..., "Pooled"],
+   "col_tags": ["C1", ..., "Pooled"],
+   "min_tDCF": [[...], ...],       # null if not available
+   "EER": [[...], ...],            # in %, null if not available
+   "pooled_min_tDCF": 0.xx,
+   "pooled_EER": xx.x,
+   "min_tDCF_CI": [[[lower, upper], ...], ...],   # optional, bootstrap CI
+   "EER_CI": [[[lower, upper], ...], ...]         # optional, in %
+ }
+
+DET curves are saved in text files by dump_det_curve.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import json
+import numpy as np
+
+import config
+import eval_metrics
+
+__author__ = "ASVspoof consortium"
+__copyright__ = "Copyright 2022, ASVspoof consortium"
+
+# max number of points saved by dump_det_curve
+g_det_max_points = 2000
+
+
+
+def _to_list(data_array):
+    """ nested list of float from np.array, NaN is replaced by None
+    """
+    return [[None if np.isnan(x) else float(x) for x in row]
+            for row in np.atleast_2d(data_array)]
+
+def _to_ci_list(data_ci):
+    """ nested list of [lower, upper] from np.array (row, col, 2)
+    """
+    return [[[None if np.isnan(x) else float(x) for x in cell] 
+             for cell in row] for row in data_ci]
+
+def _from_list(data_list):
+    """ np.array from nested list of float, None is replaced by NaN
+    """
+    return np.array([[np.nan if x is None else x for x in row]
+                     for row in data_list], dtype=np.float64)
+
+def _pooled_value(data_array, row_tags, col_tags, pooled_tag):
+    try:
+        value = data_array[row_tags.index(pooled_tag),
+                           col_tags.index(pooled_tag)]
+    except ValueError:
+        return None
+    return None if np.isnan(value) else float(value)
+
+
+def results_to_dict(mintdcf_array, eer_array, row_tags, col_tags,
+                    track, subset, cm_score_file = '',
+                    pooled_tag = config.g_pooled_tag,
+                    mintdcf_ci = None, eer_ci = None):
+    """ results = results_to_dict(mintdcf_array, eer_array,
+                                  row_tags, col_tags, track, subset,
+                                  cm_score_file = '', pooled_tag = 'Pooled',
+                                  mintdcf_ci = None, eer_ci = None)
+
+    input
+    -----
+      mintdcf_array  np.array, min t-DCF values, from evaluation_API
+      eer_array      np.array, EER values (not in %), from evaluation_API
+      row_tags       list of str, tags of the rows
+      col_tags       list of str, tags of the columns
+      track          str, name of the track
+      subset         str, name of the subset
+      cm_score_file  str, path to the score file, default ''
+      pooled_tag     str, tag for pooled condition, default 'Pooled'
+      mintdcf_ci     np.array or None, (row, col, 2), confidence intervals
+                     of min t-DCF, from compute_decomposed_bootstrap_ci
+      eer_ci         np.array or None, (row, col, 2), confidence intervals
+                     of EER (not in %)
+
+    output
+    ------
+      results        dict, see the format at the beginning of this file
+    """
+    row_tags = list(row_tags)
+    col_tags = list(col_tags)
+    results = {'score_file': cm_score_file,
+               'track': track,
+               'subset': subset,
+               'row_tags': row_tags,
+               'col_tags': col_tags,
+               'min_tDCF': _to_list(mintdcf_array),
+               'EER': _to_list(eer_array * 100),
+               'pooled_min_tDCF': _pooled_value(
+                   mintdcf_array, row_tags, col_tags, pooled_tag),
+               'pooled_EER': _pooled_value(
+                   eer_array * 100, row_tags, col_tags, pooled_tag)}
+    if mintdcf_ci is not None:
+        results['min_tDCF_CI'] = _to_ci_list(mintdcf_ci)
+    if eer_ci is not None:
+        results['EER_CI'] = _to_ci_list(eer_ci * 100)
+    return results
+
+
+def results_to_arrays(results):
+    """ mintdcf_array, eer_array = results_to_arrays(results)
+
+    Inverse of results_to_dict. EER is not in %.
+    """
+    return _from_list(results['min_tDCF']), _from_list(results['EER']) / 100
+
+
+def results_to_ci_arrays(results):
+    """ mintdcf_ci, eer_ci = results_to_ci_arrays(results)
+
+    Confidence intervals in results, (row, col, 2), None if not available.
+    EER is not in %.
+    """
+    if 'EER_CI' not in results:
+        return None, None
+    def _ci_array(data_list):
+        return np.array([[[np.nan if x is None else x for x in cell]
+                          for cell in row] for row in data_list], 
+                        dtype=np.float64)
+    return _ci_array(results['min_tDCF_CI']), \
+        _ci_array(results['EER_CI']) / 100
+
+
+def dump_results_json(results, filepath):
+    """ dump_results_json(results, filepath)
+    """
+    with open(filepath, 'w') as file_ptr:
+        json.dump(results, file_ptr, indent=1)
+    return
+
+def load_results_json(filepath):
+    """ results = load_results_json(filepath)
+    """
+    with open(filepath, 'r') as file_ptr:
+        return json.load(file_ptr)
+
+def dump_det_curve(filepath, frr, far, thresholds, 
+                   max_points = g_det_max_points):
+    """ dump_det_curve(filepath, frr, far, thresholds, max_points = 2000)
+
+    Save a DET curve to a text file, one point per line:
+      threshold  miss_rate  false_alarm_rate
+    The curve is down-sampled to at most max_points points by
+    eval_metrics.downsample_det_curve. It can be loaded by np.loadtxt.
+    """
+    frr, far, thresholds = eval_metrics.downsample_det_curve(
+        frr, far, thresholds, max_points)
+    np.savetxt(filepath, np.stack([thresholds, frr, far], axis=1), 
+               fmt='%.10g', header='threshold miss_rate false_alarm_rate')
+    return
+
+
+def get_system_names(score_files):
+    """ names = get_system_names(score_files)
+
+    Names of the systems, derived from the paths of the score files.
+    The parent directory is used when the file names are identical, e.g.,
+    keys/LA/CM/LFCC-GMM/score.txt -> LFCC-GMM_score
+    """
+    def _stem(path):
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def _parent_stem(path):
+        parent = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        return parent + '_' + _stem(path)
+
+    names = [_stem(x) for x in score_files]
+    if len(set(names)) < len(names):
+        names = [_parent_stem(x) for x in score_files]
+    if len(set(names)) < len(names):
+        names = ['{:s}_{:d}'.format(x, idx) for idx, x in enumerate(names)]
+    return names
+
+
+def get_ranking_key(results):
+    """ key = get_ranking_key(results)
+
+    Key to rank systems by pooled min t-DCF (if available), then pooled
+    EER. results is from results_to_dict, or None for a failed system.
+    """
+    if results is None:
+        return (2, 0, 0)
+    mintdcf = results['pooled_min_tDCF']
+    eer = results['pooled_EER']
+    return (0 if mintdcf is not None else 1,
+            mintdcf if mintdcf is not None else 0,
+            eer if eer is not None else np.inf)
+
+
+def write_summary(results_list, names, output_dir):
+    """ write_summary(results_list, names, output_dir)
+
+    Write the pooled results of all the systems into
+    output_dir/summary.json and output_dir/summary.txt.
+    Systems are ranked by pooled min t-DCF (if available), then pooled EER.
+
+    input
+    -----
+      results_list   list of dict, results of each system, None if failed
+      names          list of str, names of the systems
+      output_dir     str, path to the output directory
+    """
+    ranked = sorted(zip(names, results_list), 
+                    key = lambda item: get_ranking_key(item[1]))
+
+    summary = []
+    for name, results in ranked:
+        if results is None:
+            summary.append({'system': name, 'status': 'failed'})
+        else:
+            summary.append({'system': name, 'status': 'ok',
+                            'score_file': results['score_file'],
+                            'track': results['track'],
+                            'subset': results['subset'],
+                            'pooled_min_tDCF': results['pooled_min_tDCF'],
+                            'pooled_EER': results['pooled_EER']})
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as file_ptr:
+        json.dump(summary, file_ptr, indent=1)
+
+    # text summary
+    lines = ['{:<30s} {:>10s} {:>10s}'.format('system', 'min_tDCF', 'EER(%)')]
+    for item in summary:
+        if item['status'] != 'ok':
+            lines.append('{:<30s} {:>10s} {:>10s}'.format(
+                item['system'], 'failed', 'failed'))
+        else:
+            mintdcf, eer = item['pooled_min_tDCF'], item['pooled_EER']
+            lines.append('{:<30s} {:>10s} {:>10s}'.format(
+                item['system'],
+                '-' if mintdcf is None else '{:1.4f}'.format(mintdcf),
+                '-' if eer is None else '{:1.2f}'.format(eer)))
+    with open(os.path.join(output_dir, 'summary.txt'), 'w') as file_ptr:
+        file_ptr.write('\n'.join(lines) + '\n')
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    print("result_tools")
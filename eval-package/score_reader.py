@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+"""
+Streaming reader of score files
+
+The score file is read and parsed in blocks of lines. Each block is
+validated before the next one is read:
+ 1. each line has the expected number of fields
+ 2. the score is numeric and finite (no NaN or inf)
+ 3. the trial ID is in the protocol
+ 4. the trial ID has not appeared before
+
+The scores are written into a pre-allocated array in the order of the
+protocol. Hence the peak memory is decided by the number of trials in the
+protocol, not by the size of the score file.
+
+The first invalid line is reported with its line number.
+
+Empty lines and extra whitespace between fields are ignored.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import sys
+import itertools
+import numpy as np
+
+import trial_align
+
+__author__ = "ASVspoof consortium"
+__copyright__ = "Copyright 2022, ASVspoof consortium"
+
+
+# number of lines in one block
+g_block_lines = 65536
+
+
+class ScoreFileError(ValueError):
+    """Invalid line in a score file
+    """
+    def __init__(self, score_file, line_no, line, reason):
+        self.score_file = score_file
+        self.line_no = line_no
+        self.line = line
+        self.reason = reason
+        message = "{:s}, line {:d}: {:s}\n  {:s}".format(
+            score_file, line_no, reason, line.rstrip('\n'))
+        super(ScoreFileError, self).__init__(message)
+
+
+def _first_invalid_float(fields):
+    # index of the first field that cannot be converted into float
+    for idx, field in enumerate(fields):
+        try:
+            float(field)
+        except ValueError:
+            return idx
+    return None
+
+
+def read_scores(score_file, num_col, id_col, score_col, aligner = None,
+                num_trial = None, block_lines = g_block_lines,
+                dtype = np.float64):
+    """ scores = read_scores(score_file, num_col, id_col, score_col,
+                             aligner = None, num_trial = None,
+                             block_lines = 65536, dtype = np.float64)
+
+    Read a score file block by block.
+
+    input
+    -----
+      score_file   str, path to the score file
+      num_col      int, number of fields in each line
+      id_col       int, index of the trial ID field
+      score_col    int, index of the score field
+      aligner      trial_align.TrialAligner or None
+                   if not None, scores are put in the order of the protocol
+                   of the aligner
+                   if None, scores are kept in the order of the lines in the
+                   file, and num_trial must be given
+      num_trial    int or None, number of trials, used when aligner is None
+      block_lines  int, number of lines in one block, default 65536
+      dtype        numpy dtype of the scores, default np.float64.
+                   np.float32 halves the memory, but scores that differ only
+                   beyond the float32 precision become ties
+
+    output
+    ------
+      scores       np.array, scores in the order of the protocol (or of
+                   the lines in the file if aligner is None)
+
+    A ScoreFileError is raised for the first invalid line.
+    """
+    if aligner is not None:
+        num_trial = aligner.num_trial
+    scores = np.zeros(num_trial, dtype = dtype)
+    # whether the score of each trial has been read
+    flag_filled = np.zeros(num_trial, dtype = bool)
+    # number of valid lines read
+    num_read = 0
+
+    with open(score_file, 'r') as file_ptr:
+        line_no = 0
+        while True:
+            block = list(itertools.islice(file_ptr, block_lines))
+            if len(block) == 0:
+                break
+            block_start = line_no + 1
+            line_no += len(block)
+
+            def _error(block_idx, reason):
+                return ScoreFileError(score_file, block_start + block_idx,
+                                      block[block_idx], reason)
+
+            # split lines into fields, ignore empty lines
+            line_idx = []
+            ids = []
+            values = []
+            for idx, line in enumerate(block):
+                fields = line.split()
+                if len(fields) == 0:
+                    continue
+                if len(fields) != num_col:
+                    raise _error(idx, "expect {:d} fields, got {:d}".format(
+                        num_col, len(fields)))
+                line_idx.append(idx)
+                ids.append(fields[id_col])
+                values.append(fields[score_col])
+            if len(line_idx) == 0:
+                continue
+
+            # convert scores
+            try:
+                block_scores = np.array(values, dtype = np.float64)
+            except ValueError:
+                bad = _first_invalid_float(values)
+                raise _error(line_idx[bad], "score is not a number")
+
+            # position of each line in the output array
+            if aligner is None:
+                rows = np.arange(num_read, num_read + len(line_idx))
+                flag_bad = rows >= num_trial
+                bad_reason = "more than {:d} trials".format(num_trial)
+            else:
+                rows = aligner.lookup(ids)
+                flag_bad = rows < 0
+                bad_reason = "unknown trial ID"
+
+            # find the first invalid line in the block
+            errors = []
+            if np.any(flag_bad):
+                errors.append((np.argmax(flag_bad), bad_reason))
+            flag_nan = ~np.isfinite(block_scores)
+            if np.any(flag_nan):
+                errors.append((np.argmax(flag_nan), "score is NaN or inf"))
+            if aligner is not None:
+                rows_valid = np.where(flag_bad, 0, rows)
+                # duplicated with previous blocks
+                flag_dup = flag_filled[rows_valid] & ~flag_bad
+                # duplicated within this block
+                _, first_idx = np.unique(rows_valid, return_index=True)
+                flag_first = np.zeros(len(rows), dtype = bool)
+                flag_first[first_idx] = True
+                flag_dup |= ~flag_first & ~flag_bad
+                if np.any(flag_dup):
+                    errors.append((np.argmax(flag_dup), "duplicated trial ID"))
+            if len(errors):
+                bad, reason = min(errors)
+                raise _error(line_idx[bad], reason)
+
+            scores[rows] = block_scores
+            flag_filled[rows] = True
+            num_read += len(line_idx)
+
+    if num_read < num_trial:
+        missing = np.flatnonzero(~flag_filled)
+        if aligner is None:
+            message = "{:s}: {:d} trials are expected, got {:d}".format(
+                score_file, num_trial, num_read)
+        else:
+            message = "{:s}: {:d} trials are missing:\n{:s}".format(
+                score_file, len(missing),
+                '\n'.join('  ' + str(x) for x in 
+                          aligner.trial_ids[missing[:trial_align.g_max_print]]))
+            if len(missing) > trial_align.g_max_print:
+                message += '\n  ...'
+        raise ValueError(message)
+    return scores
+
+
+def load_scores(score_file, num_col, id_col, score_col, aligner = None,
+                num_trial = None, dtype = np.float64):
+    """ scores = load_scores(score_file, num_col, id_col, score_col,
+                             aligner = None, num_trial = None,
+                             dtype = np.float64)
+
+    Same as read_scores, but print the error and exit if the score file
+    is invalid.
+    """
+    try:
+        return read_scores(score_file, num_col, id_col, score_col, aligner,
+                           num_trial, dtype = dtype)
+    except ValueError as err:
+        print("Error: invalid score file. Please check!")
+        print(str(err))
+        print("\nIs the score file incomplete?")
+        print("Has you selected the correct track?")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    print("score_reader")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+"""
+Streaming estimation of EER and min t-DCF from score histograms
+
+For online monitoring, scores arrive in batches and only the histograms of
+bona fide and spoofed scores over fixed bins are kept (O(bins) memory).
+Histograms of different workers or time windows are merged by adding the
+counts, provided that they use the same bins.
+
+ hist = StreamingScoreHistogram(score_min = -20, score_max = 20,
+                                num_bins = 4000)
+ hist.update(bonafide_scores, spoof_scores)      # any number of times
+ hist.merge(other_hist)                          # e.g., from other workers
+ eer, eer_bound = hist.get_eer()
+ mintdcf, mintdcf_bound = hist.get_mintDCF(C0, C1, C2)
+
+Error bound
+ A threshold on a bin edge splits the scores exactly as in the full DET
+ curve, so the miss and false alarm rates are exact on the bin edges. Between
+ two edges, the miss rate increases and the false alarm rate decreases.
+ Hence the EER by eval_metrics.compute_eer and the min t-DCF by
+ eval_wrapper.get_mintDCF_eer_from_det on the full scores are within
+
+   |exact - estimate| <= bound
+
+ The bound shrinks with narrower bins. Scores outside [score_min, score_max]
+ are counted in an underflow and an overflow bin; they do not break the
+ bound, but widen it if the EER or min t-DCF is reached in those bins.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import numpy as np
+
+__author__ = "ASVspoof consortium"
+__copyright__ = "Copyright 2022, ASVspoof consortium"
+
+
+# default bins
+g_default_score_min = -20.0
+g_default_score_max = 20.0
+g_default_num_bins = 4000
+
+
+class StreamingScoreHistogram:
+    """Histograms of bona fide and spoofed scores over fixed bins
+
+    hist = StreamingScoreHistogram(score_min = -20, score_max = 20,
+                                   num_bins = 4000)
+
+    Bins are [edges[i], edges[i+1]), with edges = np.linspace(score_min,
+    score_max, num_bins + 1), plus an underflow bin (-inf, score_min) and
+    an overflow bin [score_max, inf).
+    """
+    def __init__(self, score_min = g_default_score_min,
+                 score_max = g_default_score_max,
+                 num_bins = g_default_num_bins):
+        if not score_min < score_max or num_bins < 1:
+            raise ValueError("invalid bins: [{:f}, {:f}], {:d} bins".format(
+                score_min, score_max, num_bins))
+        self.score_min = float(score_min)
+        self.score_max = float(score_max)
+        self.num_bins = int(num_bins)
+        self.edges = np.linspace(self.score_min, self.score_max,
+                                 self.num_bins + 1)
+        # counts[0] is the underflow bin, counts[-1] is the overflow bin
+        self.bonafide_counts = np.zeros(self.num_bins + 2, dtype=np.int64)
+        self.spoof_counts = np.zeros(self.num_bins + 2, dtype=np.int64)
+        return
+
+    def _count(self, scores):
+        scores = np.asarray(scores, dtype=np.float64).ravel()
+        if np.isnan(scores).any():
+            raise ValueError("scores contain NaN")
+        bin_idx = np.searchsorted(self.edges, scores, side='right')
+        return np.bincount(bin_idx, minlength = self.num_bins + 2)
+
+    def update(self, bonafide_scores = None, spoof_scores = None):
+        """ update(bonafide_scores = None, spoof_scores = None)
+
+        Add the scores of bona fide and spoofed trials to the histograms
+        """
+        if bonafide_scores is not None:
+            self.bonafide_counts += self._count(bonafide_scores)
+        if spoof_scores is not None:
+            self.spoof_counts += self._count(spoof_scores)
+        return
+
+    def merge(self, other):
+        """ hist = merge(other)
+
+        Add the counts of another StreamingScoreHistogram with the same bins
+        """
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("cannot merge histograms with different bins")
+        self.bonafide_counts += other.bonafide_counts
+        self.spoof_counts += other.spoof_counts
+        return self
+
+    @property
+    def num_bonafide(self):
+        return int(self.bonafide_counts.sum())
+
+    @property
+    def num_spoof(self):
+        return int(self.spoof_counts.sum())
+
+    def to_dict(self):
+        """ data = to_dict()
+
+        JSON-serializable state, e.g., to send the histogram to another
+        process. See from_dict.
+        """
+        return {'score_min': self.score_min, 'score_max': self.score_max,
+                'num_bins': self.num_bins,
+                'bonafide_counts': self.bonafide_counts.tolist(),
+                'spoof_counts': self.spoof_counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        """ hist = StreamingScoreHistogram.from_dict(data)
+        """
+        hist = cls(data['score_min'], data['score_max'], data['num_bins'])
+        hist.bonafide_counts[:] = data['bonafide_counts']
+        hist.spoof_counts[:] = data['spoof_counts']
+        return hist
+
+    def get_error_rates(self):
+        """ Pmiss, Pfa = get_error_rates()
+
+        Miss and false alarm rates of the thresholds -inf, edges, and inf.
+        Trials with scores below a threshold are rejected.
+        """
+        Pmiss = np.concatenate(
+            [[0], np.cumsum(self.bonafide_counts)]) / self.num_bonafide
+        Pfa = 1 - np.concatenate(
+            [[0], np.cumsum(self.spoof_counts)]) / self.num_spoof
+        return Pmiss, Pfa
+
+    def get_eer(self):
+        """ eer, bound = get_eer()
+
+        Estimated EER and its error bound. NaN if there are no bona fide
+        or spoofed trials.
+        """
+        if self.num_bonafide == 0 or self.num_spoof == 0:
+            return np.nan, np.nan
+        Pmiss, Pfa = self.get_error_rates()
+        # the first threshold where Pmiss >= Pfa, Pmiss - Pfa goes from -1
+        # to 1, and the EER is reached between this and the previous one
+        idx = np.argmax(Pmiss - Pfa >= 0)
+        lower = (Pmiss[idx - 1] + Pfa[idx]) / 2
+        upper = (Pmiss[idx] + Pfa[idx - 1]) / 2
+        return (lower + upper) / 2, (upper - lower) / 2
+
+    def get_mintDCF(self, C0, C1, C2):
+        """ mintDCF, bound = get_mintDCF(C0, C1, C2)
+
+        Estimated normalized min t-DCF and its error bound, given the C012
+        coefficients (e.g., those of the pooled condition, see
+        eval_wrapper.load_C012_value). NaN if C012 is NaN or there are no
+        bona fide or spoofed trials.
+        """
+        if np.isnan(C0) or np.isnan(C1) or np.isnan(C2) or \
+           self.num_bonafide == 0 or self.num_spoof == 0:
+            return np.nan, np.nan
+        Pmiss, Pfa = self.get_error_rates()
+        tDCF_default = C0 + np.minimum(C1, C2)
+        # t-DCF on the edges can be reached
+        upper = np.min(C0 + C1 * Pmiss + C2 * Pfa) / tDCF_default
+        # within a bin, Pmiss and Pfa are not lower than those on the edges
+        lower = np.min(C0 + C1 * Pmiss[:-1] + C2 * Pfa[1:]) / tDCF_default
+        return (lower + upper) / 2, (upper - lower) / 2
+
+
+if __name__ == "__main__":
+    print("stream_metrics")
@@ -9,11 +9,6 @@ import os
 import sys
 import numpy as np
 
-import matplotlib
-import matplotlib.pyplot as plt
-from matplotlib.gridspec import GridSpec
-from matplotlib.pyplot import cm
-
 
 __author__ = "Xin Wang"
 __email__ = "wangxin@nii.ac.jp"
@@ -182,6 +177,8 @@ def print_table(data_array, column_tag, row_tag,
 
 
     # color configuration
+    # matplotlib is slow to import, import it only when printing tables
+    from matplotlib.pyplot import cm
     color_func = cm.get_cmap(colormap)
     #data_idx = return_valid_number_idx(data_array)    
     #value_min = np.min(data_array[data_idx])
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Regression test of the start-up time of the eval CLI
+
+main.py should be imported, and main.py --help should run, without
+importing pandas or matplotlib (see the deferred imports in main.py).
+The total import time of main, reported by python -X importtime, should
+stay within g_import_budget.
+
+ python -m unittest discover -s tests
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import sys
+import subprocess
+import unittest
+
+__author__ = "ASVspoof consortium"
+__copyright__ = "Copyright 2022, ASVspoof consortium"
+
+
+# directory of main.py
+g_package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# budget of the cumulative import time of main (seconds)
+g_import_budget = 0.5
+# modules that should not be imported at start-up
+g_heavy_modules = ['pandas', 'matplotlib']
+
+
+def _import_times(args):
+    """ times = _import_times(args)
+
+    Run python -X importtime with args in the package directory
+
+    output
+    ------
+      times    dict, {module name: cumulative import time in seconds}
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime'] + args,
+                          cwd = g_package_dir, stdout = subprocess.PIPE,
+                          stderr = subprocess.PIPE, universal_newlines = True)
+    if proc.returncode != 0:
+        raise AssertionError("{:s} failed:\n{:s}".format(
+            ' '.join(args), proc.stderr))
+    # import time:   self [us] |   cumulative | imported package
+    times = dict()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        times[fields[2].strip()] = int(fields[1]) / 1e6
+    return times
+
+
+class TestImportTime(unittest.TestCase):
+
+    def _check_heavy_modules(self, times):
+        for name in g_heavy_modules:
+            imported = [x for x in times
+                        if x == name or x.startswith(name + '.')]
+            self.assertEqual(imported, [],
+                             "{:s} is imported at start-up".format(name))
+
+    def test_import_main(self):
+        times = _import_times(['-c', 'import main'])
+        self._check_heavy_modules(times)
+        self.assertIn('main', times)
+        self.assertLess(times['main'], g_import_budget,
+                        "import main takes {:.3f}s".format(times['main']))
+
+    def test_help(self):
+        times = _import_times(['main.py', '--help'])
+        self._check_heavy_modules(times)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Regression test of sys.exit in jobs over a process pool
+
+A job that calls sys.exit (e.g., the score checks in eval_wrapper) used to
+kill its worker process, and the pool waited for its result forever. With
+n_jobs > 1, the exit should be raised again in the main process, as in the
+serial case.
+
+ python -m unittest discover -s tests
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import unittest
+
+__author__ = "ASVspoof consortium"
+__copyright__ = "Copyright 2022, ASVspoof consortium"
+
+
+# directory of main.py
+g_package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, g_package_dir)
+
+import config
+import benchmark
+import parallel_tools
+
+# time limit of a run (seconds), a hanging pool exceeds it
+g_timeout = 120
+# number of trials of the synthetic protocol
+g_num_trial = 4000
+
+
+def _exit_job(shared_buf, job_arg):
+    if job_arg == 1:
+        print("ERROR: job {:d} exits".format(job_arg))
+        sys.exit(1)
+    return job_arg
+
+
+def _run_map_jobs(job_args, n_jobs):
+    """ proc = _run_map_jobs(job_args, n_jobs)
+
+    Run parallel_tools.map_jobs(_exit_job, ...) in another process, so
+    that a hanging pool does not block the tests
+    """
+    return subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--map-jobs',
+         str(n_jobs)] + [str(x) for x in job_args],
+        stdout = subprocess.PIPE, stderr = subprocess.STDOUT,
+        universal_newlines = True, timeout = g_timeout)
+
+
+class TestParallelExit(unittest.TestCase):
+
+    def test_map_jobs(self):
+        for n_jobs in [1, 2]:
+            proc = _run_map_jobs([0, 1, 2, 3], n_jobs)
+            self.assertEqual(proc.returncode, 1, proc.stdout)
+            self.assertIn('ERROR: job 1 exits', proc.stdout)
+        proc = _run_map_jobs([0, 2, 3], 2)
+        self.assertEqual(proc.returncode, 0, proc.stdout)
+        self.assertEqual(proc.stdout.split(), ['[0,', '2,', '3]'])
+
+    def test_binary_scores(self):
+        # DF protocol, and a score file of binary decisions
+        label_dir = tempfile.mkdtemp()
+        try:
+            benchmark.generate_track_data('DF', g_num_trial, label_dir)
+            for track in config.g_possible_tracks:
+                os.makedirs(os.path.join(label_dir, track), exist_ok = True)
+            score_file = os.path.join(label_dir, 'binary_score.txt')
+            with open(os.path.join(label_dir, 'DF', 'CM', 'score.txt')) \
+                 as file_in, open(score_file, 'w') as file_out:
+                for line in file_in:
+                    trial_id, score = line.split()
+                    file_out.write('{:s} {:d}\n'.format(
+                        trial_id, int(float(score) > 1.0)))
+
+            outputs = []
+            for n_jobs in [1, 2]:
+                proc = subprocess.run(
+                    [sys.executable, 'main.py', '--cm-score-file', score_file,
+                     '--track', 'DF', '--subset', 'eval',
+                     '--metadata', label_dir, '--jobs', str(n_jobs)],
+                    cwd = g_package_dir, stdout = subprocess.PIPE,
+                    stderr = subprocess.STDOUT, universal_newlines = True,
+                    timeout = g_timeout)
+                self.assertEqual(proc.returncode, 1, proc.stdout)
+                self.assertIn('not binary decisions', proc.stdout)
+                outputs.append(proc.stdout)
+            self.assertEqual(outputs[0], outputs[1])
+        finally:
+            shutil.rmtree(label_dir, ignore_errors = True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == '--map-jobs':
+        print(parallel_tools.map_jobs(
+            _exit_job, [int(x) for x in sys.argv[3:]], None,
+            n_jobs = int(sys.argv[2])))
+    else:
+        unittest.main()
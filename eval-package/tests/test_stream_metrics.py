@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+Test of the error bound of the streaming EER and min t-DCF
+
+The EER by eval_metrics.compute_eer and the min t-DCF by
+eval_wrapper.get_mintDCF_eer_from_det on the full scores should be within
+the bound returned by stream_metrics.StreamingScoreHistogram, including
+tied scores, scores outside the bins, and merged histograms.
+
+ python -m unittest discover -s tests
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import sys
+import unittest
+import numpy as np
+
+__author__ = "ASVspoof consortium"
+__copyright__ = "Copyright 2022, ASVspoof consortium"
+
+
+# directory of stream_metrics.py
+g_package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, g_package_dir)
+
+import eval_metrics
+import eval_wrapper
+import stream_metrics
+
+# numerical tolerance of the bound
+g_tol = 1e-12
+# C012 coefficients of the tests
+g_C012_list = [(0.1, 0.5, 0.4), (0.0, 1.0, 0.05), (0.3, 0.02, 2.0)]
+
+
+def _get_exact(bonafide_scores, spoof_scores, C0, C1, C2):
+    """ eer, mintdcf = _get_exact(bonafide_scores, spoof_scores, C0, C1, C2)
+    """
+    eer, _ = eval_metrics.compute_eer(bonafide_scores, spoof_scores)
+    Pmiss, Pfa, _ = eval_metrics.compute_det_curve(
+        bonafide_scores, spoof_scores)
+    mintdcf, _ = eval_wrapper.get_mintDCF_eer_from_det(Pmiss, Pfa, C0, C1, C2)
+    return eer, mintdcf
+
+
+class TestStreamingScoreHistogram(unittest.TestCase):
+
+    def _check_bound(self, hist, bonafide_scores, spoof_scores):
+        eer_est, eer_bound = hist.get_eer()
+        for C0, C1, C2 in g_C012_list:
+            eer, mintdcf = _get_exact(bonafide_scores, spoof_scores,
+                                      C0, C1, C2)
+            self.assertLessEqual(abs(eer - eer_est), eer_bound + g_tol,
+                                 "EER {:f} is out of {:f} +- {:f}".format(
+                                     eer, eer_est, eer_bound))
+            mintdcf_est, mintdcf_bound = hist.get_mintDCF(C0, C1, C2)
+            self.assertLessEqual(abs(mintdcf - mintdcf_est),
+                                 mintdcf_bound + g_tol,
+                                 "min t-DCF {:f} is out of {:f} +- {:f}".format(
+                                     mintdcf, mintdcf_est, mintdcf_bound))
+        return
+
+    def _check_case(self, bonafide_scores, spoof_scores, **hist_args):
+        hist = stream_metrics.StreamingScoreHistogram(**hist_args)
+        hist.update(bonafide_scores, spoof_scores)
+        self.assertEqual(hist.num_bonafide, len(bonafide_scores))
+        self.assertEqual(hist.num_spoof, len(spoof_scores))
+        self._check_bound(hist, bonafide_scores, spoof_scores)
+        return hist
+
+    def test_random_scores(self):
+        rng = np.random.default_rng(0)
+        for _ in range(100):
+            num_bonafide = rng.integers(1, 500)
+            num_spoof = rng.integers(1, 2000)
+            bonafide_scores = rng.normal(rng.uniform(0, 4), rng.uniform(0.5, 3),
+                                         num_bonafide)
+            spoof_scores = rng.normal(0, rng.uniform(0.5, 3), num_spoof)
+            for num_bins in [10, 400, 4000]:
+                self._check_case(bonafide_scores, spoof_scores,
+                                 num_bins = num_bins)
+
+    def test_tied_scores(self):
+        rng = np.random.default_rng(1)
+        edges = np.linspace(-20, 20, 401)
+        for _ in range(50):
+            # scores on a coarse grid, many ties within and across classes
+            bonafide_scores = np.round(rng.normal(1, 2, 300) * 2) / 2
+            spoof_scores = np.round(rng.normal(0, 2, 1000) * 2) / 2
+            self._check_case(bonafide_scores, spoof_scores, num_bins = 400)
+            self._check_case(bonafide_scores, spoof_scores, num_bins = 7)
+            # scores on the bin edges
+            bonafide_scores = rng.choice(edges[150:300], 300)
+            spoof_scores = rng.choice(edges[100:250], 1000)
+            self._check_case(bonafide_scores, spoof_scores, num_bins = 400)
+        # all the scores are the same
+        self._check_case(np.zeros(10), np.zeros(20), num_bins = 400)
+
+    def test_out_of_range_scores(self):
+        rng = np.random.default_rng(2)
+        for _ in range(50):
+            bonafide_scores = rng.normal(8, 30, 300)
+            spoof_scores = rng.normal(-5, 30, 1000)
+            hist = self._check_case(bonafide_scores, spoof_scores,
+                                    score_min = -5, score_max = 5,
+                                    num_bins = 100)
+            self.assertGreater(hist.bonafide_counts[0] +
+                               hist.bonafide_counts[-1], 0)
+        # all the scores are outside the bins
+        self._check_case(np.full(10, 100.0), np.full(20, -100.0))
+
+    def test_merge(self):
+        rng = np.random.default_rng(3)
+        bonafide_scores = rng.normal(2, 1.5, 1000)
+        spoof_scores = np.concatenate([rng.normal(0, 1, 5000),
+                                       rng.normal(0, 40, 100)])
+        full = self._check_case(bonafide_scores, spoof_scores, num_bins = 500)
+
+        # partial histograms of chunks, e.g., from several workers
+        merged = stream_metrics.StreamingScoreHistogram(num_bins = 500)
+        for bonafide_chunk, spoof_chunk in zip(
+                np.array_split(bonafide_scores, 4),
+                np.array_split(spoof_scores, 4)):
+            part = stream_metrics.StreamingScoreHistogram(num_bins = 500)
+            part.update(bonafide_chunk, None)
+            part.update(None, spoof_chunk)
+            part = stream_metrics.StreamingScoreHistogram.from_dict(
+                part.to_dict())
+            merged.merge(part)
+        np.testing.assert_array_equal(merged.bonafide_counts,
+                                      full.bonafide_counts)
+        np.testing.assert_array_equal(merged.spoof_counts, full.spoof_counts)
+        self._check_bound(merged, bonafide_scores, spoof_scores)
+
+        other = stream_metrics.StreamingScoreHistogram(num_bins = 400)
+        with self.assertRaises(ValueError):
+            merged.merge(other)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+"""
+Align the trials in a score file with the trials in a protocol
+
+Trial IDs of the protocol are sorted once. Trial IDs in a score file are 
+then mapped to the rows of the protocol by binary search (np.searchsorted)
+over the sorted IDs, without joining the two dataFrames.
+
+ aligner = TrialAligner(protocol_pd.index)
+ scores = aligner.align_scores(score_trial_ids, score_values)
+ # scores[i] is the score of the i-th trial in the protocol
+
+The order that sorts the trial IDs can be given, e.g., the one saved in the
+protocol cache (see protocol_cache.load_index_order), so that the protocol
+is not sorted again in each run. The same aligner can be used for all the
+score files of the protocol.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import sys
+import numpy as np
+
+__author__ = "ASVspoof consortium"
+__copyright__ = "Copyright 2022, ASVspoof consortium"
+
+
+# maximum number of trial IDs printed for each type of error
+g_max_print = 10
+
+
+class TrialAligner:
+    """Map trial IDs to the rows of a protocol
+
+    aligner = TrialAligner(trial_ids, order = None)
+
+    input
+    -----
+      trial_ids  pandas.Index, np.array, or list of str, 
+                 trial IDs in the protocol order, e.g., protocol_pd.index
+      order      np.array or None, order that sorts trial_ids (as str).
+                 If None, trial_ids are sorted here
+    """
+    def __init__(self, trial_ids, order = None):
+        self.trial_ids = np.asarray(trial_ids).astype(str)
+        self.num_trial = len(self.trial_ids)
+        if order is None:
+            order = np.argsort(self.trial_ids, kind='mergesort')
+        self.order = np.asarray(order, dtype=np.int64)
+        self.sorted_ids = self.trial_ids[self.order]
+
+        # duplicated IDs in the protocol cannot be aligned
+        flag_dup = self.sorted_ids[1:] == self.sorted_ids[:-1]
+        if np.any(flag_dup):
+            print("Error: protocol has duplicated trial IDs:")
+            _print_ids(np.unique(self.sorted_ids[1:][flag_dup]))
+            sys.exit(1)
+        return
+
+    def lookup(self, trial_ids):
+        """ rows = lookup(trial_ids)
+
+        Rows of the trials in the protocol, -1 for unknown trials
+
+        input
+        -----
+          trial_ids  np.array or list of str, trial IDs
+
+        output
+        ------
+          rows       np.array, int64, rows[i] is the row of trial_ids[i]
+                     in the protocol
+        """
+        trial_ids = np.asarray(trial_ids).astype(str)
+        rows = np.full(len(trial_ids), -1, dtype=np.int64)
+        if self.num_trial == 0 or len(trial_ids) == 0:
+            return rows
+        pos = np.searchsorted(self.sorted_ids, trial_ids)
+        pos[pos == self.num_trial] = 0
+        flag_found = self.sorted_ids[pos] == trial_ids
+        rows[flag_found] = self.order[pos[flag_found]]
+        return rows
+
+    def align(self, trial_ids, values):
+        """ aligned, report = align(trial_ids, values)
+
+        Put values in the order of the protocol
+
+        input
+        -----
+          trial_ids  np.array or list of str, trial IDs
+          values     np.array, values[i] belongs to trial_ids[i]
+
+        output
+        ------
+          aligned    np.array, float64, aligned[j] is the value of the j-th
+                     trial in the protocol, NaN if the trial is missing
+          report     dict, {'missing': trial IDs in the protocol but not in
+                     trial_ids, 'duplicated': trial IDs that appear more
+                     than once in trial_ids, 'unknown': trial IDs not in the
+                     protocol}
+        """
+        trial_ids = np.asarray(trial_ids).astype(str)
+        rows = self.lookup(trial_ids)
+        flag_known = rows >= 0
+        counts = np.bincount(rows[flag_known], minlength = self.num_trial)
+
+        aligned = np.full(self.num_trial, np.nan, dtype=np.float64)
+        aligned[rows[flag_known]] = np.asarray(values)[flag_known]
+
+        # unknown IDs in the order they first appear
+        unknown, first = np.unique(trial_ids[~flag_known], return_index=True)
+        report = {'missing': self.trial_ids[counts == 0],
+                  'duplicated': self.trial_ids[counts > 1],
+                  'unknown': unknown[np.argsort(first)]}
+        return aligned, report
+
+    def align_scores(self, trial_ids, scores):
+        """ aligned = align_scores(trial_ids, scores)
+
+        Same as align, but print the mismatched trial IDs and exit if the
+        trials do not match the protocol one to one.
+        """
+        aligned, report = self.align(trial_ids, scores)
+        if any(len(x) for x in report.values()):
+            print("Error: protocol and score seem to mismatch. Please check!")
+            print("Protocol file has {:d} entries".format(self.num_trial))
+            print("Score file has {:d} entries".format(len(trial_ids)))
+            for name, ids in report.items():
+                if len(ids):
+                    print("{:d} trials are {:s} in the score file:".format(
+                        len(ids), name))
+                    _print_ids(ids)
+            print("\nIs the score file incomplete?")
+            print("Has you selected the correct track?")
+            sys.exit(1)
+        return aligned
+
+
+def _print_ids(ids):
+    for trial_id in ids[:g_max_print]:
+        print("  {:s}".format(str(trial_id)))
+    if len(ids) > g_max_print:
+        print("  ...")
+    return
+
+
+if __name__ == "__main__":
+    print("trial_align")